@@ -0,0 +1,410 @@
+import json
+import typing as t
+
+from .redis import (
+    INT_SERDE,
+    JSON_SERDE,
+    AsyncRedisField,
+    ComputeRedisCompactEnumSerde,
+    ComputeRedisEnumSerde,
+    HasRedisFieldsMeta,
+    RedisField,
+)
+from .redis.fields import _read_client
+from .redis_task import (
+    TASK_SCRIPTS,
+    _initial_task_fields,
+    _state_log_name,
+    _state_log_trimmed_name,
+    _task_hname,
+    _task_index_name_for_value,
+    _task_index_names,
+    _task_index_score,
+)
+from .tasks import InternalTaskState, TaskState
+
+try:
+    import redis
+
+    has_redis = True
+except ImportError:
+    has_redis = False
+
+if t.TYPE_CHECKING:
+    import redis.asyncio
+
+
+class AsyncRedisTask(metaclass=HasRedisFieldsMeta):
+    """
+    asyncio counterpart to RedisTask, for use with a `redis.asyncio` client.
+
+    Fields, serdes, and key layout are the same as for RedisTask, so a task written
+    by one can be read by the other.
+
+    Because construction cannot be awaited, tasks are created and loaded with
+    classmethods rather than by instantiating the class, e.g.
+      >>> task = await AsyncRedisTask.create(redis_client, "foo_id", user_id=1)
+      >>> task = await AsyncRedisTask.load(redis_client, "foo_id")
+
+    Tasks are created, and their status logs updated, by the same scripts as are
+    used by RedisTask, and indexes are maintained in the same way, so
+    ``INDEXED_FIELDS`` must be the same for both classes.
+
+    Fields are accessed via awaitable getters and setters, e.g.
+      >>> await task.status.get()
+      <TaskState.WAITING_FOR_EP: 'waiting-for-ep'>
+      >>> await task.status.set(TaskState.RUNNING)
+
+    The same caveats about atomicity and data races which apply to RedisTask also
+    apply here.
+    """
+
+    # 2 weeks in seconds, as in RedisTask
+    DEFAULT_TTL: t.ClassVar[int] = 1209600
+
+    # as in RedisTask
+    STATUS_LOG_MAX_LEN: t.ClassVar[t.Optional[int]] = None
+
+    # as in RedisTask, which must index the same fields, or its indexes will be
+    # made stale by writes through this class
+    INDEXED_FIELDS: t.ClassVar[t.Tuple[str, ...]] = ()
+
+    # as in RedisTask
+    COMPACT_STORAGE: t.ClassVar[bool] = False
+
+    # as in RedisTask
+    CLUSTER_KEYS: t.ClassVar[bool] = False
+
+    # populated by HasRedisFieldsMeta
+    _redis_fields: t.ClassVar[t.Dict[str, RedisField]]
+
+    # required fields
+    status = AsyncRedisField(
+        serde=ComputeRedisEnumSerde(TaskState),
+        compact_key="s",
+        compact_serde=ComputeRedisCompactEnumSerde(TaskState),
+    )
+    internal_status = AsyncRedisField(
+        serde=ComputeRedisEnumSerde(InternalTaskState),
+        compact_key="is",
+        compact_serde=ComputeRedisCompactEnumSerde(InternalTaskState),
+    )
+    user_id = AsyncRedisField(serde=INT_SERDE, compact_key="u")
+    function_id = AsyncRedisField(compact_key="f")
+    container = AsyncRedisField(compact_key="c")
+    task_group_id = AsyncRedisField(compact_key="g")
+    queue_name = AsyncRedisField(compact_key="q")
+    # end required fields
+
+    endpoint_id = AsyncRedisField(compact_key="e")
+
+    # see the note on RedisTask.payload regarding the use of JSON_SERDE
+    payload = AsyncRedisField(serde=JSON_SERDE, compact_key="p")
+    payload_reference = AsyncRedisField(serde=JSON_SERDE, compact_key="pr")
+    result = AsyncRedisField(compact_key="r")
+    result_reference = AsyncRedisField(serde=JSON_SERDE, compact_key="rr")
+    details = AsyncRedisField(serde=JSON_SERDE, compact_key="d")
+    exception = AsyncRedisField(compact_key="x")
+    completion_time = AsyncRedisField(compact_key="t")
+
+    def __init__(self, redis_client: "redis.asyncio.Redis[t.Any]", task_id: str):
+        """
+        Bind a task object to a task_id. This does not read or write any data.
+        Use ``create()`` or ``load()`` instead.
+
+        :param redis_client: asyncio Redis client for properties to get/set
+        :param task_id: UUID of the task, as str
+        """
+        self.hname = _task_hname(task_id, cluster=self.CLUSTER_KEYS)
+        self.state_log_name = _state_log_name(task_id, cluster=self.CLUSTER_KEYS)
+        self.state_log_trimmed_name = _state_log_trimmed_name(
+            task_id, cluster=self.CLUSTER_KEYS
+        )
+        self.redis_client = redis_client
+        self.task_id = task_id
+        # a snapshot of the task's hash, from which fields are read; see refresh()
+        self._redis_field_cache: t.Optional[t.Dict[str, str]] = None
+
+    @classmethod
+    async def create(
+        cls,
+        redis_client: "redis.asyncio.Redis[t.Any]",
+        task_id: str,
+        *,
+        user_id: t.Optional[int] = None,
+        function_id: t.Optional[str] = None,
+        container: t.Optional[str] = None,
+        payload: t.Optional[str] = None,
+        payload_reference: t.Optional[t.Dict[str, t.Any]] = None,
+        task_group_id: t.Optional[str] = None,
+        queue_name: t.Optional[str] = None,
+        endpoint_id: t.Optional[str] = None,
+        details: t.Optional[t.Dict[str, t.Any]] = None,
+    ) -> "AsyncRedisTask":
+        """
+        Create a new task atomically, in a single round trip, as with
+        ``RedisTask.create``.
+
+        Raises a ValueError if the task_id already exists, in which case nothing is
+        written.
+        """
+        fields = _initial_task_fields(
+            cls,
+            user_id=user_id,
+            function_id=function_id,
+            container=container,
+            payload=payload,
+            payload_reference=payload_reference,
+            task_group_id=task_group_id,
+            queue_name=queue_name,
+            endpoint_id=endpoint_id,
+            details=details,
+        )
+        args: t.List[t.Any] = [cls.DEFAULT_TTL, task_id, _task_index_score(cls)]
+        for key, value in fields.items():
+            args.extend((key, value))
+        keys = [_task_hname(task_id, cluster=cls.CLUSTER_KEYS)]
+        if not cls.CLUSTER_KEYS:
+            keys.extend(_task_index_names(cls, fields))
+        created = await TASK_SCRIPTS["create_task"].call_async(
+            redis_client, keys=keys, args=args
+        )
+        if not created:
+            raise ValueError(f"Conflict. Cannot create task {task_id}: already exists")
+        if cls.CLUSTER_KEYS and cls.INDEXED_FIELDS:
+            await cls._update_indexes(
+                redis_client,
+                task_id,
+                _task_index_names(cls, fields),
+                score=_task_index_score(cls),
+            )
+        return cls(redis_client, task_id)
+
+    @classmethod
+    async def _update_indexes(
+        cls,
+        redis_client: "redis.asyncio.Redis[t.Any]",
+        task_id: str,
+        add: t.Iterable[str],
+        remove: t.Iterable[str] = (),
+        *,
+        score: float,
+    ) -> None:
+        """
+        Add a task to the ``add`` indexes and remove it from the ``remove`` indexes,
+        for use with CLUSTER_KEYS, where indexes cannot be updated along with the
+        task, as in ``RedisTask._queue_index_updates``.
+        """
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for index in remove:
+                pipe.zrem(index, task_id)
+            for index in add:
+                pipe.zadd(index, {task_id: score})
+                pipe.expire(index, cls.DEFAULT_TTL)
+            await pipe.execute()
+
+    async def _write_redis_field(self, field: RedisField, value: t.Any) -> None:
+        """
+        Called by AsyncRedisField to write a field, so that indexes can be updated
+        in the same transaction, as in ``RedisTask._write_redis_field``.
+        """
+        index_field_names = [
+            name for name in self.INDEXED_FIELDS if self._redis_fields[name] is field
+        ]
+        async_field = t.cast(AsyncRedisField, field)
+        if not index_field_names:
+            await async_field.store_async(self, value)
+            return
+        (name,) = index_field_names
+        new_index = _task_index_name_for_value(self, name, value)
+        storage_keys = field.storage_keys(self)
+
+        if self.CLUSTER_KEYS:
+            async with self.redis_client.pipeline(transaction=False) as read_pipe:
+                read_pipe.hmget(self.hname, storage_keys)
+                read_pipe.ttl(self.hname)
+                old_data, ttl_val = await read_pipe.execute()
+            old_value = field.deserialize_from(self, dict(zip(storage_keys, old_data)))
+            await async_field.store_async(self, value)
+            old_indexes = []
+            if old_value is not None and old_value != value:
+                old_indexes.append(_task_index_name_for_value(self, name, old_value))
+            await self._update_indexes(
+                self.redis_client,
+                self.task_id,
+                [new_index],
+                old_indexes,
+                score=_task_index_score(self, ttl_val),
+            )
+            return
+
+        async with self.redis_client.pipeline() as pipe:
+            while True:
+                try:
+                    await pipe.watch(self.hname)
+                    old_data = await pipe.hmget(self.hname, storage_keys)
+                    old_value = field.deserialize_from(
+                        self, dict(zip(storage_keys, old_data))
+                    )
+                    ttl_val = await pipe.ttl(self.hname)
+                    pipe.multi()
+                    field.write(self, pipe, value)
+                    if old_value is not None and old_value != value:
+                        pipe.zrem(
+                            _task_index_name_for_value(self, name, old_value),
+                            self.task_id,
+                        )
+                    pipe.zadd(
+                        new_index, {self.task_id: _task_index_score(self, ttl_val)}
+                    )
+                    pipe.expire(new_index, self.DEFAULT_TTL)
+                    await pipe.execute()
+                    return
+                except redis.exceptions.WatchError:
+                    continue
+
+    async def get_ttl(self) -> int:
+        return await self.redis_client.ttl(self.hname)
+
+    async def set_ttl(self, expiration: int) -> None:
+        """Expires task after expiration time, if not already set."""
+        ttl_val = await self.get_ttl()
+        if ttl_val < 0 or expiration < ttl_val:
+            await self.redis_client.expire(self.hname, expiration)
+
+    async def delete(self) -> None:
+        """Removes this task from Redis, to be used after the result is gotten"""
+        await self.redis_client.delete(self.hname)
+
+    @classmethod
+    async def exists(
+        cls, redis_client: "redis.asyncio.Redis[t.Any]", task_id: str
+    ) -> bool:
+        """Check if a given task_id exists in Redis"""
+        return bool(
+            await redis_client.exists(_task_hname(task_id, cluster=cls.CLUSTER_KEYS))
+        )
+
+    @classmethod
+    async def _load_data(
+        cls, redis_client: "redis.asyncio.Redis[t.Any]", task_ids: t.List[str]
+    ) -> t.List[t.Optional[t.Dict[str, str]]]:
+        """
+        Read the data of tasks, and their TTLs, in a single pipeline, and set any
+        missing required status fields or TTLs to the defaults in a second one.
+
+        Returns the data of each task, or None for a task which does not exist.
+        """
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for task_id in task_ids:
+                pipe.hgetall(_task_hname(task_id, cluster=cls.CLUSTER_KEYS))
+                pipe.ttl(_task_hname(task_id, cluster=cls.CLUSTER_KEYS))
+            results = await pipe.execute()
+
+        required_fields = [
+            cls._redis_fields["status"],
+            cls._redis_fields["internal_status"],
+        ]
+        defaults = _initial_task_fields(cls)
+        all_data: t.List[t.Optional[t.Dict[str, str]]] = []
+        needs_fixup = False
+        async with redis_client.pipeline(transaction=False) as fixup_pipe:
+            for i, task_id in enumerate(task_ids):
+                data, ttl = results[2 * i], results[2 * i + 1]
+                if not data:
+                    all_data.append(None)
+                    continue
+                all_data.append(data)
+
+                hname = _task_hname(task_id, cluster=cls.CLUSTER_KEYS)
+                for field in required_fields:
+                    if field.deserialize_from(cls, data) is None:
+                        key = field.storage_keys(cls)[0]
+                        fixup_pipe.hsetnx(hname, key, defaults[key])
+                        data[key] = defaults[key]
+                        needs_fixup = True
+                if ttl < 0:
+                    fixup_pipe.expire(hname, cls.DEFAULT_TTL)
+                    needs_fixup = True
+            if needs_fixup:
+                await fixup_pipe.execute()
+        return all_data
+
+    @classmethod
+    async def load(
+        cls, redis_client: "redis.asyncio.Redis[t.Any]", task_id: str
+    ) -> "AsyncRedisTask":
+        """
+        Load a task from storage. Raises a ValueError if the task is not found.
+
+        As with ``RedisTask.load``, a task which is missing its required status
+        fields or its TTL has them set to the defaults.
+        """
+        (data,) = await cls._load_data(redis_client, [task_id])
+        if data is None:
+            raise ValueError(f"Cannot load task {task_id}: does not exist")
+        return cls(redis_client, task_id)
+
+    @classmethod
+    async def bulk_load(
+        cls, redis_client: "redis.asyncio.Redis[t.Any]", task_ids: t.Iterable[str]
+    ) -> t.Tuple[t.List["AsyncRedisTask"], t.List[str]]:
+        """
+        Load many tasks at once, fetching their data and TTLs in a single pipeline.
+
+        As with ``load()``, any task which is missing its required status fields or
+        its TTL has them set to the defaults. Missing tasks do not raise an error.
+
+        Returns a tuple of the tasks which were found and the IDs of those which
+        were not, each in the order given. The tasks are hydrated with a snapshot of
+        their data, so reading their fields does not contact Redis. Use
+        ``refresh()`` to update the snapshot.
+        """
+        task_ids = list(task_ids)
+        found: t.List["AsyncRedisTask"] = []
+        missing: t.List[str] = []
+        for task_id, data in zip(
+            task_ids, await cls._load_data(redis_client, task_ids)
+        ):
+            if data is None:
+                missing.append(task_id)
+            else:
+                task = cls(redis_client, task_id)
+                task._redis_field_cache = data
+                found.append(task)
+        return found, missing
+
+    async def refresh(self) -> None:
+        """
+        Read all fields of this task in a single round trip, and serve subsequent
+        field reads from that snapshot.
+        """
+        self._redis_field_cache = await _read_client(self).hgetall(self.hname)
+
+    async def get_status_log(self) -> t.List[t.Any]:
+        return [
+            json.loads(i)
+            for i in await self.redis_client.lrange(self.state_log_name, 0, -1)
+        ]
+
+    async def append_status_log(self, *new_states: t.Any) -> None:
+        """See ``RedisTask.append_status_log``"""
+        if not new_states:
+            return
+        await TASK_SCRIPTS["append_state_log"].call_async(
+            self.redis_client,
+            keys=[self.state_log_name, self.state_log_trimmed_name],
+            args=[self.DEFAULT_TTL, self.STATUS_LOG_MAX_LEN or 0]
+            + [json.dumps(s) for s in new_states],
+        )
+
+    async def read_status_log(
+        self, offset: int = 0, *, count: t.Optional[int] = None
+    ) -> t.Tuple[t.List[t.Any], int]:
+        """See ``RedisTask.read_status_log``"""
+        start, entries = await TASK_SCRIPTS["read_state_log"].call_async(
+            self.redis_client,
+            keys=[self.state_log_name, self.state_log_trimmed_name],
+            args=[offset, count or 0],
+        )
+        return [json.loads(i) for i in entries], int(start) + len(entries)
@@ -1,26 +1,72 @@
-from .connection import default_redis_connection_factory, redis_connection_error_logging
-from .fields import HasRedisFields, HasRedisFieldsMeta, RedisField
+from .batching import ComputeRedisBatchingClient
+from .cluster import ComputeRedisSlotPipeline, is_cluster_client, key_slot
+from .connection import (
+    ComputeRedisReplicaPool,
+    default_async_redis_connection_factory,
+    default_redis_connection_factory,
+    has_hiredis,
+    prewarm_redis_connections,
+    redis_connection_error_logging,
+)
+from .fields import (
+    AsyncRedisField,
+    BoundAsyncRedisField,
+    HasRedisFields,
+    HasRedisFieldsMeta,
+    RedisField,
+    read_from_primary,
+)
+from .metrics import (
+    QUEUE_COUNTERS,
+    ComputeRedisHistogram,
+    ComputeRedisQueueCounters,
+    ComputeRedisQueueMetricsCollector,
+    QueueMetrics,
+    QueueSample,
+)
 from .pubsub import ComputeRedisPubSub
+from .scripts import ComputeRedisScript, ComputeRedisScriptRegistry
 from .serde import (
     DEFAULT_SERDE,
     FLOAT_SERDE,
     INT_SERDE,
     JSON_SERDE,
+    ComputeRedisCompactEnumSerde,
     ComputeRedisEnumSerde,
     ComputeRedisFloatSerde,
     ComputeRedisIntSerde,
     ComputeRedisJSONSerde,
     ComputeRedisSerde,
 )
-from .task_queue import ComputeEndpointTaskQueue
+from .sharding import ComputeRedisShardRouter, ComputeShardedRedisPubSub
+from .task_queue import (
+    ComputeEndpointReliableTaskQueue,
+    ComputeEndpointTaskQueue,
+    ComputeMultiEndpointTaskQueue,
+)
+from .task_stream import ComputeEndpointTaskStream
 
 __all__ = (
     "default_redis_connection_factory",
+    "default_async_redis_connection_factory",
     "redis_connection_error_logging",
+    "prewarm_redis_connections",
+    "has_hiredis",
+    "ComputeRedisReplicaPool",
+    "ComputeRedisBatchingClient",
+    "key_slot",
+    "is_cluster_client",
+    "ComputeRedisSlotPipeline",
     "ComputeEndpointTaskQueue",
+    "ComputeMultiEndpointTaskQueue",
+    "ComputeEndpointReliableTaskQueue",
+    "ComputeEndpointTaskStream",
     "HasRedisFields",
     "HasRedisFieldsMeta",
     "RedisField",
+    "AsyncRedisField",
+    "BoundAsyncRedisField",
+    "read_from_primary",
     "ComputeRedisSerde",
     "ComputeRedisIntSerde",
     "ComputeRedisFloatSerde",
@@ -30,5 +76,16 @@ __all__ = (
     "FLOAT_SERDE",
     "JSON_SERDE",
     "ComputeRedisEnumSerde",
+    "ComputeRedisCompactEnumSerde",
     "ComputeRedisPubSub",
+    "ComputeRedisShardRouter",
+    "ComputeShardedRedisPubSub",
+    "QUEUE_COUNTERS",
+    "ComputeRedisQueueCounters",
+    "ComputeRedisHistogram",
+    "ComputeRedisQueueMetricsCollector",
+    "QueueMetrics",
+    "QueueSample",
+    "ComputeRedisScript",
+    "ComputeRedisScriptRegistry",
 )
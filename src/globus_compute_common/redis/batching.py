@@ -0,0 +1,191 @@
+import concurrent.futures
+import threading
+import typing as t
+
+from .connection import _check_has_redis
+
+try:
+    import redis
+    from redis.commands.core import CoreCommands
+
+    has_redis = True
+except ImportError:
+    has_redis = False
+
+# commands which block, depend upon per-connection state, or return iterators or
+# helper objects; these are always sent directly to the wrapped client
+_UNBATCHED_COMMANDS = frozenset(
+    (
+        "blmove",
+        "blmpop",
+        "blpop",
+        "brpop",
+        "brpoplpush",
+        "bzmpop",
+        "bzpopmax",
+        "bzpopmin",
+        "wait",
+        "waitaof",
+        "xread",
+        "xreadgroup",
+        "watch",
+        "unwatch",
+        "auth",
+        "select",
+        "quit",
+        "reset",
+        "readonly",
+        "readwrite",
+        "register_script",
+        "hscan_iter",
+        "scan_iter",
+        "sscan_iter",
+        "zscan_iter",
+    )
+)
+
+
+def _is_batchable(name: str) -> bool:
+    return (
+        not name.startswith("_")
+        and name not in _UNBATCHED_COMMANDS
+        and callable(getattr(CoreCommands, name, None))
+    )
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.commands: t.List[
+            t.Tuple[
+                str,
+                t.Tuple[t.Any, ...],
+                t.Dict[str, t.Any],
+                "concurrent.futures.Future[t.Any]",
+            ]
+        ] = []
+        self.full = threading.Event()
+
+
+class ComputeRedisBatchingClient:
+    """
+    Wraps a Redis client, so that commands issued concurrently from several threads
+    are coalesced into a single pipeline, and so a single round trip.
+
+    This can stand in for a ``redis.Redis`` client, e.g. that given to RedisTask,
+    ComputeRedisPubSub or ComputeEndpointTaskQueue, without changes to callers:
+      >>> client = ComputeRedisBatchingClient(default_redis_connection_factory())
+      >>> client.hget("task_foo", "status")  # batched with other threads' commands
+
+    A command from the only thread using the client is sent at once. Otherwise, the
+    first command of a batch waits for up to ``window`` seconds for more commands
+    to arrive, and the batch is sent early once ``max_batch_size`` commands are
+    queued, or once every thread using the client has a command in it. Each caller
+    receives its own result or exception.
+
+    The batch is not a transaction: commands from different callers may be
+    interleaved with those of other clients. Blocking commands, and methods which
+    return helper objects (e.g. ``pipeline()`` and ``pubsub()``), are sent directly
+    to the wrapped client.
+    """
+
+    def __init__(
+        self,
+        client: "redis.Redis[t.Any]",
+        *,
+        window: float = 0.001,
+        max_batch_size: int = 128,
+    ) -> None:
+        _check_has_redis()
+        self.client = client
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._batch: t.Optional[_Batch] = None
+        # the number of callers with a command queued or being sent
+        self._callers = 0
+
+        # counters, for monitoring the effectiveness of batching
+        self.batches_sent = 0
+        self.commands_sent = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"ComputeRedisBatchingClient({self.client}, window={self.window}, "
+            f"max_batch_size={self.max_batch_size})"
+        )
+
+    def __getattr__(self, name: str) -> t.Any:
+        attr = getattr(self.client, name)
+        if not _is_batchable(name):
+            return attr
+
+        def batched_command(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            return self._submit(name, args, kwargs)
+
+        return batched_command
+
+    def _submit(
+        self, name: str, args: t.Tuple[t.Any, ...], kwargs: t.Dict[str, t.Any]
+    ) -> t.Any:
+        future: "concurrent.futures.Future[t.Any]" = concurrent.futures.Future()
+        with self._lock:
+            self._callers += 1
+            batch = self._batch
+            is_leader = batch is None
+            if batch is None:
+                batch = self._batch = _Batch()
+            batch.commands.append((name, args, kwargs, future))
+            self._close_batch_if_ready()
+
+        try:
+            if is_leader:
+                batch.full.wait(self.window)
+                with self._lock:
+                    if self._batch is batch:
+                        self._batch = None
+                self._send(batch)
+            return future.result()
+        finally:
+            with self._lock:
+                self._callers -= 1
+                self._close_batch_if_ready()
+
+    def _close_batch_if_ready(self) -> None:
+        # called with the lock held; the open batch is sent without waiting out the
+        # window once it is full, or once no caller outside it could add to it
+        batch = self._batch
+        if batch is None:
+            return
+        size = len(batch.commands)
+        if size >= self.max_batch_size or size >= self._callers:
+            # no further commands join this batch
+            self._batch = None
+            batch.full.set()
+
+    def _send(self, batch: _Batch) -> None:
+        queued = []
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                for name, args, kwargs, future in batch.commands:
+                    try:
+                        getattr(pipe, name)(*args, **kwargs)
+                    except Exception as e:
+                        # e.g. invalid arguments, which only affect this caller
+                        future.set_exception(e)
+                    else:
+                        queued.append(future)
+                results = pipe.execute(raise_on_error=False) if queued else []
+        except Exception as e:
+            for future in queued:
+                future.set_exception(e)
+            return
+        finally:
+            with self._lock:
+                self.batches_sent += 1
+                self.commands_sent += len(queued)
+
+        for future, result in zip(queued, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,169 @@
+import binascii
+import typing as t
+
+from .connection import _check_has_redis
+from .scripts import ComputeRedisScript
+
+try:
+    import redis.cluster
+
+    has_redis = True
+except ImportError:
+    has_redis = False
+
+# the number of hash slots in a Redis Cluster
+CLUSTER_SLOTS = 16384
+
+
+def key_slot(key: t.Union[str, bytes]) -> int:
+    """
+    Get the Redis Cluster hash slot of a key.
+
+    As in Redis, if the key contains a non-empty hash tag (a substring in braces,
+    as in ``task_{abc}:state_log``), only the tag is hashed, so that keys with the
+    same tag are placed in the same slot.
+    """
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    start = key.find(b"{")
+    if start > -1:
+        end = key.find(b"}", start + 1)
+        if end > start + 1:
+            key = key[start + 1 : end]
+    # CRC16-CCITT (XMODEM), as used by Redis Cluster
+    return binascii.crc_hqx(key, 0) % CLUSTER_SLOTS
+
+
+def is_cluster_client(client: t.Any) -> bool:
+    """Check whether a client is a Redis Cluster client"""
+    return has_redis and isinstance(client, redis.cluster.RedisCluster)
+
+
+class _QueuedCommand(t.NamedTuple):
+    position: int
+    method: str
+    args: t.Tuple[t.Any, ...]
+    kwargs: t.Dict[str, t.Any]
+    script: t.Optional[ComputeRedisScript] = None
+
+
+class ComputeRedisSlotPipeline:
+    """
+    A pipeline which groups commands by the hash slot of their keys, so that they
+    can be sent to a Redis Cluster.
+
+    Commands are queued by name, with their key as the first argument, e.g.
+      >>> pipe = ComputeRedisSlotPipeline(redis_client)
+      >>> pipe.add("hset", "task_{abc}", "status", "running")
+      >>> pipe.add("zadd", "task_index:{status:running}", {"abc": 1.0})
+      >>> pipe.execute()
+      [1, 1]
+
+    Results are returned in the order in which commands were queued.
+
+    Without ``transaction``, all commands are sent in a single pipeline, which a
+    cluster client splits between the nodes serving each slot.
+
+    With ``transaction=True`` and a cluster client, the commands for each slot are
+    executed in their own MULTI/EXEC transaction, which Redis Cluster allows because
+    they are all served by one node. Commands for different slots are not atomic
+    with respect to one another. With a standalone Redis client, all commands are
+    executed in a single transaction.
+    """
+
+    def __init__(self, client: t.Any, *, transaction: bool = False) -> None:
+        self.client = client
+        self.transaction = transaction
+        self._slots: t.Dict[int, t.List[_QueuedCommand]] = {}
+        self._num_commands = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"ComputeRedisSlotPipeline(commands={self._num_commands}, "
+            f"slots={len(self._slots)}, transaction={self.transaction})"
+        )
+
+    def __len__(self) -> int:
+        return self._num_commands
+
+    def _queue(self, key: t.Any, command: _QueuedCommand) -> None:
+        self._slots.setdefault(key_slot(key), []).append(command)
+        self._num_commands += 1
+
+    def add(self, method: str, key: t.Any, *args: t.Any, **kwargs: t.Any) -> None:
+        """
+        Queue a command, given as the name of a Redis client method, its key, and
+        any further arguments.
+        """
+        command = _QueuedCommand(self._num_commands, method, (key,) + args, kwargs)
+        self._queue(key, command)
+
+    def add_script(
+        self,
+        script: ComputeRedisScript,
+        *,
+        keys: t.Sequence[t.Any],
+        args: t.Sequence[t.Any] = (),
+    ) -> None:
+        """
+        Queue a call to a script. On a cluster, all of its keys must be in the same
+        slot.
+        """
+        if not keys:
+            raise ValueError(f"Cannot route script {script.name}: no keys given")
+        if is_cluster_client(self.client) and len({key_slot(k) for k in keys}) > 1:
+            raise ValueError(
+                f"Cannot route script {script.name}: keys are in different slots"
+            )
+        command = _QueuedCommand(
+            self._num_commands, "", tuple(keys), {"args": args}, script
+        )
+        self._queue(keys[0], command)
+
+    def _pipeline_for(self, slot_commands: t.List[_QueuedCommand]) -> t.Any:
+        if not is_cluster_client(self.client):
+            return self.client.pipeline(transaction=self.transaction)
+        if not self.transaction:
+            # cluster pipelines route each command to the node serving its slot
+            return self.client.pipeline()
+        # transactions must be run on the node which serves the slot
+        node = self.client.get_node_from_key(slot_commands[0].args[0])
+        return self.client.get_redis_connection(node).pipeline(transaction=True)
+
+    @staticmethod
+    def _queue_on(pipe: t.Any, commands: t.Iterable[_QueuedCommand]) -> None:
+        for command in commands:
+            if command.script is not None:
+                command.script.queue(
+                    pipe, keys=command.args, args=command.kwargs["args"]
+                )
+            else:
+                getattr(pipe, command.method)(*command.args, **command.kwargs)
+
+    def execute(self) -> t.List[t.Any]:
+        """
+        Execute all queued commands and clear the queue. Any scripts which are used
+        must already be loaded, e.g. with ``ComputeRedisScript.ensure_loaded()``.
+
+        Returns the results in the order in which commands were queued.
+        """
+        _check_has_redis()
+        slots, self._slots = self._slots, {}
+        self._num_commands = 0
+        if not slots:
+            return []
+
+        if self.transaction and is_cluster_client(self.client):
+            groups = list(slots.values())
+        else:
+            # commands are still ordered by slot, so that cluster pipelines send
+            # contiguous batches to each node
+            groups = [[command for commands in slots.values() for command in commands]]
+
+        results: t.List[t.Any] = [None] * sum(len(c) for c in slots.values())
+        for commands in groups:
+            with self._pipeline_for(commands) as pipe:
+                self._queue_on(pipe, commands)
+                for command, result in zip(commands, pipe.execute()):
+                    results[command.position] = result
+        return results
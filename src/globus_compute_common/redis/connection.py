@@ -1,6 +1,8 @@
 import contextlib
+import itertools
 import logging
 import os
+import threading
 import typing as t
 
 try:
@@ -10,6 +12,21 @@ try:
 except ImportError:
     has_redis = False
 
+# redis-py uses the hiredis parser automatically when it is installed
+try:
+    from redis.utils import HIREDIS_AVAILABLE
+
+    has_hiredis: bool = HIREDIS_AVAILABLE
+except ImportError:
+    has_hiredis = False
+
+try:
+    import redis.asyncio
+
+    has_redis_asyncio = True
+except ImportError:
+    has_redis_asyncio = False
+
 log = logging.getLogger(__name__)
 
 
@@ -28,8 +45,35 @@ Either install it explicitly or install the 'redis' extra, as in
         )
 
 
+# connection pools shared by the clients which default_redis_connection_factory
+# returns, keyed by URL and pool settings
+_SHARED_POOLS: t.Dict[t.Tuple[t.Any, ...], "redis.ConnectionPool"] = {}
+_SHARED_POOLS_LOCK = threading.Lock()
+
+
+def _reset_shared_pools() -> None:
+    # connections must not be shared with a forked child, so the child discards the
+    # parent's pools (without closing their sockets) and builds its own on demand
+    # clients created before the fork are handled by redis-py, which resets a
+    # pool's connections when it is first used in a new process
+    global _SHARED_POOLS_LOCK
+    _SHARED_POOLS.clear()
+    _SHARED_POOLS_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_shared_pools)
+
+
 def default_redis_connection_factory(
     redis_url: t.Optional[str] = None,
+    *,
+    max_connections: t.Optional[int] = None,
+    pool_timeout: t.Optional[float] = 20,
+    socket_timeout: t.Optional[float] = None,
+    socket_connect_timeout: t.Optional[float] = None,
+    socket_keepalive: t.Optional[bool] = None,
+    shared: bool = True,
 ) -> "redis.Redis[str]":
     """
     Construct a Redis client for a given redis URL.
@@ -40,19 +84,138 @@ def default_redis_connection_factory(
       redis://localhost:6379
 
     will be used as the default.
+
+    Clients with the same URL and settings share a process-wide connection pool,
+    unless ``shared=False`` is passed. Pools are discarded in a child process after
+    ``fork()``, so a pre-fork server's workers each build their own.
+
+    The hiredis parser is used if it is installed (see ``has_hiredis``).
+
+    :param redis_url: the URL of the Redis server
+    :param max_connections: if given, a ``BlockingConnectionPool`` with this many
+        connections is used, and callers wait for a free connection rather than
+        opening more
+    :param pool_timeout: the number of seconds to wait for a free connection when
+        ``max_connections`` is given, or None to wait forever
+    :param socket_timeout: the timeout for socket reads and writes, in seconds
+    :param socket_connect_timeout: the timeout for connecting, in seconds
+    :param socket_keepalive: whether to enable TCP keepalive on connections; by
+        default it is not enabled, as in redis-py
+    :param shared: whether to use the process-wide pool for these settings
+    """
+    _check_has_redis()
+
+    if redis_url is None:
+        redis_url = os.getenv("COMPUTE_COMMON_REDIS_URL", "redis://localhost:6379")
+
+    pool_kwargs: t.Dict[str, t.Any] = {
+        "decode_responses": True,
+        "health_check_interval": 30,
+        "socket_timeout": socket_timeout,
+        "socket_connect_timeout": socket_connect_timeout,
+        "socket_keepalive": socket_keepalive,
+    }
+    pool_class: t.Type["redis.ConnectionPool"] = redis.ConnectionPool
+    if max_connections is not None:
+        pool_class = redis.BlockingConnectionPool
+        pool_kwargs.update(max_connections=max_connections, timeout=pool_timeout)
+
+    if shared:
+        pool_key = (redis_url, pool_class, tuple(sorted(pool_kwargs.items())))
+        with _SHARED_POOLS_LOCK:
+            if pool_key not in _SHARED_POOLS:
+                _SHARED_POOLS[pool_key] = pool_class.from_url(redis_url, **pool_kwargs)
+            pool = _SHARED_POOLS[pool_key]
+    else:
+        pool = pool_class.from_url(redis_url, **pool_kwargs)
+    return t.cast("redis.Redis[str]", redis.Redis(connection_pool=pool))
+
+
+def prewarm_redis_connections(
+    redis_client: "redis.Redis[t.Any]", num_connections: int
+) -> None:
     """
+    Open connections in a client's pool ahead of time, e.g. at startup, so that
+    the first requests do not pay the cost of connecting.
+    """
+    _check_has_redis()
+    pool = redis_client.connection_pool
+    connections = []
+    try:
+        for _ in range(num_connections):
+            try:
+                connection = pool.get_connection()
+            except TypeError:
+                # redis<5.3 requires a command name
+                connection = pool.get_connection("PING")
+            connections.append(connection)
+            connection.connect()
+    finally:
+        for connection in connections:
+            pool.release(connection)
+
+
+def _check_has_redis_asyncio() -> None:
     _check_has_redis()
+    if not has_redis_asyncio:
+        raise RuntimeError(
+            "The installed version of the 'redis' package does not provide "
+            "'redis.asyncio'. Asynchronous clients require redis>=4.2"
+        )
+
+
+def default_async_redis_connection_factory(
+    redis_url: t.Optional[str] = None,
+) -> "redis.asyncio.Redis[str]":
+    """
+    Construct an asyncio Redis client for a given redis URL.
+
+    URL handling is the same as for ``default_redis_connection_factory``.
+    """
+    _check_has_redis_asyncio()
 
     if redis_url is None:
         redis_url = os.getenv("COMPUTE_COMMON_REDIS_URL", "redis://localhost:6379")
 
-    return redis.Redis.from_url(
+    return redis.asyncio.Redis.from_url(
         redis_url,
         decode_responses=True,
         health_check_interval=30,
     )
 
 
+class ComputeRedisReplicaPool:
+    """
+    Stands in for a Redis client for reads, sending each command to the next of
+    several replica clients in turn.
+
+    This is suitable as the ``redis_replica_client`` of an object with RedisFields.
+    Only read commands should be sent through a pool.
+    """
+
+    def __init__(self, clients: t.Sequence["redis.Redis[t.Any]"]) -> None:
+        if not clients:
+            raise ValueError("ComputeRedisReplicaPool requires at least one client")
+        self.clients = list(clients)
+        self._rotation = itertools.cycle(self.clients)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_urls(cls, redis_urls: t.Iterable[str]) -> "ComputeRedisReplicaPool":
+        """Construct a pool with a default client for each replica URL"""
+        return cls([default_redis_connection_factory(url) for url in redis_urls])
+
+    def __repr__(self) -> str:
+        return f"ComputeRedisReplicaPool({self.clients})"
+
+    def next_client(self) -> "redis.Redis[t.Any]":
+        with self._lock:
+            return next(self._rotation)
+
+    def __getattr__(self, name: str) -> t.Any:
+        return getattr(self.next_client(), name)
+
+
 @contextlib.contextmanager
 def redis_connection_error_logging(
     redis_client: "redis.Redis[t.Any]",
@@ -1,3 +1,4 @@
+import contextlib
 import typing as t
 
 from .serde import DEFAULT_SERDE, ComputeRedisSerde
@@ -5,6 +6,28 @@ from .serde import DEFAULT_SERDE, ComputeRedisSerde
 _null_key = "__NULL_KEY__"
 
 
+def _read_client(owner: t.Any) -> t.Any:
+    replica = getattr(owner, "redis_replica_client", None)
+    if replica is None or getattr(owner, "redis_read_primary", False):
+        return owner.redis_client
+    return replica
+
+
+@contextlib.contextmanager
+def read_from_primary(owner: t.Any) -> t.Iterator[None]:
+    """
+    Within the block, read the owner's fields from its primary ``redis_client``
+    rather than from its replica. Use this to read data which has just been written,
+    and which may not yet have reached the replica.
+    """
+    previous = getattr(owner, "redis_read_primary", False)
+    owner.redis_read_primary = True
+    try:
+        yield
+    finally:
+        owner.redis_read_primary = previous
+
+
 class RedisField:
     """
     Descriptor class that stores data in redis.
@@ -13,13 +36,37 @@ class RedisField:
     owner's hname in `owner.hname` to uniquely identify the keys.
 
     Fields can be serialized and deserialized by setting a ComputeRedisSerde.
+
+    Fields may also define a short ``compact_key`` and a ``compact_serde``. These
+    are used for writes when the owner sets ``COMPACT_STORAGE = True``, in order to
+    reduce the memory used by each hash. In that mode, reads check the compact key
+    first and fall back to the legacy key, so data written in either layout can be
+    read.
+
+    If the owner has a ``_redis_field_cache`` dict which is not None, it is treated
+    as a snapshot of the raw hash contents: reads are served from it without
+    contacting redis, and writes go to redis and update the snapshot.
+
+    If the owner has a ``_write_redis_field`` method, it is called with the field
+    and value to perform writes, rather than writing directly.
+
+    If the owner has a ``redis_replica_client`` which is not None, reads are sent to
+    it rather than to ``redis_client``, unless the owner's ``redis_read_primary`` is
+    True (see ``read_from_primary()``). Writes always go to ``redis_client``.
     """
 
-    # TODO: have a cache and TTL on the properties so that we aren't making so many
-    #       redis gets?
-    def __init__(self, serde: ComputeRedisSerde = DEFAULT_SERDE) -> None:
+    # TODO: have a TTL on the snapshot so that it can't become arbitrarily stale?
+    def __init__(
+        self,
+        serde: ComputeRedisSerde = DEFAULT_SERDE,
+        *,
+        compact_key: t.Optional[str] = None,
+        compact_serde: t.Optional[ComputeRedisSerde] = None,
+    ) -> None:
         self.serde = serde
         self.key: str = _null_key  # will be overwritten
+        self.compact_key = compact_key
+        self.compact_serde = compact_serde or serde
 
     def _check_null_key(self) -> None:
         if self.key == "__NULL_KEY__":
@@ -29,14 +76,161 @@ class RedisField:
                 "metaclass to HasRedisFieldsMeta."
             )
 
+    def _is_compact(self, owner: t.Any) -> bool:
+        return self.compact_key is not None and getattr(owner, "COMPACT_STORAGE", False)
+
+    def storage_keys(self, owner: t.Any) -> t.List[str]:
+        """
+        The hash keys from which this field is read, in order of preference.
+        The first key is the one which is written.
+
+        ``owner`` may be an instance or a class.
+        """
+        if self._is_compact(owner):
+            return [t.cast(str, self.compact_key), self.key]
+        return [self.key]
+
+    def serialize_for(self, owner: t.Any, val: t.Any) -> t.Tuple[str, str]:
+        """Serialize a value for storage, returning the hash key and the data"""
+        if self._is_compact(owner):
+            return t.cast(str, self.compact_key), self.compact_serde.serialize(val)
+        return self.key, self.serde.serialize(val)
+
+    def deserialize_from(
+        self, owner: t.Any, data: t.Mapping[str, t.Optional[str]]
+    ) -> t.Any:
+        """Read this field's value from a mapping of raw hash data"""
+        for key in self.storage_keys(owner):
+            value = data.get(key)
+            if value is not None:
+                serde = self.compact_serde if key == self.compact_key else self.serde
+                return serde.deserialize(value)
+        return None
+
+    def write(self, owner: t.Any, client: t.Any, val: t.Any) -> None:
+        """
+        Issue the commands to write a value using the given client or pipeline.
+        Any data stored under this field's other storage keys is removed.
+        """
+        key, serialized = self.serialize_for(owner, val)
+        client.hset(owner.hname, key, serialized)
+        stale_keys = self.storage_keys(owner)[1:]
+        if stale_keys:
+            client.hdel(owner.hname, *stale_keys)
+
+    def store(self, owner: t.Any, val: t.Any) -> None:
+        """Write a value using the owner's redis client, in a single round trip"""
+        if len(self.storage_keys(owner)) == 1:
+            self.write(owner, owner.redis_client, val)
+        else:
+            with owner.redis_client.pipeline(transaction=False) as pipe:
+                self.write(owner, pipe, val)
+                pipe.execute()
+
     def __get__(self, owner: t.Any, ownertype: t.Type[t.Any]) -> t.Any:
         self._check_null_key()
-        value = owner.redis_client.hget(owner.hname, self.key)
-        return None if value is None else self.serde.deserialize(value)
+        cache = getattr(owner, "_redis_field_cache", None)
+        if cache is not None:
+            return self.deserialize_from(owner, cache)
+
+        client = _read_client(owner)
+        keys = self.storage_keys(owner)
+        if len(keys) == 1:
+            value = client.hget(owner.hname, self.key)
+            return None if value is None else self.serde.deserialize(value)
+        values = client.hmget(owner.hname, keys)
+        return self.deserialize_from(owner, dict(zip(keys, values)))
 
     def __set__(self, owner: t.Any, val: t.Any) -> None:
         self._check_null_key()
-        owner.redis_client.hset(owner.hname, self.key, self.serde.serialize(val))
+        write_field = getattr(owner, "_write_redis_field", None)
+        if write_field is not None:
+            write_field(self, val)
+        else:
+            self.store(owner, val)
+        self.update_snapshot(owner, val)
+
+    def update_snapshot(self, owner: t.Any, val: t.Any) -> None:
+        """
+        Record a value which was written by other means (e.g. a script) in the
+        owner's snapshot, if it has one.
+        """
+        cache = getattr(owner, "_redis_field_cache", None)
+        if cache is not None:
+            key, serialized = self.serialize_for(owner, val)
+            for stale_key in self.storage_keys(owner)[1:]:
+                cache.pop(stale_key, None)
+            cache[key] = serialized
+
+
+class BoundAsyncRedisField:
+    """
+    An AsyncRedisField bound to a specific owner object.
+
+    Provides awaitable ``get()`` and ``set()`` in place of attribute access. As for
+    RedisField, an owner's ``_redis_field_cache`` snapshot serves reads and is
+    updated by writes, and an owner's ``_write_redis_field`` method, which must be
+    a coroutine function here, performs writes.
+    """
+
+    def __init__(self, field: "AsyncRedisField", owner: t.Any) -> None:
+        self.field = field
+        self.owner = owner
+
+    async def get(self) -> t.Any:
+        cache = getattr(self.owner, "_redis_field_cache", None)
+        if cache is not None:
+            return self.field.deserialize_from(self.owner, cache)
+
+        client = _read_client(self.owner)
+        keys = self.field.storage_keys(self.owner)
+        if len(keys) == 1:
+            values = [await client.hget(self.owner.hname, keys[0])]
+        else:
+            values = await client.hmget(self.owner.hname, keys)
+        return self.field.deserialize_from(self.owner, dict(zip(keys, values)))
+
+    async def set(self, val: t.Any) -> None:
+        write_field = getattr(self.owner, "_write_redis_field", None)
+        if write_field is not None:
+            await write_field(self.field, val)
+        else:
+            await self.field.store_async(self.owner, val)
+        self.field.update_snapshot(self.owner, val)
+
+
+class AsyncRedisField(RedisField):
+    """
+    Descriptor class that stores data in redis, using a `redis.asyncio` client.
+
+    Attribute access cannot be awaited, so reading the attribute from an instance
+    returns a BoundAsyncRedisField, as in
+
+      >>> value = await obj.foo.get()
+      >>> await obj.foo.set(value)
+
+    Keys and serdes are handled exactly as for RedisField.
+    """
+
+    def __get__(self, owner: t.Any, ownertype: t.Type[t.Any]) -> BoundAsyncRedisField:
+        self._check_null_key()
+        return BoundAsyncRedisField(self, owner)
+
+    async def store_async(self, owner: t.Any, val: t.Any) -> None:
+        """As ``store()``, with the owner's asyncio redis client"""
+        if len(self.storage_keys(owner)) == 1:
+            key, serialized = self.serialize_for(owner, val)
+            await owner.redis_client.hset(owner.hname, key, serialized)
+        else:
+            async with owner.redis_client.pipeline(transaction=False) as pipe:
+                self.write(owner, pipe, val)
+                await pipe.execute()
+
+    def __set__(self, owner: t.Any, val: t.Any) -> None:
+        raise AttributeError(
+            f"Cannot assign to AsyncRedisField '{self.key}'. "
+            f"Use 'await obj.{self.key}.set(value)' instead."
+        )
 
 
 class HasRedisFieldsMeta(type):
@@ -47,13 +241,21 @@ class HasRedisFieldsMeta(type):
 
     This inspects all class attributes and sets the keys on RedisField
     attributes to be the same as their attribute name.
+
+    All RedisFields of the class, including inherited ones, are recorded in the
+    ``_redis_fields`` class attribute, a dict mapping attribute names to fields.
     """
 
     # don't type check __new__ -- metaclasses are hard for mypy
     def __new__(mcls, classname, bases, class_attrs):  # type: ignore
+        redis_fields: t.Dict[str, RedisField] = {}
+        for base in reversed(bases):
+            redis_fields.update(getattr(base, "_redis_fields", {}))
         for attrname, value in class_attrs.items():
             if isinstance(value, RedisField):
                 value.key = attrname
+                redis_fields[attrname] = value
+        class_attrs["_redis_fields"] = redis_fields
         return super().__new__(mcls, classname, bases, class_attrs)
 
 
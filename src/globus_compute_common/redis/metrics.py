@@ -0,0 +1,328 @@
+import bisect
+import collections
+import threading
+import time
+import typing as t
+
+from .connection import default_redis_connection_factory
+
+if t.TYPE_CHECKING:
+    import redis
+
+    from ..redis_task import RedisTask
+
+# the queues used by ComputeRedisPubSub and ComputeEndpointTaskQueue; these are
+# matched here, rather than imported, because those modules record their counts
+# in this one
+_PUBSUB_QUEUE_PREFIX = "task_queue_"
+_TASK_QUEUE_PREFIX = "task_"
+_TASK_QUEUE_SUFFIX = "_list"
+
+PUBSUB_QUEUE = "pubsub"
+TASK_QUEUE = "task_queue"
+
+DEFAULT_DEPTH_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+DEFAULT_AGE_BUCKETS = (1, 5, 15, 60, 300, 900, 3600)
+
+
+class ComputeRedisQueueCounters:
+    """
+    Thread-safe counts of the tasks enqueued and dequeued for each endpoint.
+
+    Counts are recorded once per call, e.g. once for a whole batch, so that
+    counting adds no per-task overhead.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._enqueued: t.Counter[str] = collections.Counter()
+        self._dequeued: t.Counter[str] = collections.Counter()
+
+    def __repr__(self) -> str:
+        return (
+            f"ComputeRedisQueueCounters(enqueued={sum(self._enqueued.values())}, "
+            f"dequeued={sum(self._dequeued.values())})"
+        )
+
+    def record_enqueued(self, endpoint_id: str, count: int = 1) -> None:
+        if count:
+            with self._lock:
+                self._enqueued[endpoint_id] += count
+
+    def record_dequeued(self, endpoint_id: str, count: int = 1) -> None:
+        if count:
+            with self._lock:
+                self._dequeued[endpoint_id] += count
+
+    def snapshot(self) -> t.Tuple[t.Dict[str, int], t.Dict[str, int]]:
+        """Get copies of the enqueued and dequeued counts, by endpoint"""
+        with self._lock:
+            return dict(self._enqueued), dict(self._dequeued)
+
+
+# the counters to which queues record their counts by default
+QUEUE_COUNTERS = ComputeRedisQueueCounters()
+
+
+class ComputeRedisHistogram:
+    """
+    A histogram of observed values, in buckets with the given upper bounds, plus a
+    final bucket for larger values.
+    """
+
+    def __init__(self, buckets: t.Iterable[float]) -> None:
+        self.buckets: t.Tuple[float, ...] = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def __repr__(self) -> str:
+        return f"ComputeRedisHistogram(buckets={self.buckets}, count={self.count})"
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> t.List[t.Tuple[float, int]]:
+        """
+        Get ``(upper_bound, count)`` pairs, where each count includes all values no
+        greater than its bound, as used by Prometheus.
+        """
+        total = 0
+        cumulative = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+class QueueSample(t.NamedTuple):
+    endpoint_id: str
+    queue_name: str
+    # PUBSUB_QUEUE or TASK_QUEUE
+    kind: str
+    depth: int
+    head_task_id: t.Optional[str]
+    # the age, in seconds, of the task at the head of the queue; 0 for an empty
+    # queue
+    head_age: float
+
+
+class QueueMetrics(t.NamedTuple):
+    time: float
+    queues: t.List[QueueSample]
+    depth_histogram: ComputeRedisHistogram
+    head_age_histogram: ComputeRedisHistogram
+    # tasks per second, by endpoint, since the previous collection
+    enqueue_rates: t.Dict[str, float]
+    dequeue_rates: t.Dict[str, float]
+
+    @property
+    def total_depth(self) -> int:
+        return sum(sample.depth for sample in self.queues)
+
+    @property
+    def max_head_age(self) -> float:
+        return max((sample.head_age for sample in self.queues), default=0.0)
+
+
+def _sharded_pubsub_queue_name(endpoint_id: str) -> str:
+    return f"{_PUBSUB_QUEUE_PREFIX}{{{endpoint_id}}}"
+
+
+def _parse_queue_name(name: str) -> t.Optional[t.Tuple[str, str]]:
+    # get the kind of a queue and its endpoint ID, or None if it is not a queue
+    if name.startswith(_PUBSUB_QUEUE_PREFIX):
+        endpoint_id = name[len(_PUBSUB_QUEUE_PREFIX) :]
+        if endpoint_id.startswith("{") and endpoint_id.endswith("}"):
+            endpoint_id = endpoint_id[1:-1]
+        return PUBSUB_QUEUE, endpoint_id
+    if name.startswith(_TASK_QUEUE_PREFIX) and name.endswith(_TASK_QUEUE_SUFFIX):
+        return TASK_QUEUE, name[len(_TASK_QUEUE_PREFIX) : -len(_TASK_QUEUE_SUFFIX)]
+    return None
+
+
+def _rates(
+    current: t.Dict[str, int], previous: t.Dict[str, int], elapsed: float
+) -> t.Dict[str, float]:
+    if elapsed <= 0:
+        return {}
+    return {
+        endpoint_id: (count - previous.get(endpoint_id, 0)) / elapsed
+        for endpoint_id, count in current.items()
+        if count != previous.get(endpoint_id, 0)
+    }
+
+
+class ComputeRedisQueueMetricsCollector:
+    """
+    Samples the depth of endpoints' task queues, as used by ComputeRedisPubSub and
+    ComputeEndpointTaskQueue, and the rates at which tasks are enqueued and
+    dequeued, e.g. for autoscaling or detecting stuck endpoints.
+
+    Each call to ``collect()`` reads the length and head of every queue, in
+    pipelines of ``batch_size`` queues, and then the TTL of each head task. Tasks
+    are created with a TTL of ``task_class.DEFAULT_TTL``, so the age of the task at
+    the head of a queue is how much of that TTL has elapsed. Queues only hold task
+    IDs, so for a task with no TTL, e.g. one which is not a RedisTask, the age is
+    instead how long it has been observed at the head of the queue, across calls.
+
+    Without ``endpoint_ids``, the queues are found by a SCAN of the whole keyspace
+    on each collection, which visits every key, including every task's hash. This
+    is expensive on a large Redis, so ``endpoint_ids`` should be given if they are
+    known.
+
+    When ``endpoint_ids`` are given, each endpoint's ComputeRedisPubSub queue is
+    sampled under both its plain and its sharded name, but the latter is only
+    reported if it is not empty.
+
+    Rates are computed from the counts which queues record in ``counters``, and so
+    only cover queues used in this process.
+    """
+
+    def __init__(
+        self,
+        redis_client: t.Optional["redis.Redis[t.Any]"] = None,
+        *,
+        task_redis_client: t.Optional["redis.Redis[t.Any]"] = None,
+        task_class: t.Optional[t.Type["RedisTask"]] = None,
+        endpoint_ids: t.Optional[t.Iterable[str]] = None,
+        batch_size: int = 500,
+        counters: ComputeRedisQueueCounters = QUEUE_COUNTERS,
+        depth_buckets: t.Iterable[float] = DEFAULT_DEPTH_BUCKETS,
+        age_buckets: t.Iterable[float] = DEFAULT_AGE_BUCKETS,
+    ) -> None:
+        """
+        :param redis_client: the Redis client; defaults to a new default client
+        :param task_redis_client: the Redis client with which tasks are stored, if
+            not with ``redis_client``
+        :param task_class: the class of the tasks in the queues, by which their
+            hashes are found and their ages are computed; defaults to RedisTask
+        :param endpoint_ids: the endpoints whose queues are sampled, or None to find
+            all queues with SCAN on each collection
+        :param batch_size: the number of queues sampled per round trip
+        :param counters: the counters from which rates are computed
+        :param depth_buckets: the bucket bounds of the queue depth histogram
+        :param age_buckets: the bucket bounds, in seconds, of the head age histogram
+        """
+        if redis_client is None:
+            redis_client = default_redis_connection_factory()
+        self.redis_client = redis_client
+        self.task_redis_client = task_redis_client or redis_client
+        if task_class is None:
+            # imported here, since redis_task imports this package
+            from ..redis_task import RedisTask
+
+            task_class = RedisTask
+        self.task_class = task_class
+        self.endpoint_ids = None if endpoint_ids is None else list(endpoint_ids)
+        self.batch_size = batch_size
+        self.counters = counters
+        self.depth_buckets = tuple(depth_buckets)
+        self.age_buckets = tuple(age_buckets)
+
+        # the task at the head of each queue, and when it was first observed there,
+        # for tasks with no TTL
+        self._heads: t.Dict[str, t.Tuple[str, float]] = {}
+        self._last_time = time.time()
+        self._last_counts = counters.snapshot()
+
+    def __repr__(self) -> str:
+        return f"ComputeRedisQueueMetricsCollector(redis_client={self.redis_client})"
+
+    def _queue_names(self) -> t.List[str]:
+        if self.endpoint_ids is not None:
+            return [
+                name
+                for endpoint_id in self.endpoint_ids
+                for name in (
+                    f"{_PUBSUB_QUEUE_PREFIX}{endpoint_id}",
+                    _sharded_pubsub_queue_name(endpoint_id),
+                    f"{_TASK_QUEUE_PREFIX}{endpoint_id}{_TASK_QUEUE_SUFFIX}",
+                )
+            ]
+        # both kinds of queue share a prefix, so they are found with a single pass
+        # over the keyspace, and told apart here
+        return sorted(
+            name
+            for name in set(
+                self.redis_client.scan_iter(
+                    match=f"{_TASK_QUEUE_PREFIX}*", count=self.batch_size, _type="list"
+                )
+            )
+            if _parse_queue_name(name) is not None
+        )
+
+    def _sample_queues(self, now: float) -> t.List[QueueSample]:
+        names = self._queue_names()
+        samples = []
+        heads = {}
+        for i in range(0, len(names), self.batch_size):
+            batch = names[i : i + self.batch_size]
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                for name in batch:
+                    pipe.llen(name)
+                    pipe.lindex(name, 0)
+                results = pipe.execute()
+
+            batch_heads = [head for head in results[1::2] if head is not None]
+            with self.task_redis_client.pipeline(transaction=False) as pipe:
+                for head in batch_heads:
+                    pipe.ttl(self.task_class._hname(head))
+                head_ttls = dict(zip(batch_heads, pipe.execute()))
+
+            for j, name in enumerate(batch):
+                parsed = _parse_queue_name(name)
+                if parsed is None:
+                    continue
+                kind, endpoint_id = parsed
+                depth, head = results[2 * j], results[2 * j + 1]
+                if (
+                    depth == 0
+                    and self.endpoint_ids is not None
+                    and name == _sharded_pubsub_queue_name(endpoint_id)
+                ):
+                    continue
+                head_age = 0.0
+                if head is not None and head_ttls[head] >= 0:
+                    head_age = float(
+                        max(self.task_class.DEFAULT_TTL - head_ttls[head], 0)
+                    )
+                elif head is not None:
+                    previous_head, first_seen = self._heads.get(name, (None, now))
+                    if previous_head != head:
+                        first_seen = now
+                    heads[name] = (head, first_seen)
+                    head_age = now - first_seen
+                samples.append(
+                    QueueSample(endpoint_id, name, kind, depth, head, head_age)
+                )
+        self._heads = heads
+        return samples
+
+    def collect(self) -> QueueMetrics:
+        """Sample all queues, and the rates since the previous collection"""
+        now = time.time()
+        samples = self._sample_queues(now)
+
+        depth_histogram = ComputeRedisHistogram(self.depth_buckets)
+        head_age_histogram = ComputeRedisHistogram(self.age_buckets)
+        for sample in samples:
+            depth_histogram.observe(sample.depth)
+            if sample.head_task_id is not None:
+                head_age_histogram.observe(sample.head_age)
+
+        enqueued, dequeued = self.counters.snapshot()
+        last_enqueued, last_dequeued = self._last_counts
+        elapsed = now - self._last_time
+        self._last_time, self._last_counts = now, (enqueued, dequeued)
+
+        return QueueMetrics(
+            time=now,
+            queues=samples,
+            depth_histogram=depth_histogram,
+            head_age_histogram=head_age_histogram,
+            enqueue_rates=_rates(enqueued, last_enqueued, elapsed),
+            dequeue_rates=_rates(dequeued, last_dequeued, elapsed),
+        )
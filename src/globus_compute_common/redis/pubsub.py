@@ -1,9 +1,16 @@
+import collections
 import logging
 import queue
+import re
+import threading
+import time
 import typing as t
 
 from ..tasks import TaskProtocol, TaskState
+from .cluster import is_cluster_client
 from .connection import default_redis_connection_factory
+from .metrics import QUEUE_COUNTERS, ComputeRedisQueueCounters
+from .scripts import ComputeRedisScript, ComputeRedisScriptRegistry
 
 if t.TYPE_CHECKING:
     import redis
@@ -14,21 +21,97 @@ _TASK_CHANNEL_PREFIX = "task_channel_"
 _TASK_CHANNEL_PREFIX_LEN = len(_TASK_CHANNEL_PREFIX)
 _TASK_QUEUE_PREFIX = "task_queue_"
 
-_ALLOWED_MESSAGE_TYPES = ("pong", "message", "pmessage")
+_TASK_CHANNEL_PATTERN = f"{_TASK_CHANNEL_PREFIX}*"
+# characters with special meaning in Redis glob-style patterns
+_GLOB_SPECIAL_CHARS = re.compile(r"([\\*?\[\]])")
 
+_ALLOWED_MESSAGE_TYPES = ("pong", "message", "pmessage", "smessage")
+_TASK_MESSAGE_TYPES = ("message", "pmessage", "smessage")
+_SUBSCRIBE_MESSAGE_TYPES = ("subscribe", "psubscribe", "ssubscribe")
 
-def _channel_name(endpoint_id: str) -> str:
+
+def _channel_name(endpoint_id: str, *, sharded: bool = False) -> str:
+    # sharded channels and their queues share a hash tag, so that they are served
+    # by the same cluster node
+    if sharded:
+        return f"{_TASK_CHANNEL_PREFIX}{{{endpoint_id}}}"
     return f"{_TASK_CHANNEL_PREFIX}{endpoint_id}"
 
 
 def _channel_name_to_endpoint_id(channel: str) -> str:
-    return channel[_TASK_CHANNEL_PREFIX_LEN:]
+    endpoint_id = channel[_TASK_CHANNEL_PREFIX_LEN:]
+    if endpoint_id.startswith("{") and endpoint_id.endswith("}"):
+        return endpoint_id[1:-1]
+    return endpoint_id
+
+
+def _channel_pattern(endpoint_id: str) -> str:
+    # a pattern which matches only the endpoint's (unsharded) channel
+    return _GLOB_SPECIAL_CHARS.sub(r"\\\1", _channel_name(endpoint_id))
 
 
-def _queue_name(endpoint_id: str) -> str:
+def _queue_name(endpoint_id: str, *, sharded: bool = False) -> str:
+    if sharded:
+        return f"{_TASK_QUEUE_PREFIX}{{{endpoint_id}}}"
     return f"{_TASK_QUEUE_PREFIX}{endpoint_id}"
 
 
+# Publish a task ID to an endpoint's channel and, if there were no recipients, push
+# it onto the endpoint's queue. Because this is atomic, a subscriber cannot appear
+# between the two steps and miss the task. The task's hash may also be updated.
+#
+# KEYS[1]: the endpoint's queue name
+# KEYS[2]: optional, the task hash name
+# ARGV[1]: the endpoint's channel name
+# ARGV[2]: the task_id
+# ARGV[3]: the number, N, of field names and serialized values which follow
+# ARGV[4...3+N]: alternating field names and serialized values to set on the hash
+# ARGV[4+N...]: field names to delete from the hash
+#
+# returns the number of recipients of the published message
+_PUBLISH_OR_ENQUEUE_SCRIPT = """\
+if #KEYS > 1 then
+    local num_set = tonumber(ARGV[3])
+    if num_set > 0 then
+        redis.call("HSET", KEYS[2], unpack(ARGV, 4, 3 + num_set))
+    end
+    if #ARGV > 3 + num_set then
+        redis.call("HDEL", KEYS[2], unpack(ARGV, 4 + num_set))
+    end
+end
+local recipients = redis.call("PUBLISH", ARGV[1], ARGV[2])
+if recipients == 0 then
+    redis.call("RPUSH", KEYS[1], ARGV[2])
+end
+return recipients
+"""
+
+# As above, for sharded pubsub (Redis 7.0 or later).
+#
+# KEYS[1]: the endpoint's queue name
+# KEYS[2]: the endpoint's shard channel name, in the same slot as the queue
+# ARGV[1]: the task_id
+#
+# returns the number of recipients of the published message
+_SPUBLISH_OR_ENQUEUE_SCRIPT = """\
+local recipients = redis.call("SPUBLISH", KEYS[2], ARGV[1])
+if recipients == 0 then
+    redis.call("RPUSH", KEYS[1], ARGV[1])
+end
+return recipients
+"""
+
+PUBSUB_SCRIPTS = ComputeRedisScriptRegistry()
+PUBSUB_SCRIPTS.register("publish_or_enqueue", _PUBLISH_OR_ENQUEUE_SCRIPT)
+PUBSUB_SCRIPTS.register("spublish_or_enqueue", _SPUBLISH_OR_ENQUEUE_SCRIPT)
+
+TaskBatchCallback = t.Callable[[t.List[t.Tuple[str, str]]], None]
+
+
+def _message_to_task(message: t.Dict[str, t.Any]) -> t.Tuple[str, str]:
+    return _channel_name_to_endpoint_id(message["channel"]), message["data"]
+
+
 class ComputeRedisPubSub:
     """
     This class provides a layer over the Redis lib's `PubSub` functionality to
@@ -39,65 +122,196 @@ class ComputeRedisPubSub:
     If there is no recipient listening for a message, it is pushed into a queue instead.
     Subscribing pops all messages from the queue and puts them onto the pubsub channel.
 
+    With ``sharded=True``, Redis 7 sharded pubsub (SPUBLISH/SSUBSCRIBE) is used,
+    so that on a cluster each channel is served by one node, rather than every
+    message being broadcast to all nodes. Sharded channels and queues have
+    different names to unsharded ones, so producers and consumers must agree on
+    whether they are sharded.
+
     **IMPORTANT**
 
     Unsubscribing from a redis channel is not a synchronous operation. When
     unsubscribing, ensure clean teardown by calling ``get_final_messages()``.
     """
 
+    # the counters to which put and received tasks are recorded
+    counters: ComputeRedisQueueCounters = QUEUE_COUNTERS
+
     def __init__(
-        self, *, redis_client: t.Optional["redis.Redis[t.Any]"] = None
+        self,
+        *,
+        redis_client: t.Optional["redis.Redis[t.Any]"] = None,
+        sharded: bool = False,
     ) -> None:
         if redis_client is None:
             redis_client = default_redis_connection_factory()
         self.redis_client = redis_client
+        self.sharded = sharded
         self.pubsub = self.redis_client.pubsub()
+        # the patterns subscribed to by `subscribe_pattern()`
+        self._patterns: t.Set[str] = set()
+        # messages received while waiting for a subscription to be confirmed, or
+        # left by the listener when it was stopped
+        self._buffered_messages: t.Deque[t.Dict[str, t.Any]] = collections.deque()
+        # guards the buffered messages and `requeued_count`
+        self._buffer_lock = threading.Lock()
+
+        # state for the listener thread, if it is running; see `start_listener()`
+        self._listener: t.Optional[threading.Thread] = None
+        self._listener_stop = threading.Event()
+        self._listener_wakeup = threading.Event()
+        self._listener_callback: t.Optional[TaskBatchCallback] = None
+        self._listener_queue: "queue.Queue[t.Tuple[str, str]]" = queue.Queue()
+        self._listener_batch_size = 1
+        self._listener_put_timeout: t.Optional[float] = None
+        self._pending_confirmations: t.Dict[str, threading.Event] = {}
+        # set while the listener holds messages which it has not yet delivered
+        self._listener_holding = False
+        # the number of tasks returned to their queues, because the listener's local
+        # queue was full or because they were buffered when their channels were
+        # unsubscribed from
+        self.requeued_count = 0
 
     def __repr__(self) -> str:
-        return f"ComputeRedisPubSub(redis_client={self.redis_client})"
+        attr_str = f"redis_client={self.redis_client}"
+        if self.sharded:
+            attr_str += ",sharded=True"
+        return f"ComputeRedisPubSub({attr_str})"
+
+    def _channel(self, endpoint_id: str) -> str:
+        return _channel_name(endpoint_id, sharded=self.sharded)
+
+    def _queue(self, endpoint_id: str) -> str:
+        return _queue_name(endpoint_id, sharded=self.sharded)
 
     @property
     def subscribed(self) -> bool:
         return bool(self.pubsub.subscribed)
 
+    @property
+    def listening(self) -> bool:
+        return self._listener is not None
+
+    def _put_script_params(
+        self, endpoint_id: str, task: TaskProtocol
+    ) -> t.Dict[str, t.List[t.Any]]:
+        """
+        Update the task object, and get the parameters for the publish-or-enqueue
+        script.
+
+        If the task's status is stored in a Redis hash (as for RedisTask) on the
+        same Redis as the channel, the script writes it, rather than it being
+        written separately. Otherwise, e.g. if tasks are stored on another Redis,
+        the status is set on the task, as usual. Nor is this possible on a cluster,
+        where the hash and queue are in different slots, or if the status is
+        indexed, since indexes must be updated along with it.
+        """
+        task.endpoint = endpoint_id
+        if self.sharded:
+            task.status = TaskState.WAITING_FOR_EP
+            return {
+                "keys": [self._queue(endpoint_id), self._channel(endpoint_id)],
+                "args": [task.task_id],
+            }
+
+        keys = [_queue_name(endpoint_id)]
+        args: t.List[t.Any] = [_channel_name(endpoint_id), task.task_id]
+
+        status_field = getattr(type(task), "_redis_fields", {}).get("status")
+        if (
+            status_field is None
+            or getattr(task, "redis_client", None) is not self.redis_client
+            or "status" in getattr(task, "INDEXED_FIELDS", ())
+            or is_cluster_client(self.redis_client)
+        ):
+            task.status = TaskState.WAITING_FOR_EP
+            args.append(0)
+        else:
+            key, serialized = status_field.serialize_for(task, TaskState.WAITING_FOR_EP)
+            keys.append(task.hname)  # type: ignore[attr-defined]
+            args.extend([2, key, serialized])
+            args.extend(status_field.storage_keys(task)[1:])
+            status_field.update_snapshot(task, TaskState.WAITING_FOR_EP)
+        return {"keys": keys, "args": args}
+
+    @property
+    def _put_script(self) -> ComputeRedisScript:
+        name = "spublish_or_enqueue" if self.sharded else "publish_or_enqueue"
+        return PUBSUB_SCRIPTS[name]
+
     def put(self, endpoint_id: str, task: TaskProtocol) -> int:
         """
         Put the task ID into the channel for the endpoint.
 
-        Returns the number of receipients who got the message.
-        """
-        # update the task object
-        task.endpoint = endpoint_id
-        task.status = TaskState.WAITING_FOR_EP
+        If there are no recipients for the task ID, it is put into the task queue
+        for the endpoint, so that it can be republished when something subscribes
+        to the endpoint channel. The task's status is set to WAITING_FOR_EP.
 
-        # do the "main" publish step and record the number of recipients
-        recipients = self.redis_client.publish(_channel_name(endpoint_id), task.task_id)
+        Publishing, queueing, and (for RedisTasks) writing the status are done
+        atomically, in a single round trip.
 
-        # if there were no recipients for the published task_id, put it into
-        # the task queue for that endpoint_id
-        # when something subscribes to the endpoint channel, it can be
-        # republished from there
-        if recipients == 0:
-            self.redis_client.rpush(_queue_name(endpoint_id), task.task_id)
+        Returns the number of receipients who got the message.
+        """
+        recipients = self._put_script(
+            self.redis_client, **self._put_script_params(endpoint_id, task)
+        )
+        self.counters.record_enqueued(endpoint_id)
+        return t.cast(int, recipients)
 
-        return recipients
+    def put_many(
+        self, endpoint_id: str, tasks: t.Iterable[TaskProtocol]
+    ) -> t.List[int]:
+        """
+        Put many tasks, e.g. a task group, into the channel for the endpoint, as with
+        ``put()``, in a single pipeline.
 
-    def republish_from_queue(self, endpoint_id: str) -> None:
+        Returns the number of recipients who got each task's message, in order.
+        """
+        script = self._put_script
+        params = [self._put_script_params(endpoint_id, task) for task in tasks]
+        if not params:
+            return []
+        script.ensure_loaded(self.redis_client)
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for task_params in params:
+                script.queue(pipe, **task_params)
+            results = pipe.execute()
+        self.counters.record_enqueued(endpoint_id, len(results))
+        return [int(recipients) for recipients in results]
+
+    def republish_from_queue(
+        self,
+        endpoint_id: str,
+        *,
+        batch_size: int = 1000,
+        limit: t.Optional[int] = None,
+    ) -> int:
         """
         Tasks pushed to Redis pubsub channels might have gone unreceived.
         When a new endpoint registers, it should republish tasks from it's queues
         to the pubsub channels.
+
+        Task IDs are popped ``batch_size`` at a time (with ``LPOP count``, which
+        requires Redis 6.2) and each batch is published in a single pipeline. This
+        returns as soon as the queue is empty.
+
+        :param endpoint_id: the endpoint whose queue is drained
+        :param batch_size: the maximum number of task IDs popped per round trip
+        :param limit: the maximum number of task IDs to republish, or None to drain
+            the whole queue
+        :returns: the number of task IDs which were republished
         """
-        # NOTE: this could block for an arbitrarily long period of time
-        # if this becomes an issue, we can add a limit and batch the
-        # resubmissions
-        q = _queue_name(endpoint_id)
-        channel = _channel_name(endpoint_id)
+        q = self._queue(endpoint_id)
+        channel = self._channel(endpoint_id)
 
-        # loop "until" trying to pop an item returns None
-        queue_item = self.redis_client.blpop(q, timeout=1)
-        while queue_item:
-            task_list, task_id = queue_item
+        republished = 0
+        while limit is None or republished < limit:
+            count = (
+                batch_size if limit is None else min(batch_size, limit - republished)
+            )
+            task_ids = t.cast(t.Optional[t.List[str]], self.redis_client.lpop(q, count))
+            if not task_ids:
+                break
 
             # TODO: fix the fact that this does not check the number of
             # subscribers who received the message
@@ -105,32 +319,276 @@ class ComputeRedisPubSub:
             # this to be used by a client to get messages sent to itself for
             # later use in `get()` calls
             # if the publish step fails, it's not clear what that would mean
-            # however, we could add an LPUSH call here to put the task_id back
+            # however, we could add an LPUSH call here to put the task_ids back
             # into the queue
-            self.redis_client.publish(channel, task_id)
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                for task_id in task_ids:
+                    self._queue_publish(pipe, channel, task_id)
+                pipe.execute()
+
+            republished += len(task_ids)
+            if len(task_ids) < count:
+                # the queue is now empty
+                break
+        return republished
+
+    def _queue_publish(self, pipe: t.Any, channel: str, task_id: str) -> None:
+        if self.sharded:
+            pipe.spublish(channel, task_id)
+        else:
+            pipe.publish(channel, task_id)
+
+    def republish_from_queues(
+        self, endpoint_ids: t.Iterable[str], *, batch_size: int = 1000
+    ) -> int:
+        """
+        Republish the queued tasks of many endpoints, as with
+        ``republish_from_queue()``.
+
+        The queues are drained together: each round pops a batch from every queue
+        which is not yet empty in one pipeline, and publishes them in another, so
+        the number of round trips depends upon the longest queue, not the number of
+        endpoints.
+
+        :returns: the total number of task IDs which were republished
+        """
+        active = list(dict.fromkeys(endpoint_ids))
+        republished = 0
+        while active:
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                for endpoint_id in active:
+                    pipe.lpop(self._queue(endpoint_id), batch_size)
+                popped = pipe.execute()
+
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                for endpoint_id, task_ids in zip(active, popped):
+                    for task_id in task_ids or ():
+                        self._queue_publish(pipe, self._channel(endpoint_id), task_id)
+                pipe.execute()
+
+            republished += sum(len(task_ids or ()) for task_ids in popped)
+            # queues which returned a full batch may have more task IDs
+            active = [
+                endpoint_id
+                for endpoint_id, task_ids in zip(active, popped)
+                if task_ids and len(task_ids) == batch_size
+            ]
+        return republished
+
+    def _read_pubsub(self, timeout: float) -> t.Optional[t.Dict[str, t.Any]]:
+        if self.sharded:
+            return t.cast(
+                t.Optional[t.Dict[str, t.Any]],
+                self.pubsub.get_sharded_message(  # type: ignore[attr-defined]
+                    timeout=timeout
+                ),
+            )
+        return self.pubsub.get_message(timeout=timeout)
+
+    def _await_subscriptions(self, channels: t.Sequence[str], timeout: float) -> None:
+        # until the server confirms a subscription, messages published to the
+        # channel are not received, so wait for confirmation before republishing
+        # other messages which arrive in the meantime are kept for `get()`
+        deadline = time.monotonic() + timeout
+        pending = set(channels)
+        if self.listening:
+            # the listener thread reads the confirmations
+            for channel in channels:
+                confirmation = self._pending_confirmations.get(channel)
+                if confirmation is None or confirmation.wait(
+                    max(deadline - time.monotonic(), 0)
+                ):
+                    pending.discard(channel)
+            for channel in pending:
+                self._pending_confirmations.pop(channel, None)
+        else:
+            while pending and time.monotonic() < deadline:
+                message = self._read_pubsub(deadline - time.monotonic())
+                if message is None:
+                    continue
+                if message.get("type") in _SUBSCRIBE_MESSAGE_TYPES:
+                    pending.discard(message["channel"])
+                elif message.get("type") in _ALLOWED_MESSAGE_TYPES:
+                    with self._buffer_lock:
+                        self._buffered_messages.append(message)
+        if pending:
+            log.warning(
+                "%d subscriptions, e.g. to %s, were not confirmed within %ss",
+                len(pending),
+                next(iter(pending)),
+                timeout,
+            )
 
-            # pop the next item
-            queue_item = self.redis_client.blpop(q, timeout=1)
+    def _subscribe_channels(self, channels: t.Sequence[str], timeout: float) -> None:
+        if self.listening:
+            for channel in channels:
+                self._pending_confirmations[channel] = threading.Event()
+        if self.sharded:
+            self.pubsub.ssubscribe(*channels)  # type: ignore[attr-defined]
+        else:
+            self.pubsub.subscribe(*channels)
+        self._listener_wakeup.set()
+        self._await_subscriptions(channels, timeout)
+
+    def subscribe(self, endpoint_id: str, *, confirm_timeout: float = 5) -> None:
+        """
+        Subscribe to an endpoint's channel, and republish any tasks which were
+        queued for it.
 
-    def subscribe(self, endpoint_id: str) -> None:
-        channel = _channel_name(endpoint_id)
+        :param endpoint_id: the endpoint to subscribe to
+        :param confirm_timeout: the number of seconds to wait for the subscription to
+            be confirmed before republishing
+        """
+        channel = self._channel(endpoint_id)
         log.info("subscribing to %s", channel)
 
-        self.pubsub.subscribe(channel)
-        self.republish_from_queue(endpoint_id)
+        self._subscribe_channels([channel], confirm_timeout)
+        num_republished = self.republish_from_queue(endpoint_id)
+        log.debug("republished %d queued tasks to %s", num_republished, channel)
+
+    def subscribe_many(
+        self,
+        endpoint_ids: t.Iterable[str],
+        *,
+        confirm_timeout: float = 5,
+        chunk_size: int = 1000,
+    ) -> None:
+        """
+        Subscribe to many endpoints' channels, and republish any tasks which were
+        queued for them, as with ``subscribe()``.
+
+        Channels are subscribed to ``chunk_size`` at a time, with one command per
+        chunk, and the queues are drained together by ``republish_from_queues()``.
+
+        :param endpoint_ids: the endpoints to subscribe to
+        :param confirm_timeout: the number of seconds to wait for each chunk of
+            subscriptions to be confirmed before republishing
+        :param chunk_size: the maximum number of channels per command
+        """
+        endpoint_ids = list(dict.fromkeys(endpoint_ids))
+        log.info("subscribing to %d endpoint channels", len(endpoint_ids))
+        for i in range(0, len(endpoint_ids), chunk_size):
+            channels = [self._channel(e) for e in endpoint_ids[i : i + chunk_size]]
+            self._subscribe_channels(channels, confirm_timeout)
+        num_republished = self.republish_from_queues(endpoint_ids)
+        log.debug("republished %d queued tasks", num_republished)
+
+    def subscribe_pattern(
+        self,
+        endpoint_ids: t.Optional[t.Iterable[str]] = None,
+        *,
+        confirm_timeout: float = 5,
+        chunk_size: int = 1000,
+    ) -> None:
+        """
+        Subscribe to endpoints' channels with pattern subscriptions (PSUBSCRIBE),
+        rather than subscribing to each channel.
+
+        If ``endpoint_ids`` is given, each endpoint's channel is matched by its own
+        pattern, subscribed to ``chunk_size`` at a time, and the endpoints' queues
+        are republished. Otherwise, the channels of all endpoints are matched by a
+        single pattern, and no queues are republished.
+
+        Redis delivers a message to every subscriber whose patterns or channels
+        match, and ``put()`` counts each of them as a recipient, so tasks are only
+        queued when no subscriber matches their endpoint. Subscribers to all
+        endpoints therefore receive every task, including those which other
+        subscribers also receive, and this should not be combined with
+        ``subscribe()`` of the same endpoints, which would deliver their tasks
+        twice. Sharded pubsub does not support pattern subscriptions.
+
+        :param endpoint_ids: the endpoints whose tasks are received, or None for all
+        :param confirm_timeout: the number of seconds to wait for each chunk of
+            subscriptions to be confirmed before republishing
+        :param chunk_size: the maximum number of patterns per command
+        """
+        if self.sharded:
+            raise ValueError("Pattern subscriptions are not supported when sharded")
+        if endpoint_ids is None:
+            log.info("subscribing to %s", _TASK_CHANNEL_PATTERN)
+            patterns = [_TASK_CHANNEL_PATTERN]
+        else:
+            endpoint_ids = list(dict.fromkeys(endpoint_ids))
+            log.info("subscribing to %d endpoint channel patterns", len(endpoint_ids))
+            patterns = [_channel_pattern(e) for e in endpoint_ids]
+
+        for i in range(0, len(patterns), chunk_size):
+            chunk = patterns[i : i + chunk_size]
+            if self.listening:
+                for pattern in chunk:
+                    self._pending_confirmations[pattern] = threading.Event()
+            self.pubsub.psubscribe(*chunk)
+            self._patterns.update(chunk)
+            self._listener_wakeup.set()
+            self._await_subscriptions(chunk, confirm_timeout)
+        if endpoint_ids:
+            num_republished = self.republish_from_queues(endpoint_ids)
+            log.debug("republished %d queued tasks", num_republished)
 
     def unsubscribe(self, endpoint_id: str) -> None:
-        channel = _channel_name(endpoint_id)
+        """
+        Unsubscribe from an endpoint's channel. Tasks for the endpoint which were
+        buffered, but not yet returned by ``get()``, are returned to its queue.
+        """
+        channel = self._channel(endpoint_id)
         log.info("unsubscribing from %s", channel)
-        self.pubsub.unsubscribe(channel)
+        if self.sharded:
+            self.pubsub.sunsubscribe(channel)  # type: ignore[attr-defined]
+        else:
+            self.pubsub.unsubscribe(channel)
+        self._requeue_buffered(
+            lambda m: m.get("type") != "pmessage" and m["channel"] == channel
+        )
+
+    def unsubscribe_pattern(self) -> None:
+        """
+        Unsubscribe from all of the patterns subscribed to by
+        ``subscribe_pattern()``. Tasks received through them which were buffered,
+        but not yet returned by ``get()``, are returned to their queues.
+        """
+        log.info("unsubscribing from %d patterns", len(self._patterns))
+        if self._patterns:
+            self.pubsub.punsubscribe(*self._patterns)
+            self._patterns.clear()
+        self._requeue_buffered(lambda m: m.get("type") == "pmessage")
+
+    def _requeue(self, tasks: t.Sequence[t.Tuple[str, str]]) -> None:
+        # push tasks back onto their endpoints' queues, as if they had no recipients
+        if not tasks:
+            return
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for endpoint_id, task_id in tasks:
+                pipe.rpush(self._queue(endpoint_id), task_id)
+            pipe.execute()
+        with self._buffer_lock:
+            self.requeued_count += len(tasks)
+
+    def _requeue_buffered(
+        self, predicate: t.Callable[[t.Dict[str, t.Any]], bool]
+    ) -> None:
+        # requeue the buffered messages which match a predicate, since once their
+        # channels are unsubscribed from, `get()` may no longer return them
+        with self._buffer_lock:
+            kept: t.Deque[t.Dict[str, t.Any]] = collections.deque()
+            requeued = []
+            for message in self._buffered_messages:
+                if message.get("type") in _TASK_MESSAGE_TYPES and predicate(message):
+                    requeued.append(_message_to_task(message))
+                else:
+                    kept.append(message)
+            self._buffered_messages = kept
+        self._requeue(requeued)
 
     def _get_message(self, timeout: float) -> t.Optional[t.Dict[str, t.Any]]:
         # skip any subscribe/unsubscribe messages, but do not use the
         # 'ignore_subscribe_messages' flag because it behaves by returning
         # `None` rather than advancing to the next message
-        message = self.pubsub.get_message(timeout=timeout)
+        with self._buffer_lock:
+            if self._buffered_messages:
+                return self._buffered_messages.popleft()
+        message = self._read_pubsub(timeout)
         while message is not None and message.get("type") not in _ALLOWED_MESSAGE_TYPES:
-            message = self.pubsub.get_message(timeout=timeout)
+            message = self._read_pubsub(timeout)
         return message
 
     def get(self, *, timeout: int = 2) -> t.Tuple[str, str]:
@@ -138,22 +596,215 @@ class ComputeRedisPubSub:
         :param timeout: wait time for getting a message, in milliseconds
         :type timeout: int
         """
+        if self.listening:
+            try:
+                endpoint_id, task_id = self._listener_queue.get(timeout=timeout / 1000)
+            except queue.Empty:
+                raise queue.Empty("Channels empty") from None
+        else:
+            if not self.subscribed:
+                raise queue.Empty
+
+            message = self._get_message(timeout / 1000)
+            if not message:
+                raise queue.Empty("Channels empty")
+            endpoint_id, task_id = _message_to_task(message)
+
+        self.counters.record_dequeued(endpoint_id)
+        return endpoint_id, task_id
+
+    def get_many(
+        self, max_items: int, *, timeout: int = 2
+    ) -> t.List[t.Tuple[str, str]]:
+        """
+        Get up to ``max_items`` messages, waiting for up to ``timeout`` milliseconds
+        for the first one, and returning those which have already arrived after
+        that. Returns an empty list if there are none.
+        """
+        try:
+            messages = [self.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(messages) < max_items:
+            try:
+                messages.append(self.get(timeout=0))
+            except queue.Empty:
+                break
+        return messages
+
+    def start_listener(
+        self,
+        callback: t.Optional[TaskBatchCallback] = None,
+        *,
+        max_queued: int = 10000,
+        put_timeout: t.Optional[float] = None,
+        batch_size: int = 100,
+        poll_interval: float = 0.5,
+    ) -> None:
+        """
+        Start a daemon thread which reads messages from the subscribed channels,
+        so that they need not be polled for.
+
+        Messages are read in batches of up to ``batch_size`` of those which have
+        arrived. If ``callback`` is given, it is called from the listener thread with
+        each batch, as a list of ``(endpoint_id, task_id)`` pairs. Otherwise, they
+        are put into a local queue of up to ``max_queued`` messages, which are
+        returned by ``get()`` and ``get_many()``.
+
+        When the local queue is full, the listener waits for space, so that Redis
+        buffers further messages. If ``put_timeout`` is given and no space is made
+        within that many seconds, the task is instead pushed back onto its
+        endpoint's queue, as if it had no recipients, to be republished later by
+        ``republish_from_queue()``.
+
+        ``subscribe()`` and ``unsubscribe()`` may be called while listening.
+
+        :param callback: called with each batch of messages
+        :param max_queued: the size of the local queue
+        :param put_timeout: how long, in seconds, to wait for space in the local
+            queue before returning a task to Redis, or None to wait indefinitely
+        :param batch_size: the maximum number of messages per batch
+        :param poll_interval: how often, in seconds, the listener checks whether it
+            has been stopped
+        """
+        if self.listening:
+            raise RuntimeError("The listener is already running")
+        self._listener_callback = callback
+        self._listener_queue = queue.Queue(maxsize=max_queued)
+        self._listener_put_timeout = put_timeout
+        self._listener_batch_size = batch_size
+        self._listener_stop.clear()
+        self._listener = threading.Thread(
+            target=self._listen,
+            args=(poll_interval,),
+            name="compute-redis-pubsub-listener",
+            daemon=True,
+        )
+        self._listener.start()
+
+    def stop_listener(self) -> None:
+        """
+        Stop the listener thread, if it is running, and wait for it to finish.
+        Messages in the local queue remain available to ``get()`` while subscribed,
+        or are otherwise returned to their queues.
+        """
+        listener = self._listener
+        if listener is None:
+            return
+        self._listener_stop.set()
+        self._listener_wakeup.set()
+        listener.join()
+        self._listener = None
+
+        # return any messages which the listener had not delivered to `get()`
+        undelivered = []
+        while True:
+            try:
+                undelivered.append(self._listener_queue.get_nowait())
+            except queue.Empty:
+                break
         if not self.subscribed:
-            raise queue.Empty
+            self._requeue(undelivered)
+            return
+        with self._buffer_lock:
+            self._buffered_messages.extend(
+                {
+                    "type": "message",
+                    "channel": self._channel(endpoint_id),
+                    "data": task_id,
+                }
+                for endpoint_id, task_id in undelivered
+            )
 
-        message = self._get_message(timeout / 1000)
-        if not message:
-            raise queue.Empty("Channels empty")
+    def _read_batch(self, timeout: float) -> t.List[t.Tuple[str, str]]:
+        batch: t.List[t.Tuple[str, str]] = []
+        with self._buffer_lock:
+            while self._buffered_messages and len(batch) < self._listener_batch_size:
+                batch.append(_message_to_task(self._buffered_messages.popleft()))
+        self._listener_holding = bool(batch)
+        while len(batch) < self._listener_batch_size:
+            message = self._read_pubsub(0 if batch else timeout)
+            if message is None:
+                break
+            message_type = message.get("type")
+            if message_type in _TASK_MESSAGE_TYPES:
+                batch.append(_message_to_task(message))
+                # the next read may process an unsubscribe, so that `subscribed`
+                # is False while this batch is still undelivered
+                self._listener_holding = True
+            elif message_type in _SUBSCRIBE_MESSAGE_TYPES:
+                confirmation = self._pending_confirmations.pop(message["channel"], None)
+                if confirmation is not None:
+                    confirmation.set()
+        return batch
+
+    def _deliver(self, batch: t.List[t.Tuple[str, str]]) -> None:
+        # tasks put into the local queue are recorded as dequeued by `get()`
+        if self._listener_callback is not None:
+            for endpoint_id, _ in batch:
+                self.counters.record_dequeued(endpoint_id)
+            try:
+                self._listener_callback(batch)
+            except Exception:
+                log.exception("pubsub listener callback failed")
+            return
 
-        dest_endpoint = _channel_name_to_endpoint_id(message["channel"])
-        task_id = message["data"]
+        for endpoint_id, task_id in batch:
+            try:
+                self._listener_queue.put(
+                    (endpoint_id, task_id), timeout=self._listener_put_timeout
+                )
+            except queue.Full:
+                self._requeue([(endpoint_id, task_id)])
+
+    def _listen(self, poll_interval: float) -> None:
+        while not self._listener_stop.is_set():
+            if self.pubsub.connection is None and not getattr(
+                self.pubsub, "node_pubsub_mapping", None
+            ):
+                # nothing has been subscribed to yet
+                self._listener_wakeup.wait(poll_interval)
+                self._listener_wakeup.clear()
+                continue
+            try:
+                batch = self._read_batch(poll_interval)
+            except Exception:
+                log.exception("pubsub listener failed to read messages")
+                self._listener_stop.wait(poll_interval)
+                continue
+            if batch:
+                self._deliver(batch)
+                self._listener_holding = False
+
+    def _has_final_messages(self) -> bool:
+        # whether messages may yet be returned by `get()` during final consumption
+        return self.subscribed or (
+            self.listening
+            and (self._listener_holding or not self._listener_queue.empty())
+        )
 
-        return dest_endpoint, task_id
+    def _check_unsubscribed(self) -> None:
+        # use getattr because these are not in the typeshed, and not all versions
+        # of redis-py have the pattern and shard channel attributes
+        subscriptions = (
+            ("channels", "pending_unsubscribe_channels"),
+            ("patterns", "pending_unsubscribe_patterns"),
+            ("shard_channels", "pending_unsubscribe_shard_channels"),
+        )
+        if self.subscribed and any(
+            len(getattr(self.pubsub, pending, ()))
+            < len(getattr(self.pubsub, subscribed, ()))
+            for subscribed, pending in subscriptions
+        ):
+            raise ValueError(
+                "Cannot get final messages on this ComputeRedisPubSub. It has "
+                "not been unsubscribed from all of its channels."
+            )
 
     def _final_messages_generator(
         self, *, timeout: int
     ) -> t.Generator[t.Tuple[str, str], None, None]:
-        while self.subscribed:
+        while self._has_final_messages():
             try:
                 yield self.get(timeout=timeout)
             # ignore empty responses during final consumption, since the whole
@@ -169,16 +820,7 @@ class ComputeRedisPubSub:
         Yield back messages via ``get()`` for as long as the pubsub is marked
         as subscribed.
         """
-        # type-ignore because this is not in the typeshed; TODO: get it added
-        # to typeshed so that this type-checks
-        num_pending_unsub = len(
-            self.pubsub.pending_unsubscribe_channels  # type: ignore
-        )
-        if self.subscribed and (num_pending_unsub < len(self.pubsub.channels)):
-            raise ValueError(
-                "Cannot get final messages on this ComputeRedisPubSub. It has "
-                "not been unsubscribed from all of its channels."
-            )
+        self._check_unsubscribed()
 
         # Structure this as a function which returns a generator from another
         # call, don't use the yield syntax in this function body.
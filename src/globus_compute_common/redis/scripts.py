@@ -0,0 +1,126 @@
+import hashlib
+import typing as t
+
+from .connection import _check_has_redis
+
+try:
+    import redis
+
+    has_redis = True
+except ImportError:
+    has_redis = False
+
+if t.TYPE_CHECKING:
+    import redis.asyncio
+
+
+class ComputeRedisScript:
+    """
+    A Lua script which is run on the Redis server with EVALSHA.
+
+    If the server does not have the script cached (NOSCRIPT), it is loaded with
+    SCRIPT LOAD and run again, so callers need not load scripts in advance.
+    """
+
+    def __init__(self, name: str, source: str) -> None:
+        self.name = name
+        self.source = source
+        self.sha = hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    def __repr__(self) -> str:
+        return f"ComputeRedisScript(name={self.name}, sha={self.sha})"
+
+    def __call__(
+        self,
+        client: "redis.Redis[t.Any]",
+        *,
+        keys: t.Sequence[t.Any] = (),
+        args: t.Sequence[t.Any] = (),
+    ) -> t.Any:
+        """Run the script in a single round trip, loading it if necessary"""
+        _check_has_redis()
+        try:
+            return client.evalsha(  # type: ignore[no-untyped-call]
+                self.sha, len(keys), *keys, *args
+            )
+        except redis.exceptions.NoScriptError:
+            self.load(client)
+            return client.evalsha(  # type: ignore[no-untyped-call]
+                self.sha, len(keys), *keys, *args
+            )
+
+    async def call_async(
+        self,
+        client: "redis.asyncio.Redis[t.Any]",
+        *,
+        keys: t.Sequence[t.Any] = (),
+        args: t.Sequence[t.Any] = (),
+    ) -> t.Any:
+        """As for calling the script, but with a `redis.asyncio` client"""
+        _check_has_redis()
+        try:
+            return await client.evalsha(  # type: ignore[no-untyped-call]
+                self.sha, len(keys), *keys, *args
+            )
+        except redis.exceptions.NoScriptError:
+            await client.script_load(self.source)  # type: ignore[no-untyped-call]
+            return await client.evalsha(  # type: ignore[no-untyped-call]
+                self.sha, len(keys), *keys, *args
+            )
+
+    def queue(
+        self,
+        pipe: "redis.client.Pipeline[t.Any]",
+        *,
+        keys: t.Sequence[t.Any] = (),
+        args: t.Sequence[t.Any] = (),
+    ) -> None:
+        """
+        Add a call to the script to a pipeline. Callers must ensure that the script
+        is loaded before executing the pipeline, e.g. with ``ensure_loaded()``.
+        """
+        pipe.evalsha(self.sha, len(keys), *keys, *args)
+
+    def load(self, client: "redis.Redis[t.Any]") -> None:
+        client.script_load(self.source)  # type: ignore[no-untyped-call]
+
+    def ensure_loaded(self, client: "redis.Redis[t.Any]") -> None:
+        """Load the script if the server does not already have it"""
+        exists = client.script_exists(self.sha)  # type: ignore[no-untyped-call]
+        if not exists[0]:
+            self.load(client)
+
+
+class ComputeRedisScriptRegistry:
+    """
+    A collection of named ComputeRedisScripts.
+
+    Scripts load themselves on first use, but servers can be warmed up ahead of
+    time with ``load_all()``.
+    """
+
+    def __init__(self) -> None:
+        self._scripts: t.Dict[str, ComputeRedisScript] = {}
+
+    def __repr__(self) -> str:
+        return f"ComputeRedisScriptRegistry({', '.join(self._scripts)})"
+
+    def __getitem__(self, name: str) -> ComputeRedisScript:
+        return self._scripts[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._scripts
+
+    def register(self, name: str, source: str) -> ComputeRedisScript:
+        if name in self._scripts:
+            raise ValueError(f"A script named '{name}' is already registered")
+        script = ComputeRedisScript(name, source)
+        self._scripts[name] = script
+        return script
+
+    def load_all(self, client: "redis.Redis[t.Any]") -> None:
+        """Load all registered scripts in a single round trip"""
+        with client.pipeline(transaction=False) as pipe:
+            for script in self._scripts.values():
+                pipe.script_load(script.source)
+            pipe.execute()
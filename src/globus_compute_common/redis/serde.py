@@ -57,6 +57,36 @@ class ComputeRedisEnumSerde(ComputeRedisSerde):
         return self.enum_class(value)
 
 
+class ComputeRedisCompactEnumSerde(ComputeRedisEnumSerde):
+    """
+    An enum serde which stores members by their position in the enum, as a short
+    numeric code, rather than by value.
+
+    Because codes are positional, new members must only be added at the end of the
+    enum. Values stored by ComputeRedisEnumSerde are also accepted when
+    deserializing, so this cannot be used with enums whose values are digits.
+    """
+
+    def __init__(self, enum_class: t.Type[enum.Enum]) -> None:
+        super().__init__(enum_class)
+        self._members = list(enum_class)
+        self._codes = {member: str(i) for i, member in enumerate(self._members)}
+
+    def serialize(self, value: t.Any) -> str:
+        return self._codes[value]
+
+    def deserialize(self, value: str) -> t.Any:
+        if value.isdigit():
+            try:
+                return self._members[int(value)]
+            except IndexError as e:
+                raise ValueError(
+                    f"Invalid {self.enum_class.__name__} code when loading from "
+                    f"Redis: {value}"
+                ) from e
+        return super().deserialize(value)
+
+
 DEFAULT_SERDE = ComputeRedisSerde()
 INT_SERDE = ComputeRedisIntSerde()
 FLOAT_SERDE = ComputeRedisFloatSerde()
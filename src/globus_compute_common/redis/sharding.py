@@ -0,0 +1,313 @@
+import bisect
+import functools
+import hashlib
+import queue
+import threading
+import time
+import typing as t
+
+from ..tasks import TaskProtocol
+from .connection import default_redis_connection_factory
+from .pubsub import ComputeRedisPubSub
+from .task_queue import ComputeEndpointTaskQueue
+
+if t.TYPE_CHECKING:
+    import redis
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+class ComputeRedisShardRouter:
+    """
+    Maps each endpoint to one of several Redis servers ("shards"), with a
+    consistent-hash ring, so that endpoints' queues and channels can be spread
+    across servers without Redis Cluster.
+
+    Each shard is placed on the ring at ``vnodes`` points, derived from its name,
+    and an endpoint is served by the shard at the first point after the endpoint's
+    own hash. Adding a shard therefore only moves the endpoints which it takes over,
+    about ``1 / len(shards)`` of them, and removing one only moves its own.
+
+    Shards are identified by name, rather than by position or URL, so that their
+    names, not their order, determine placement. Tasks queued for an endpoint are
+    not moved with it when shards are added or removed.
+    """
+
+    def __init__(
+        self, shards: t.Mapping[str, "redis.Redis[t.Any]"], *, vnodes: int = 128
+    ) -> None:
+        """
+        :param shards: a Redis client for each shard, by shard name
+        :param vnodes: the number of points on the ring for each shard
+        """
+        if not shards:
+            raise ValueError("ComputeRedisShardRouter requires at least one shard")
+        self.vnodes = vnodes
+        self.shards: t.Dict[str, "redis.Redis[t.Any]"] = {}
+        self._ring: t.List[t.Tuple[int, str]] = []
+        self._lock = threading.Lock()
+        for name, client in shards.items():
+            self.add_shard(name, client)
+
+    @classmethod
+    def from_urls(
+        cls, redis_urls: t.Mapping[str, str], *, vnodes: int = 128
+    ) -> "ComputeRedisShardRouter":
+        """Construct a router with a default client for each shard's URL, by name"""
+        return cls(
+            {
+                name: default_redis_connection_factory(url)
+                for name, url in redis_urls.items()
+            },
+            vnodes=vnodes,
+        )
+
+    def __repr__(self) -> str:
+        return f"ComputeRedisShardRouter(shards={list(self.shards)})"
+
+    def add_shard(self, name: str, client: "redis.Redis[t.Any]") -> None:
+        with self._lock:
+            if name in self.shards:
+                raise ValueError(f"A shard named '{name}' already exists")
+            self.shards[name] = client
+            points = [(_ring_hash(f"{name}#{i}"), name) for i in range(self.vnodes)]
+            self._ring = sorted(self._ring + points)
+
+    def remove_shard(self, name: str) -> None:
+        with self._lock:
+            if len(self.shards) == 1 and name in self.shards:
+                raise ValueError("Cannot remove the only shard")
+            del self.shards[name]
+            self._ring = [point for point in self._ring if point[1] != name]
+
+    def shard_for(self, endpoint_id: str) -> str:
+        """Get the name of the shard which serves an endpoint"""
+        ring = self._ring
+        index = bisect.bisect(ring, (_ring_hash(endpoint_id), ""))
+        return ring[index % len(ring)][1]
+
+    def client_for(self, endpoint_id: str) -> "redis.Redis[t.Any]":
+        """Get the Redis client of the shard which serves an endpoint"""
+        return self.shards[self.shard_for(endpoint_id)]
+
+    def group_by_shard(self, endpoint_ids: t.Iterable[str]) -> t.Dict[str, t.List[str]]:
+        """Group endpoints by the names of the shards which serve them"""
+        groups: t.Dict[str, t.List[str]] = {}
+        for endpoint_id in endpoint_ids:
+            groups.setdefault(self.shard_for(endpoint_id), []).append(endpoint_id)
+        return groups
+
+    def task_queue(self, endpoint_id: str) -> ComputeEndpointTaskQueue:
+        """Get the ComputeEndpointTaskQueue for an endpoint, on its shard"""
+        return ComputeEndpointTaskQueue(
+            endpoint_id, redis_client=self.client_for(endpoint_id)
+        )
+
+
+class ComputeShardedRedisPubSub:
+    """
+    Provides the interface of ComputeRedisPubSub across the shards of a
+    ComputeRedisShardRouter, so that each endpoint's channel and queue are on the
+    shard which serves it.
+
+    A ComputeRedisPubSub is created for each shard as it is used. Once an endpoint
+    on a shard is subscribed to, the shard's messages are read by a listener thread
+    (see ``ComputeRedisPubSub.start_listener()``), and collected in a local queue of
+    up to ``max_queued`` messages, which are returned by ``get()`` and
+    ``get_many()``. While the local queue is full, listeners wait for space.
+
+    Tasks are usually stored apart from the shards (e.g. RedisTasks in a task
+    store), in which case their status is written through their own client, rather
+    than on the shard.
+
+    Shards should not be added to or removed from the router while subscribed.
+
+    **IMPORTANT**
+
+    As with ComputeRedisPubSub, unsubscribing is not synchronous. To tear down,
+    unsubscribe from all endpoints, consume ``get_final_messages()``, which merges
+    the final messages of every shard, and then call ``stop()``.
+    """
+
+    def __init__(
+        self, router: ComputeRedisShardRouter, *, max_queued: int = 10000
+    ) -> None:
+        self.router = router
+        self._pubsubs: t.Dict[str, ComputeRedisPubSub] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[t.Tuple[str, str]]" = queue.Queue(maxsize=max_queued)
+        # set by `stop()`, so that listeners waiting for space in the local queue
+        # return their messages to Redis rather than blocking the shutdown
+        self._stopping = threading.Event()
+
+    def __repr__(self) -> str:
+        return f"ComputeShardedRedisPubSub(router={self.router})"
+
+    @property
+    def subscribed(self) -> bool:
+        return any(pubsub.subscribed for pubsub in self._all_pubsubs())
+
+    def _all_pubsubs(self) -> t.List[ComputeRedisPubSub]:
+        with self._lock:
+            return list(self._pubsubs.values())
+
+    def _pubsub(self, shard: str, *, listen: bool = False) -> ComputeRedisPubSub:
+        with self._lock:
+            pubsub = self._pubsubs.get(shard)
+            if pubsub is None:
+                pubsub = ComputeRedisPubSub(redis_client=self.router.shards[shard])
+                self._pubsubs[shard] = pubsub
+            if listen and not pubsub.listening:
+                self._stopping.clear()
+                pubsub.start_listener(functools.partial(self._receive, pubsub))
+            return pubsub
+
+    def _receive(
+        self, pubsub: ComputeRedisPubSub, batch: t.List[t.Tuple[str, str]]
+    ) -> None:
+        for i, message in enumerate(batch):
+            while True:
+                try:
+                    self._queue.put(message, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self._stopping.is_set():
+                        pubsub._requeue(batch[i:])
+                        return
+
+    def put(self, endpoint_id: str, task: TaskProtocol) -> int:
+        """Put a task into its endpoint's channel, as with ComputeRedisPubSub"""
+        return self._pubsub(self.router.shard_for(endpoint_id)).put(endpoint_id, task)
+
+    def put_many(
+        self, endpoint_id: str, tasks: t.Iterable[TaskProtocol]
+    ) -> t.List[int]:
+        shard = self.router.shard_for(endpoint_id)
+        return self._pubsub(shard).put_many(endpoint_id, tasks)
+
+    def subscribe(self, endpoint_id: str, *, confirm_timeout: float = 5) -> None:
+        shard = self.router.shard_for(endpoint_id)
+        self._pubsub(shard, listen=True).subscribe(
+            endpoint_id, confirm_timeout=confirm_timeout
+        )
+
+    def subscribe_many(
+        self, endpoint_ids: t.Iterable[str], *, confirm_timeout: float = 5
+    ) -> None:
+        """
+        Subscribe to many endpoints' channels, with ``subscribe_many()`` on each
+        shard which serves them.
+        """
+        for shard, shard_endpoint_ids in self.router.group_by_shard(
+            endpoint_ids
+        ).items():
+            self._pubsub(shard, listen=True).subscribe_many(
+                shard_endpoint_ids, confirm_timeout=confirm_timeout
+            )
+
+    def unsubscribe(self, endpoint_id: str) -> None:
+        self._pubsub(self.router.shard_for(endpoint_id)).unsubscribe(endpoint_id)
+
+    def get(self, *, timeout: int = 2) -> t.Tuple[str, str]:
+        """
+        :param timeout: wait time for getting a message, in milliseconds
+        """
+        if self._stopping.is_set():
+            return self._get_stopped(timeout)
+        try:
+            return self._queue.get(timeout=timeout / 1000)
+        except queue.Empty:
+            raise queue.Empty("Channels empty") from None
+
+    def _get_stopped(self, timeout: int) -> t.Tuple[str, str]:
+        # once the listeners are stopped, messages left in the local queue are
+        # returned first, and then those read from the shards' pubsubs directly
+        deadline = time.monotonic() + timeout / 1000
+        while True:
+            try:
+                return self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            for pubsub in self._all_pubsubs():
+                if pubsub.subscribed:
+                    try:
+                        return pubsub.get(timeout=0)
+                    except queue.Empty:
+                        pass
+            if time.monotonic() >= deadline:
+                raise queue.Empty("Channels empty")
+            time.sleep(0.01)
+
+    def get_many(
+        self, max_items: int, *, timeout: int = 2
+    ) -> t.List[t.Tuple[str, str]]:
+        """
+        Get up to ``max_items`` messages, waiting for up to ``timeout`` milliseconds
+        for the first one. Returns an empty list if there are none.
+        """
+        try:
+            messages = [self.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(messages) < max_items:
+            try:
+                messages.append(self.get(timeout=0))
+            except queue.Empty:
+                break
+        return messages
+
+    def _final_messages_generator(
+        self, pubsubs: t.List[ComputeRedisPubSub], *, timeout: int
+    ) -> t.Generator[t.Tuple[str, str], None, None]:
+        while not self._queue.empty() or any(
+            pubsub._has_final_messages() for pubsub in pubsubs
+        ):
+            try:
+                yield self.get(timeout=timeout)
+            except queue.Empty:
+                pass
+
+    def get_final_messages(
+        self, *, timeout: int = 2
+    ) -> t.Generator[t.Tuple[str, str], None, None]:
+        """
+        Yield back messages via ``get()`` for as long as any shard's pubsub is
+        marked as subscribed, or holds messages which it has not yet delivered, as
+        with ``ComputeRedisPubSub.get_final_messages()``.
+
+        Raises a ValueError if any shard has not been unsubscribed from all of its
+        channels.
+        """
+        pubsubs = self._all_pubsubs()
+        for pubsub in pubsubs:
+            pubsub._check_unsubscribed()
+        # as in ComputeRedisPubSub, the generator is returned from another call so
+        # that the above ValueError is raised here
+        return self._final_messages_generator(pubsubs, timeout=timeout)
+
+    def stop(self) -> None:
+        """
+        Stop the listener threads of all shards. Messages in the local queue, and
+        those which arrive afterwards, remain available to ``get()`` while
+        subscribed, and are otherwise returned to their endpoints' queues, on their
+        shards.
+        """
+        self._stopping.set()
+        for pubsub in self._all_pubsubs():
+            pubsub.stop_listener()
+        if self.subscribed:
+            return
+        undelivered: t.Dict[str, t.List[t.Tuple[str, str]]] = {}
+        while True:
+            try:
+                endpoint_id, task_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            shard = self.router.shard_for(endpoint_id)
+            undelivered.setdefault(shard, []).append((endpoint_id, task_id))
+        for shard, tasks in undelivered.items():
+            self._pubsub(shard)._requeue(tasks)
@@ -1,14 +1,148 @@
+import contextlib
+import logging
 import queue
+import threading
+import time
 import typing as t
 
 from ..tasks import TaskProtocol, TaskState
 from .connection import default_redis_connection_factory
+from .metrics import QUEUE_COUNTERS, ComputeRedisQueueCounters
+from .scripts import ComputeRedisScriptRegistry
+from .task_stream import _default_consumer_name
 
 if t.TYPE_CHECKING:
     import redis
 
+log = logging.getLogger(__name__)
+
+# Move up to ARGV[1] task IDs from the head of an endpoint's queue to the tail of a
+# consumer's processing list, recording for each a deadline, ARGV[2] seconds from
+# now by the server's clock, in the endpoint's deadlines sorted set. Deadline
+# members are "{consumer}/{task_id}", with the consumer given in ARGV[3].
+#
+# A consumer holds a task ID at most once, since a second deadline member for it
+# would replace the first, and acknowledging either copy would leave the other
+# without a deadline. So a task ID which the consumer already holds, e.g. one which
+# was queued twice, is removed from the queue and dropped rather than returned.
+#
+# KEYS[1]: the endpoint's queue name
+# KEYS[2]: the consumer's processing list name
+# KEYS[3]: the endpoint's deadlines name
+#
+# returns the task IDs which were moved
+_RELIABLE_DEQUEUE_SCRIPT = """\
+local now = redis.call("TIME")
+local deadline = tonumber(now[1]) + tonumber(now[2]) / 1000000 + tonumber(ARGV[2])
+local task_ids = {}
+for _ = 1, tonumber(ARGV[1]) do
+    local task_id = redis.call("LMOVE", KEYS[1], KEYS[2], "LEFT", "RIGHT")
+    if not task_id then
+        break
+    end
+    local member = ARGV[3] .. "/" .. task_id
+    if redis.call("ZSCORE", KEYS[3], member) then
+        redis.call("RPOP", KEYS[2])
+    else
+        redis.call("ZADD", KEYS[3], deadline, member)
+        table.insert(task_ids, task_id)
+    end
+end
+return task_ids
+"""
+
+# Requeue task IDs held in consumers' processing lists, by pushing them onto the tail
+# of the endpoint's queue. Unless ARGV[1] is "1", tasks are requeued only if their
+# deadlines have passed, so that tasks which have been acknowledged or requeued
+# since they were selected are skipped.
+#
+# KEYS[1]: the endpoint's queue name
+# KEYS[2]: the endpoint's deadlines name
+# KEYS[3...]: processing list names, one for each deadline member
+# ARGV[1]: "1" to requeue regardless of deadlines, else "0"
+# ARGV[2...]: deadline members, "{consumer}/{task_id}"
+#
+# returns the number of tasks which were requeued
+_RELIABLE_REQUEUE_SCRIPT = """\
+local now = redis.call("TIME")
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local force = ARGV[1] == "1"
+local requeued = 0
+for i = 2, #ARGV do
+    local member = ARGV[i]
+    local deadline = redis.call("ZSCORE", KEYS[2], member)
+    if deadline and (force or tonumber(deadline) <= now) then
+        local task_id = string.match(member, "/([^/]*)$")
+        redis.call("ZREM", KEYS[2], member)
+        if redis.call("LREM", KEYS[i + 1], 1, task_id) > 0 then
+            redis.call("RPUSH", KEYS[1], task_id)
+            requeued = requeued + 1
+        end
+    end
+end
+return requeued
+"""
+
+TASK_QUEUE_SCRIPTS = ComputeRedisScriptRegistry()
+TASK_QUEUE_SCRIPTS.register("reliable_dequeue", _RELIABLE_DEQUEUE_SCRIPT)
+TASK_QUEUE_SCRIPTS.register("reliable_requeue", _RELIABLE_REQUEUE_SCRIPT)
+
+
+def _queue_name(endpoint: str) -> str:
+    return f"task_{endpoint}_list"
+
+
+def _processing_list_name(endpoint: str, consumer: str) -> str:
+    return f"task_{endpoint}_processing_{consumer}"
+
+
+def _deadlines_name(endpoint: str) -> str:
+    return f"task_{endpoint}_deadlines"
+
+
+def _queue_task_update(pipe: t.Any, task: TaskProtocol, endpoint: str) -> None:
+    """
+    Mark a task as waiting for an endpoint. Where the task's attributes are stored
+    in Redis fields (as for RedisTask), the writes are queued on the pipeline rather
+    than made immediately. Indexed fields are assigned directly, so that their
+    indexes are maintained.
+    """
+    redis_fields = getattr(type(task), "_redis_fields", {})
+    indexed = getattr(task, "INDEXED_FIELDS", ())
+    for name, value in (("endpoint", endpoint), ("status", TaskState.WAITING_FOR_EP)):
+        field = redis_fields.get(name)
+        if field is None or name in indexed:
+            setattr(task, name, value)
+        else:
+            field.write(task, pipe, value)
+            field.update_snapshot(task, value)
+
+
+def _pop_many(
+    client: "redis.Redis[t.Any]",
+    queue_names: t.Sequence[str],
+    max_items: int,
+    timeout: float,
+) -> t.Optional[t.Tuple[str, t.List[str]]]:
+    """
+    Pop up to ``max_items`` task IDs from the first non-empty queue, in the order
+    given, waiting for up to ``timeout`` seconds for one to be non-empty.
+
+    Returns the name of the queue and the IDs, or None if all queues were empty.
+    """
+    res = client.blmpop(  # type: ignore[attr-defined]
+        timeout, len(queue_names), *queue_names, direction="LEFT", count=max_items
+    )
+    if not res:
+        return None
+    queue_name, task_ids = res
+    return t.cast(str, queue_name), t.cast(t.List[str], task_ids)
+
 
 class ComputeEndpointTaskQueue:
+    # the counters to which enqueued and dequeued tasks are recorded
+    counters: ComputeRedisQueueCounters = QUEUE_COUNTERS
+
     def __init__(
         self, endpoint: str, *, redis_client: t.Optional["redis.Redis[t.Any]"] = None
     ) -> None:
@@ -23,16 +157,344 @@ class ComputeEndpointTaskQueue:
 
     @property
     def queue_name(self) -> str:
-        return f"task_{self.endpoint}_list"
+        return _queue_name(self.endpoint)
 
     def enqueue(self, task: TaskProtocol) -> None:
         task.endpoint = self.endpoint
         task.status = TaskState.WAITING_FOR_EP
         self.redis_client.rpush(self.queue_name, task.task_id)
+        self.counters.record_enqueued(self.endpoint)
+
+    def enqueue_many(self, tasks: t.Iterable[TaskProtocol]) -> None:
+        """
+        Enqueue many tasks, as with ``enqueue()``, in a single pipeline.
+
+        Tasks stored in Redis fields on another Redis than the queue (as for
+        RedisTasks kept apart from queues) are updated in a pipeline on their own
+        client, which is executed before the tasks are queued.
+
+        The pipeline is not a transaction, so consumers may dequeue some of the
+        tasks before the status of others has been written.
+        """
+        tasks = list(tasks)
+        if not tasks:
+            return
+        with contextlib.ExitStack() as stack:
+            pipe = stack.enter_context(self.redis_client.pipeline(transaction=False))
+            # pipelines for tasks on other clients, by client ID
+            task_pipes: t.Dict[int, t.Any] = {}
+            for task in tasks:
+                client = getattr(task, "redis_client", None)
+                if client is None or client is self.redis_client:
+                    _queue_task_update(pipe, task, self.endpoint)
+                    continue
+                if id(client) not in task_pipes:
+                    task_pipes[id(client)] = stack.enter_context(
+                        client.pipeline(transaction=False)
+                    )
+                _queue_task_update(task_pipes[id(client)], task, self.endpoint)
+            for task_pipe in task_pipes.values():
+                task_pipe.execute()
+            pipe.rpush(self.queue_name, *(task.task_id for task in tasks))
+            pipe.execute()
+        self.counters.record_enqueued(self.endpoint, len(tasks))
 
     def dequeue(self, *, timeout: int = 1) -> str:
         res = self.redis_client.blpop(self.queue_name, timeout=timeout)
         if not res:
             raise queue.Empty
         _queue_name, task_id = res
+        self.counters.record_dequeued(self.endpoint)
         return t.cast(str, task_id)
+
+    def dequeue_many(self, max_items: int, *, timeout: int = 1) -> t.List[str]:
+        """
+        Dequeue up to ``max_items`` task IDs, waiting for up to ``timeout`` seconds
+        for at least one to be available. Returns an empty list if none are.
+
+        Queued tasks are popped with a single LPOP; only if there are none does this
+        block, with BLMPOP, which requires Redis 7.0 or later.
+        """
+        task_ids = t.cast(
+            t.Optional[t.List[str]], self.redis_client.lpop(self.queue_name, max_items)
+        )
+        if not task_ids:
+            res = _pop_many(self.redis_client, [self.queue_name], max_items, timeout)
+            task_ids = res[1] if res else []
+        self.counters.record_dequeued(self.endpoint, len(task_ids))
+        return task_ids
+
+
+class ComputeMultiEndpointTaskQueue:
+    """
+    Dequeues tasks from the queues of many endpoints, as used by
+    ComputeEndpointTaskQueue, so that one consumer can service them all.
+
+    Each call blocks on all of the queues at once, with BLMPOP, and takes tasks from
+    only one of them. To be fair to the endpoints, the order in which queues are
+    checked is rotated, so that the next call starts after the endpoint which was
+    last served.
+
+    Requires Redis 7.0 or later.
+    """
+
+    # the counters to which dequeued tasks are recorded
+    counters: ComputeRedisQueueCounters = QUEUE_COUNTERS
+
+    def __init__(
+        self,
+        endpoints: t.Iterable[str],
+        *,
+        redis_client: t.Optional["redis.Redis[t.Any]"] = None,
+    ) -> None:
+        if redis_client is None:
+            redis_client = default_redis_connection_factory()
+        self.redis_client = redis_client
+        self.endpoints: t.List[str] = list(dict.fromkeys(endpoints))
+        self._next_index = 0
+
+    def __repr__(self) -> str:
+        attr_str = f"endpoints={len(self.endpoints)},redis_client={self.redis_client}"
+        return f"ComputeMultiEndpointTaskQueue({attr_str})"
+
+    def add_endpoint(self, endpoint: str) -> None:
+        if endpoint not in self.endpoints:
+            self.endpoints.append(endpoint)
+
+    def remove_endpoint(self, endpoint: str) -> None:
+        index = self.endpoints.index(endpoint)
+        del self.endpoints[index]
+        if index < self._next_index:
+            self._next_index -= 1
+
+    def dequeue_many(
+        self, max_items: int, *, timeout: int = 1
+    ) -> t.Tuple[t.Optional[str], t.List[str]]:
+        """
+        Dequeue up to ``max_items`` task IDs from one endpoint's queue, waiting for
+        up to ``timeout`` seconds for any queue to be non-empty.
+
+        Returns the endpoint and its task IDs, or ``(None, [])`` if none are
+        available.
+        """
+        if not self.endpoints:
+            raise ValueError("Cannot dequeue: no endpoints")
+        start = self._next_index % len(self.endpoints)
+        endpoints = self.endpoints[start:] + self.endpoints[:start]
+        names = {_queue_name(endpoint): endpoint for endpoint in endpoints}
+
+        res = _pop_many(self.redis_client, list(names), max_items, timeout)
+        if not res:
+            return None, []
+        queue_name, task_ids = res
+        endpoint = names[queue_name]
+        self._next_index = self.endpoints.index(endpoint) + 1
+        self.counters.record_dequeued(endpoint, len(task_ids))
+        return endpoint, task_ids
+
+    def dequeue(self, *, timeout: int = 1) -> t.Tuple[str, str]:
+        """
+        Dequeue one task ID, returning it along with its endpoint. Raises
+        queue.Empty if none is available within ``timeout`` seconds.
+        """
+        endpoint, task_ids = self.dequeue_many(1, timeout=timeout)
+        if endpoint is None:
+            raise queue.Empty
+        return endpoint, task_ids[0]
+
+
+class ComputeEndpointReliableTaskQueue(ComputeEndpointTaskQueue):
+    """
+    A ComputeEndpointTaskQueue from which tasks are not lost if a consumer stops
+    (e.g. crashes) before it has handed them off.
+
+    Dequeued task IDs are moved atomically into a processing list for the consumer,
+    and given a deadline ``visibility_timeout`` seconds later. Each must then be
+    acknowledged with ``ack()``, once it has been handed off, or returned to the
+    queue with ``nack()``. Tasks which are still held when their deadlines pass are
+    returned to the queue by ``requeue_expired()``, which can be run periodically
+    in a background thread with ``start_reaper()``.
+
+    A consumer holds each task ID at most once: if a task ID which it already holds
+    is dequeued again, e.g. because it was queued twice, the duplicate is dropped,
+    so that a single ``ack()`` or ``nack()`` releases it.
+
+    Producers may use this or a plain ComputeEndpointTaskQueue interchangeably.
+
+    Requires Redis 6.2 or later.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        *,
+        redis_client: t.Optional["redis.Redis[t.Any]"] = None,
+        consumer: t.Optional[str] = None,
+        visibility_timeout: float = 300,
+    ) -> None:
+        """
+        :param endpoint: the endpoint whose tasks are queued
+        :param redis_client: the Redis client; defaults to a new default client
+        :param consumer: the name of this consumer, which must be unique and must
+            not contain ``/``; defaults to one based on the host and process
+        :param visibility_timeout: how long, in seconds, a dequeued task may be held
+            before it is returned to the queue
+        """
+        super().__init__(endpoint, redis_client=redis_client)
+        self.consumer = consumer or _default_consumer_name()
+        if "/" in self.consumer:
+            raise ValueError(f"Invalid consumer name: {self.consumer}")
+        self.visibility_timeout = visibility_timeout
+        self._reaper: t.Optional[threading.Thread] = None
+        self._reaper_stop = threading.Event()
+
+    def __repr__(self) -> str:
+        attr_str = (
+            f"endpoint={self.endpoint},consumer={self.consumer},"
+            f"redis_client={self.redis_client}"
+        )
+        return f"ComputeEndpointReliableTaskQueue({attr_str})"
+
+    @property
+    def processing_list_name(self) -> str:
+        return _processing_list_name(self.endpoint, self.consumer)
+
+    @property
+    def deadlines_name(self) -> str:
+        return _deadlines_name(self.endpoint)
+
+    def _member(self, task_id: str) -> str:
+        return f"{self.consumer}/{task_id}"
+
+    def dequeue(self, *, timeout: int = 1) -> str:
+        """
+        Dequeue one task ID, which must be passed to ``ack()`` or ``nack()``. Raises
+        queue.Empty if none is available within ``timeout`` seconds.
+        """
+        task_ids = self.dequeue_many(1, timeout=timeout)
+        if not task_ids:
+            raise queue.Empty
+        return task_ids[0]
+
+    def dequeue_many(self, max_items: int, *, timeout: int = 1) -> t.List[str]:
+        """
+        Dequeue up to ``max_items`` task IDs, waiting for up to ``timeout`` seconds
+        for at least one to be available. Returns an empty list if none are.
+        """
+        script = TASK_QUEUE_SCRIPTS["reliable_dequeue"]
+        keys = [self.queue_name, self.processing_list_name, self.deadlines_name]
+        args = [max_items, self.visibility_timeout, self.consumer]
+        give_up_at = time.monotonic() + timeout
+        while True:
+            task_ids = script(self.redis_client, keys=keys, args=args)
+            if task_ids:
+                self.counters.record_dequeued(self.endpoint, len(task_ids))
+                return t.cast(t.List[str], task_ids)
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                return []
+            # wait for the queue to be non-empty; moving its head to its own head
+            # leaves it unchanged
+            if not self.redis_client.blmove(
+                self.queue_name, self.queue_name, remaining, "LEFT", "LEFT"
+            ):
+                return []
+
+    def ack(self, *task_ids: str) -> int:
+        """
+        Acknowledge tasks dequeued by this consumer, so that they are not returned
+        to the queue.
+
+        Returns the number of tasks acknowledged. Tasks which have already been
+        returned to the queue, e.g. because their deadlines passed, are not counted.
+        """
+        if not task_ids:
+            return 0
+        with self.redis_client.pipeline(transaction=True) as pipe:
+            for task_id in task_ids:
+                pipe.lrem(self.processing_list_name, 1, task_id)
+            pipe.zrem(self.deadlines_name, *(self._member(i) for i in task_ids))
+            results = pipe.execute()
+        return sum(1 for removed in results[:-1] if removed)
+
+    def nack(self, *task_ids: str) -> int:
+        """
+        Return tasks dequeued by this consumer to the tail of the queue, e.g. because
+        they could not be handed off.
+
+        Returns the number of tasks returned to the queue.
+        """
+        if not task_ids:
+            return 0
+        return self._requeue(
+            [self._member(task_id) for task_id in task_ids], force=True
+        )
+
+    def _requeue(self, members: t.Sequence[str], *, force: bool) -> int:
+        keys = [self.queue_name, self.deadlines_name]
+        for member in members:
+            consumer, _, _task_id = member.rpartition("/")
+            keys.append(_processing_list_name(self.endpoint, consumer))
+        return t.cast(
+            int,
+            TASK_QUEUE_SCRIPTS["reliable_requeue"](
+                self.redis_client, keys=keys, args=["1" if force else "0", *members]
+            ),
+        )
+
+    def requeue_expired(self, *, batch_size: int = 100) -> int:
+        """
+        Return tasks which were held by any consumer past their deadlines to the
+        queue, in batches of up to ``batch_size``.
+
+        Returns the number of tasks returned to the queue.
+        """
+        now_seconds, now_microseconds = self.redis_client.time()
+        now = now_seconds + now_microseconds / 1_000_000
+        requeued = 0
+        while True:
+            members = self.redis_client.zrangebyscore(
+                self.deadlines_name, "-inf", now, start=0, num=batch_size
+            )
+            if not members:
+                return requeued
+            requeued += self._requeue(t.cast(t.List[str], members), force=False)
+            if len(members) < batch_size:
+                return requeued
+
+    def _run_reaper(self, interval: float, batch_size: int) -> None:
+        while not self._reaper_stop.is_set():
+            try:
+                requeued = self.requeue_expired(batch_size=batch_size)
+            except Exception:
+                log.exception("Failed to requeue expired tasks for %s", self.endpoint)
+            else:
+                if requeued:
+                    log.info(
+                        "Requeued %d expired tasks for %s", requeued, self.endpoint
+                    )
+            self._reaper_stop.wait(interval)
+
+    def start_reaper(self, *, interval: float = 10, batch_size: int = 100) -> None:
+        """
+        Start a daemon thread which runs ``requeue_expired()`` every ``interval``
+        seconds, until ``stop_reaper()`` is called.
+        """
+        if self._reaper is not None:
+            raise RuntimeError("The reaper is already running")
+        self._reaper_stop.clear()
+        self._reaper = threading.Thread(
+            target=self._run_reaper,
+            args=(interval, batch_size),
+            name=f"task-queue-reaper-{self.endpoint}",
+            daemon=True,
+        )
+        self._reaper.start()
+
+    def stop_reaper(self) -> None:
+        """Stop the reaper thread, if it is running, and wait for it to finish"""
+        if self._reaper is None:
+            return
+        self._reaper_stop.set()
+        self._reaper.join()
+        self._reaper = None
@@ -0,0 +1,193 @@
+import os
+import queue
+import socket
+import time
+import typing as t
+import uuid
+
+from ..tasks import TaskProtocol, TaskState
+from .connection import default_redis_connection_factory
+
+try:
+    import redis
+
+    has_redis = True
+except ImportError:
+    has_redis = False
+
+_TASK_ID_FIELD = "task_id"
+
+
+def _default_consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class ComputeEndpointTaskStream:
+    """
+    A task queue for an endpoint, backed by a Redis stream and consumer group, with
+    the same ``enqueue()``/``dequeue()`` interface as ComputeEndpointTaskQueue.
+
+    Unlike a list-based queue, delivery is at-least-once: a dequeued task remains
+    pending in the consumer group until it is acknowledged with ``ack()``. If its
+    consumer stops (e.g. crashes) without acknowledging it, then after
+    ``claim_idle_ms`` another consumer reclaims it, via XAUTOCLAIM, and it is
+    dequeued again. Any number of consumers may share the group, and each task is
+    delivered to one of them.
+
+    Acknowledged entries are deleted from the stream, so a stream should only have
+    one consumer group.
+
+    Requires Redis 6.2 or later.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        *,
+        redis_client: t.Optional["redis.Redis[t.Any]"] = None,
+        group: str = "endpoint",
+        consumer: t.Optional[str] = None,
+        claim_idle_ms: int = 60000,
+    ) -> None:
+        """
+        :param endpoint: the endpoint whose tasks are queued
+        :param redis_client: the Redis client; defaults to a new default client
+        :param group: the name of the consumer group
+        :param consumer: the name of this consumer within the group, which must be
+            unique; defaults to one based on the host and process
+        :param claim_idle_ms: how long, in milliseconds, a task may be pending for
+            another consumer before it is reclaimed
+        """
+        if redis_client is None:
+            redis_client = default_redis_connection_factory()
+        self.redis_client = redis_client
+        self.endpoint = endpoint
+        self.group = group
+        self.consumer = consumer or _default_consumer_name()
+        self.claim_idle_ms = claim_idle_ms
+
+        # the stream entry IDs of tasks dequeued by this consumer and not yet
+        # acknowledged, by task_id
+        self._pending: t.Dict[str, str] = {}
+        self._group_created = False
+        self._next_claim_time = 0.0
+
+    def __repr__(self) -> str:
+        attr_str = (
+            f"endpoint={self.endpoint},group={self.group},consumer={self.consumer},"
+            f"redis_client={self.redis_client}"
+        )
+        return f"ComputeEndpointTaskStream({attr_str})"
+
+    @property
+    def stream_name(self) -> str:
+        return f"task_stream_{self.endpoint}"
+
+    def _ensure_group(self) -> None:
+        if self._group_created:
+            return
+        try:
+            # start from the beginning of the stream, so that tasks enqueued before
+            # the group exists are delivered
+            self.redis_client.xgroup_create(
+                self.stream_name, self.group, id="0", mkstream=True
+            )
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_created = True
+
+    def enqueue(self, task: TaskProtocol) -> None:
+        task.endpoint = self.endpoint
+        task.status = TaskState.WAITING_FOR_EP
+        self.redis_client.xadd(self.stream_name, {_TASK_ID_FIELD: task.task_id})
+
+    def _record_entries(
+        self, entries: t.Iterable[t.Optional[t.Tuple[str, t.Dict[str, str]]]]
+    ) -> t.List[str]:
+        task_ids = []
+        for entry in entries:
+            # entries deleted from the stream while pending are returned as nil
+            # by Redis versions before 7.0
+            if not entry or not entry[1]:
+                continue
+            entry_id, fields = entry
+            task_id = fields[_TASK_ID_FIELD]
+            self._pending[task_id] = entry_id
+            task_ids.append(task_id)
+        return task_ids
+
+    def reclaim(self, max_items: int = 100) -> t.List[str]:
+        """
+        Claim up to ``max_items`` tasks which have been pending for another consumer
+        for longer than ``claim_idle_ms``, and return their IDs.
+
+        This is called periodically by ``dequeue_many()``.
+        """
+        self._ensure_group()
+        response = self.redis_client.xautoclaim(
+            self.stream_name,
+            self.group,
+            self.consumer,
+            min_idle_time=self.claim_idle_ms,
+            start_id="0-0",
+            count=max_items,
+        )
+        return self._record_entries(response[1])
+
+    def dequeue_many(self, max_items: int, *, timeout: int = 1) -> t.List[str]:
+        """
+        Dequeue up to ``max_items`` task IDs, waiting for up to ``timeout`` seconds
+        for at least one to be available. Returns an empty list if none are.
+
+        Stalled tasks are reclaimed before new ones are read, at most once per
+        ``claim_idle_ms``.
+        """
+        self._ensure_group()
+        now = time.monotonic()
+        if now >= self._next_claim_time:
+            self._next_claim_time = now + self.claim_idle_ms / 1000
+            reclaimed = self.reclaim(max_items)
+            if reclaimed:
+                return reclaimed
+
+        response = self.redis_client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream_name: ">"},
+            count=max_items,
+            block=max(int(timeout * 1000), 1),
+        )
+        if not response:
+            return []
+        (_stream_name, entries), *_ = response
+        return self._record_entries(entries)
+
+    def dequeue(self, *, timeout: int = 1) -> str:
+        """
+        Dequeue one task ID, which must be passed to ``ack()`` once it has been
+        processed. Raises queue.Empty if none is available within ``timeout``
+        seconds.
+        """
+        task_ids = self.dequeue_many(1, timeout=timeout)
+        if not task_ids:
+            raise queue.Empty
+        return task_ids[0]
+
+    def ack(self, *task_ids: str) -> None:
+        """
+        Acknowledge tasks dequeued by this consumer, so that they are not delivered
+        again, and remove them from the stream.
+        """
+        unknown = [task_id for task_id in task_ids if task_id not in self._pending]
+        if unknown:
+            raise ValueError(
+                f"Cannot ack tasks not pending for this consumer: {', '.join(unknown)}"
+            )
+        entry_ids = [self._pending.pop(task_id) for task_id in task_ids]
+        if not entry_ids:
+            return
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.xack(self.stream_name, self.group, *entry_ids)
+            pipe.xdel(self.stream_name, *entry_ids)
+            pipe.execute()
@@ -1,13 +1,18 @@
 import json
+import time
 import typing as t
 
 from .redis import (
     INT_SERDE,
     JSON_SERDE,
+    ComputeRedisCompactEnumSerde,
     ComputeRedisEnumSerde,
+    ComputeRedisScriptRegistry,
+    ComputeRedisSlotPipeline,
     HasRedisFieldsMeta,
     RedisField,
 )
+from .redis.fields import _read_client
 from .tasks import InternalTaskState, TaskProtocol, TaskState
 
 try:
@@ -18,6 +23,250 @@ except ImportError:
     has_redis = False
 
 
+def _task_hname(task_id: str, *, cluster: bool = False) -> str:
+    if cluster:
+        # the hash tag places a task's hash and its state log in the same slot
+        return f"task_{{{task_id}}}"
+    return f"task_{task_id}"
+
+
+def _state_log_name(task_id: str, *, cluster: bool = False) -> str:
+    return f"{_task_hname(task_id, cluster=cluster)}:state_log"
+
+
+def _state_log_trimmed_name(task_id: str, *, cluster: bool = False) -> str:
+    return f"{_state_log_name(task_id, cluster=cluster)}:trimmed"
+
+
+def _index_name(
+    field_name: str, serialized_value: str, *, cluster: bool = False
+) -> str:
+    if cluster:
+        return f"task_index:{{{field_name}:{serialized_value}}}"
+    return f"task_index:{field_name}:{serialized_value}"
+
+
+# Create a task hash with all of its initial fields and a TTL, and add it to
+# indexes, but only if the hash does not already exist.
+#
+# KEYS[1]: the task hash name
+# KEYS[2...]: the names of indexes to which the task is added
+# ARGV[1]: TTL in seconds
+# ARGV[2]: the task_id
+# ARGV[3]: the index score, which is the time at which the task expires
+# ARGV[4...]: alternating field names and serialized values
+#
+# returns 1 if the task was created, 0 if it already existed
+_CREATE_TASK_SCRIPT = """\
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return 0
+end
+redis.call("HSET", KEYS[1], unpack(ARGV, 4))
+redis.call("EXPIRE", KEYS[1], ARGV[1])
+for i = 2, #KEYS do
+    redis.call("ZADD", KEYS[i], ARGV[3], ARGV[2])
+    redis.call("EXPIRE", KEYS[i], ARGV[1])
+end
+return 1
+"""
+
+# Append entries to a state log, trim it to a maximum length, and refresh its TTL.
+# The number of trimmed entries is counted so that readers can use offsets which
+# remain stable as old entries are dropped.
+#
+# KEYS[1]: the state log list name
+# KEYS[2]: the trimmed entry counter name
+# ARGV[1]: TTL in seconds
+# ARGV[2]: maximum length of the log, or 0 for no limit
+# ARGV[3...]: the serialized entries
+#
+# returns the length of the log before trimming
+_APPEND_STATE_LOG_SCRIPT = """\
+local length = redis.call("RPUSH", KEYS[1], unpack(ARGV, 3))
+local max_length = tonumber(ARGV[2])
+if max_length > 0 and length > max_length then
+    redis.call("LTRIM", KEYS[1], length - max_length, -1)
+    redis.call("INCRBY", KEYS[2], length - max_length)
+    redis.call("EXPIRE", KEYS[2], ARGV[1])
+end
+redis.call("EXPIRE", KEYS[1], ARGV[1])
+return length
+"""
+
+# Read entries from a state log starting at an offset which counts trimmed entries.
+#
+# KEYS[1]: the state log list name
+# KEYS[2]: the trimmed entry counter name
+# ARGV[1]: the offset of the first entry to read
+# ARGV[2]: the maximum number of entries to read, or 0 for no limit
+#
+# returns the offset of the first entry returned, and the entries
+_READ_STATE_LOG_SCRIPT = """\
+local trimmed = tonumber(redis.call("GET", KEYS[2]) or "0")
+local start = math.max(tonumber(ARGV[1]) - trimmed, 0)
+local stop = -1
+if tonumber(ARGV[2]) > 0 then
+    stop = start + tonumber(ARGV[2]) - 1
+end
+return {trimmed + start, redis.call("LRANGE", KEYS[1], start, stop)}
+"""
+
+# Update an existing task: set and delete hash fields, lower its TTL, append to its
+# state log, and move it between indexes. Index entries are scored by the time at
+# which the task expires, given its TTL after the update.
+#
+# KEYS[1]: the task hash name
+# KEYS[2]: the state log list name
+# KEYS[3]: the state log trimmed entry counter name
+# KEYS[4...]: index names; the first `index_add` have the task added, the next
+#             `index_rescore` are re-scored if they contain the task, and the
+#             remainder have it removed
+# ARGV[1]: a JSON object with the following keys
+#   set: alternating field names and serialized values to set
+#   del: field names to delete
+#   ttl: a TTL to apply to the task if lower than its current TTL, or 0
+#   log: serialized entries to append to the state log
+#   log_max_len: the maximum length of the state log, or 0 for no limit
+#   default_ttl: the TTL used for the state log and indexes
+#   task_id: the task_id
+#   now: the current time, to which the task's TTL is added to score indexes
+#   index_add: the number of index names in KEYS to which the task is added
+#   index_rescore: the number of index names in KEYS which are re-scored
+#
+# returns the TTL of the task after the update, -1 if it has none, or -2 if the
+# task does not exist, as for TTL
+_UPDATE_TASK_SCRIPT = """\
+local params = cjson.decode(ARGV[1])
+local current_ttl = redis.call("TTL", KEYS[1])
+if current_ttl == -2 then
+    return -2
+end
+if #params.set > 0 then
+    redis.call("HSET", KEYS[1], unpack(params.set))
+end
+if #params.del > 0 then
+    redis.call("HDEL", KEYS[1], unpack(params.del))
+end
+if params.ttl > 0 and (current_ttl < 0 or params.ttl < current_ttl) then
+    redis.call("EXPIRE", KEYS[1], params.ttl)
+    current_ttl = params.ttl
+end
+if #params.log > 0 then
+    local length = redis.call("RPUSH", KEYS[2], unpack(params.log))
+    if params.log_max_len > 0 and length > params.log_max_len then
+        redis.call("LTRIM", KEYS[2], length - params.log_max_len, -1)
+        redis.call("INCRBY", KEYS[3], length - params.log_max_len)
+        redis.call("EXPIRE", KEYS[3], params.default_ttl)
+    end
+    redis.call("EXPIRE", KEYS[2], params.default_ttl)
+end
+local index_score = params.now + params.default_ttl
+if current_ttl >= 0 then
+    index_score = params.now + current_ttl
+end
+for i = 4, #KEYS do
+    if i - 3 <= params.index_add then
+        redis.call("ZADD", KEYS[i], index_score, params.task_id)
+        redis.call("EXPIRE", KEYS[i], params.default_ttl)
+    elseif i - 3 <= params.index_add + params.index_rescore then
+        redis.call("ZADD", KEYS[i], "XX", index_score, params.task_id)
+    else
+        redis.call("ZREM", KEYS[i], params.task_id)
+    end
+end
+return current_ttl
+"""
+
+# scripts used by RedisTask, which can be preloaded with `TASK_SCRIPTS.load_all()`
+TASK_SCRIPTS = ComputeRedisScriptRegistry()
+TASK_SCRIPTS.register("create_task", _CREATE_TASK_SCRIPT)
+TASK_SCRIPTS.register("append_state_log", _APPEND_STATE_LOG_SCRIPT)
+TASK_SCRIPTS.register("read_state_log", _READ_STATE_LOG_SCRIPT)
+TASK_SCRIPTS.register("update_task", _UPDATE_TASK_SCRIPT)
+
+
+# the fields which may be passed when creating a task
+_CREATE_FIELD_NAMES = (
+    "user_id",
+    "function_id",
+    "container",
+    "payload",
+    "payload_reference",
+    "task_group_id",
+    "queue_name",
+    "endpoint_id",
+    "details",
+    # required fields, which are populated with defaults if not given
+    "status",
+    "internal_status",
+)
+
+
+def _initial_task_fields(task_class: t.Any, **kwargs: t.Any) -> t.Dict[str, str]:
+    """
+    Serialize the fields of a new task of a class with RedisFields (i.e. RedisTask
+    or AsyncRedisTask), including defaults for required fields, into a mapping
+    suitable for HSET.
+    """
+    unknown = set(kwargs) - set(_CREATE_FIELD_NAMES)
+    if unknown:
+        raise TypeError(f"Unknown RedisTask fields: {', '.join(sorted(unknown))}")
+    kwargs.setdefault("status", TaskState.WAITING_FOR_EP)
+    kwargs.setdefault("internal_status", InternalTaskState.INCOMPLETE)
+    return dict(
+        task_class._redis_fields[name].serialize_for(task_class, value)
+        for name, value in kwargs.items()
+        if value is not None
+    )
+
+
+def _task_index_name_for_value(task_class: t.Any, field_name: str, value: t.Any) -> str:
+    # index names always use the legacy serialization, so that they do not depend
+    # upon the storage layout
+    return _index_name(
+        field_name,
+        task_class._redis_fields[field_name].serde.serialize(value),
+        cluster=task_class.CLUSTER_KEYS,
+    )
+
+
+def _task_index_names(
+    task_class: t.Any, data: t.Mapping[str, t.Optional[str]]
+) -> t.List[str]:
+    """
+    Get the names of the indexes which contain a task of a class with RedisFields
+    (i.e. RedisTask or AsyncRedisTask) with the given raw hash data.
+    """
+    names = []
+    for name in task_class.INDEXED_FIELDS:
+        value = task_class._redis_fields[name].deserialize_from(task_class, data)
+        if value is not None:
+            names.append(_task_index_name_for_value(task_class, name, value))
+    return names
+
+
+def _task_index_score(task_class: t.Any, ttl: t.Optional[int] = None) -> float:
+    # the time at which a task with the given TTL expires; a task with no TTL (or
+    # that does not exist, i.e. negative TTLs) is scored with DEFAULT_TTL
+    if ttl is None or ttl < 0:
+        ttl = task_class.DEFAULT_TTL
+    return time.time() + ttl
+
+
+_T = t.TypeVar("_T")
+
+
+def _chunked(iterable: t.Iterable[_T], size: int) -> t.Iterator[t.List[_T]]:
+    chunk: t.List[_T] = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 class RedisTask(TaskProtocol, metaclass=HasRedisFieldsMeta):
     """
     ORM-esque class to wrap access to properties of tasks.
@@ -26,6 +275,10 @@ class RedisTask(TaskProtocol, metaclass=HasRedisFieldsMeta):
       Create a new task by instantiating this class, e.g.
       >>> RedisTask(redis_client, "foo_id")
 
+      Or, to create the task atomically in a single round trip, use the `create()`
+      classmethod, e.g.
+      >>> RedisTask.create(redis_client, "foo_id", user_id=1)
+
     Loading:
       Read a task from storage using the `load()` classmethod, e.g.
       >>> RedisTask.load(redis_client, "foo_id")
@@ -48,33 +301,92 @@ class RedisTask(TaskProtocol, metaclass=HasRedisFieldsMeta):
 
     There are several elements of this pattern of use which need to be fixed. It is
     important to be aware of the following:
-    - there is currently no use of Redis transactions, so nothing is atomic
+    - field writes are not atomic with respect to one another, except via the
+      `transition()` and `complete()` methods, which each update a task in a single
+      server-side script
     - Each time a field descriptor is accessed, it is read, returned, and discarded.
       Reading a field multiple times, even in a single python statement, is vulnerable
       to data races
     - no field requirements or validity are enforced -- reading a field can raise an
       error if bad data were written to Redis
     - each field is read individually, which can be inefficient and inconsistent (vs
-      getall or setall semantics)
+      getall or setall semantics), except on tasks which hold a snapshot of their
+      data (see `refresh()`, `bulk_load()` and `bulk_create()`)
     """
 
     # 2 weeks in seconds
     DEFAULT_TTL: t.ClassVar[int] = 1209600
 
+    # maximum number of entries kept in the status log; older entries are dropped
+    # None means that there is no limit
+    STATUS_LOG_MAX_LEN: t.ClassVar[t.Optional[int]] = None
+
+    # fields for which secondary indexes are maintained, e.g.
+    #   ("task_group_id", "endpoint_id", "user_id", "status")
+    # indexes are sorted sets of task IDs scored by their expiration time, and are
+    # updated whenever an indexed field or the TTL is written via RedisTask (or
+    # AsyncRedisTask, whose INDEXED_FIELDS must be set to match)
+    INDEXED_FIELDS: t.ClassVar[t.Tuple[str, ...]] = ()
+
+    # when True, fields are written under short keys and enums are written as
+    # numeric codes, keeping hashes small; data in either layout can be read
+    #
+    # Classes without it, including those of releases which predate it, read only
+    # the legacy layout: to them a compact task's fields are all missing, and
+    # loading one writes a duplicate default status (and internal_status) under
+    # the legacy keys. So, before enabling it, upgrade every process which reads
+    # or writes tasks to a release which supports it, and then enable it in all of
+    # them.
+    COMPACT_STORAGE: t.ClassVar[bool] = False
+
+    # when True, keys are laid out for Redis Cluster: a task's hash and state log
+    # share a hash tag, and so a slot, as required by the scripts which update
+    # them together. Each index is in its own slot, so indexes are updated after,
+    # rather than atomically with, the task. Tasks stored with one layout cannot
+    # be read with the other.
+    CLUSTER_KEYS: t.ClassVar[bool] = False
+
+    # number of tasks sent per pipeline by bulk operations
+    BULK_CHUNK_SIZE: t.ClassVar[int] = 1000
+
+    # populated by HasRedisFieldsMeta
+    _redis_fields: t.ClassVar[t.Dict[str, RedisField]]
+
+    # when set, a snapshot of the task hash from which fields are read
+    _redis_field_cache: t.Optional[t.Dict[str, str]] = None
+
+    # when set, field reads and `refresh()` use this client, e.g. a replica or a
+    # ComputeRedisReplicaPool, while writes use `redis_client`
+    # set `redis_read_primary`, or use `read_from_primary()`, to read after writing
+    redis_replica_client: t.Optional["redis.Redis[t.Any]"] = None
+    redis_read_primary: bool = False
+
     # required fields
     # TODO: when `required=True` is supported in `RedisField`, set it for all of these
-    status = t.cast(TaskState, RedisField(serde=ComputeRedisEnumSerde(TaskState)))
+    status = t.cast(
+        TaskState,
+        RedisField(
+            serde=ComputeRedisEnumSerde(TaskState),
+            compact_key="s",
+            compact_serde=ComputeRedisCompactEnumSerde(TaskState),
+        ),
+    )
     internal_status = t.cast(
-        InternalTaskState, RedisField(serde=ComputeRedisEnumSerde(InternalTaskState))
+        InternalTaskState,
+        RedisField(
+            serde=ComputeRedisEnumSerde(InternalTaskState),
+            compact_key="is",
+            compact_serde=ComputeRedisCompactEnumSerde(InternalTaskState),
+        ),
     )
-    user_id = t.cast(int, RedisField(serde=INT_SERDE))
-    function_id = t.cast(str, RedisField())
-    container = t.cast(str, RedisField())
-    task_group_id = t.cast(str, RedisField())
-    queue_name = t.cast(str, RedisField())
+    user_id = t.cast(int, RedisField(serde=INT_SERDE, compact_key="u"))
+    function_id = t.cast(str, RedisField(compact_key="f"))
+    container = t.cast(str, RedisField(compact_key="c"))
+    task_group_id = t.cast(str, RedisField(compact_key="g"))
+    queue_name = t.cast(str, RedisField(compact_key="q"))
     # end required fields
 
-    endpoint_id = t.cast(t.Optional[str], RedisField())
+    endpoint_id = t.cast(t.Optional[str], RedisField(compact_key="e"))
 
     # FIXME: `payload` is a string which is currently being round-tripped through the
     # JSON_SERDE. However, we cannot remove the use of the serde until we are prepared
@@ -91,17 +403,19 @@ class RedisTask(TaskProtocol, metaclass=HasRedisFieldsMeta):
     # alternatively, once `payload_reference` is populated on all tasks, we can use it
     # to include a bool flag for how the field should be deserialized. This would
     # require that the serde object itself have access to the payload_reference
-    payload = t.cast(t.Optional[str], RedisField(serde=JSON_SERDE))
+    payload = t.cast(t.Optional[str], RedisField(serde=JSON_SERDE, compact_key="p"))
     payload_reference = t.cast(
-        t.Optional[t.Dict[str, t.Any]], RedisField(serde=JSON_SERDE)
+        t.Optional[t.Dict[str, t.Any]], RedisField(serde=JSON_SERDE, compact_key="pr")
     )
-    result = t.cast(t.Optional[str], RedisField())
+    result = t.cast(t.Optional[str], RedisField(compact_key="r"))
     result_reference = t.cast(
-        t.Optional[t.Dict[str, t.Any]], RedisField(serde=JSON_SERDE)
+        t.Optional[t.Dict[str, t.Any]], RedisField(serde=JSON_SERDE, compact_key="rr")
+    )
+    details = t.cast(
+        t.Optional[t.Dict[str, t.Any]], RedisField(serde=JSON_SERDE, compact_key="d")
     )
-    details = t.cast(t.Optional[t.Dict[str, t.Any]], RedisField(serde=JSON_SERDE))
-    exception = t.cast(t.Optional[str], RedisField())
-    completion_time = t.cast(t.Optional[str], RedisField())
+    exception = t.cast(t.Optional[str], RedisField(compact_key="x"))
+    completion_time = t.cast(t.Optional[str], RedisField(compact_key="t"))
 
     def __init__(
         self,
@@ -132,14 +446,12 @@ class RedisTask(TaskProtocol, metaclass=HasRedisFieldsMeta):
         :param queue_name: name of AMQP queue where results will be sent
         :param endpoint_id: UUID of the endpoint the task was sent to
         """
-        # non-RedisField attributes of a RedisTask
-        self.hname = f"task_{task_id}"
-        self.state_log_name = f"{self.hname}:state_log"
-        self.redis_client = redis_client
-        self.task_id = task_id
+        self._bind(redis_client, task_id)
 
         # TODO: reject `RedisTask()` if the task_id already exists:
         #   if RedisTask.exists(redis_client, task_id): raise ...
+        # `RedisTask.create()` does this atomically, but `__init__` cannot until
+        # `load()` no longer relies on it
 
         # if required attributes are not yet set, initialize them to their defaults
         if self.status is None:
@@ -171,36 +483,469 @@ class RedisTask(TaskProtocol, metaclass=HasRedisFieldsMeta):
 
         self.ttl = self.DEFAULT_TTL
 
+    def _bind(self, redis_client: "redis.Redis[t.Any]", task_id: str) -> None:
+        # non-RedisField attributes of a RedisTask
+        self.hname = self._hname(task_id)
+        self.state_log_name = _state_log_name(task_id, cluster=self.CLUSTER_KEYS)
+        self.state_log_trimmed_name = _state_log_trimmed_name(
+            task_id, cluster=self.CLUSTER_KEYS
+        )
+        self.redis_client = redis_client
+        self.task_id = task_id
+
+    @classmethod
+    def _hname(cls, task_id: str) -> str:
+        return _task_hname(task_id, cluster=cls.CLUSTER_KEYS)
+
+    @classmethod
+    def _from_id(cls, redis_client: "redis.Redis[t.Any]", task_id: str) -> "RedisTask":
+        """Construct a task object without reading or writing any data"""
+        task = cls.__new__(cls)
+        task._bind(redis_client, task_id)
+        return task
+
+    @classmethod
+    def _from_snapshot(
+        cls, redis_client: "redis.Redis[t.Any]", task_id: str, data: t.Dict[str, str]
+    ) -> "RedisTask":
+        """Construct a task object whose fields are read from a snapshot"""
+        task = cls._from_id(redis_client, task_id)
+        task._redis_field_cache = data
+        return task
+
+    @classmethod
+    def _initial_fields(cls, **kwargs: t.Any) -> t.Dict[str, str]:
+        """
+        Serialize the fields of a new task, including defaults for required fields,
+        into a mapping suitable for HSET.
+        """
+        return _initial_task_fields(cls, **kwargs)
+
+    @classmethod
+    def _index_name_for_value(cls, field_name: str, value: t.Any) -> str:
+        return _task_index_name_for_value(cls, field_name, value)
+
+    @classmethod
+    def _index_names(cls, data: t.Mapping[str, t.Optional[str]]) -> t.List[str]:
+        """Get the names of the indexes which contain a task with the given data"""
+        return _task_index_names(cls, data)
+
+    @classmethod
+    def _storage_keys(cls, field_names: t.Iterable[str]) -> t.List[str]:
+        return [
+            key
+            for name in field_names
+            for key in cls._redis_fields[name].storage_keys(cls)
+        ]
+
+    @classmethod
+    def _index_score(cls, ttl: t.Optional[int] = None) -> float:
+        return _task_index_score(cls, ttl)
+
+    @classmethod
+    def _create_script_params(
+        cls, task_id: str, fields: t.Dict[str, str]
+    ) -> t.Dict[str, t.List[t.Any]]:
+        args: t.List[t.Any] = [cls.DEFAULT_TTL, task_id, cls._index_score()]
+        for key, value in fields.items():
+            args.extend((key, value))
+        keys = [cls._hname(task_id)]
+        if not cls.CLUSTER_KEYS:
+            keys.extend(cls._index_names(fields))
+        return {"keys": keys, "args": args}
+
+    @classmethod
+    def _queue_index_updates(
+        cls,
+        pipe: ComputeRedisSlotPipeline,
+        task_id: str,
+        add: t.Iterable[str],
+        remove: t.Iterable[str] = (),
+        *,
+        rescore: t.Iterable[str] = (),
+        score: t.Optional[float] = None,
+    ) -> None:
+        """
+        Queue index updates for a task, for use with CLUSTER_KEYS, where indexes
+        cannot be updated by the scripts which update the task itself.
+
+        The task is added to the ``add`` indexes, removed from the ``remove``
+        indexes, and re-scored in those of the ``rescore`` indexes which contain
+        it, with the given score (by default, that of a task with DEFAULT_TTL).
+        """
+        for index in remove:
+            pipe.add("zrem", index, task_id)
+        if score is None:
+            score = cls._index_score()
+        for index in add:
+            pipe.add("zadd", index, {task_id: score})
+            pipe.add("expire", index, cls.DEFAULT_TTL)
+        for index in rescore:
+            pipe.add("zadd", index, {task_id: score}, xx=True)
+
+    def _write_redis_field(self, field: RedisField, value: t.Any) -> None:
+        """
+        Called by RedisField to write a field, so that indexes can be updated in the
+        same transaction.
+        """
+        index_field_names = [
+            name for name in self.INDEXED_FIELDS if self._redis_fields[name] is field
+        ]
+        if not index_field_names:
+            field.store(self, value)
+            return
+        (name,) = index_field_names
+        new_index = self._index_name_for_value(name, value)
+        storage_keys = field.storage_keys(self)
+
+        if self.CLUSTER_KEYS:
+            with self.redis_client.pipeline(transaction=False) as read_pipe:
+                read_pipe.hmget(self.hname, storage_keys)
+                read_pipe.ttl(self.hname)
+                old_data, ttl_val = read_pipe.execute()
+            old_value = field.deserialize_from(self, dict(zip(storage_keys, old_data)))
+            field.store(self, value)
+            index_pipe = ComputeRedisSlotPipeline(self.redis_client)
+            old_indexes = []
+            if old_value is not None and old_value != value:
+                old_indexes.append(self._index_name_for_value(name, old_value))
+            self._queue_index_updates(
+                index_pipe,
+                self.task_id,
+                [new_index],
+                old_indexes,
+                score=self._index_score(ttl_val),
+            )
+            index_pipe.execute()
+            return
+
+        with self.redis_client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.hname)
+                    old_data = t.cast(
+                        t.List[t.Optional[str]], pipe.hmget(self.hname, storage_keys)
+                    )
+                    old_value = field.deserialize_from(
+                        self, dict(zip(storage_keys, old_data))
+                    )
+                    ttl_val = t.cast(int, pipe.ttl(self.hname))
+                    pipe.multi()
+                    field.write(self, pipe, value)
+                    if old_value is not None and old_value != value:
+                        pipe.zrem(
+                            self._index_name_for_value(name, old_value), self.task_id
+                        )
+                    pipe.zadd(new_index, {self.task_id: self._index_score(ttl_val)})
+                    pipe.expire(new_index, self.DEFAULT_TTL)
+                    pipe.execute()
+                    return
+                except redis.exceptions.WatchError:
+                    continue
+
+    @classmethod
+    def create(
+        cls,
+        redis_client: "redis.Redis[t.Any]",
+        task_id: str,
+        *,
+        user_id: t.Optional[int] = None,
+        function_id: t.Optional[str] = None,
+        container: t.Optional[str] = None,
+        payload: t.Optional[str] = None,
+        payload_reference: t.Optional[t.Dict[str, t.Any]] = None,
+        task_group_id: t.Optional[str] = None,
+        queue_name: t.Optional[str] = None,
+        endpoint_id: t.Optional[str] = None,
+        details: t.Optional[t.Dict[str, t.Any]] = None,
+    ) -> "RedisTask":
+        """
+        Create a new task atomically, in a single round trip.
+
+        All fields and the TTL are written by one server-side script. Raises a
+        ValueError if the task_id already exists, in which case nothing is written.
+
+        Parameters are the same as for ``__init__``.
+        """
+        fields = cls._initial_fields(
+            user_id=user_id,
+            function_id=function_id,
+            container=container,
+            payload=payload,
+            payload_reference=payload_reference,
+            task_group_id=task_group_id,
+            queue_name=queue_name,
+            endpoint_id=endpoint_id,
+            details=details,
+        )
+        created = TASK_SCRIPTS["create_task"](
+            redis_client, **cls._create_script_params(task_id, fields)
+        )
+        if not created:
+            raise ValueError(f"Conflict. Cannot create task {task_id}: already exists")
+        if cls.CLUSTER_KEYS and cls.INDEXED_FIELDS:
+            index_pipe = ComputeRedisSlotPipeline(redis_client)
+            cls._queue_index_updates(index_pipe, task_id, cls._index_names(fields))
+            index_pipe.execute()
+        return cls._from_id(redis_client, task_id)
+
+    @classmethod
+    def bulk_create(
+        cls,
+        redis_client: "redis.Redis[t.Any]",
+        tasks: t.Iterable[t.Mapping[str, t.Any]],
+        *,
+        chunk_size: t.Optional[int] = None,
+    ) -> t.Tuple[t.List["RedisTask"], t.List[str]]:
+        """
+        Create many tasks, using the same atomic script as ``create()`` for each
+        task, sent in pipelines of ``chunk_size`` tasks.
+
+        Each item of ``tasks`` is a mapping containing a ``task_id`` plus any of the
+        keyword arguments accepted by ``create()``.
+
+        Returns a tuple of the tasks which were created and the IDs of those which
+        already existed (and were therefore not modified), each in the order given.
+        The created tasks are hydrated with the data which was written, so reading
+        their fields does not contact Redis.
+        """
+        chunk_size = chunk_size or cls.BULK_CHUNK_SIZE
+        create_script = TASK_SCRIPTS["create_task"]
+        create_script.ensure_loaded(redis_client)
+
+        created: t.List["RedisTask"] = []
+        conflicts: t.List[str] = []
+        for chunk in _chunked(tasks, chunk_size):
+            chunk_fields = []
+            pipe = ComputeRedisSlotPipeline(redis_client)
+            for task_spec in chunk:
+                task_spec = dict(task_spec)
+                task_id = task_spec.pop("task_id")
+                fields = cls._initial_fields(**task_spec)
+                chunk_fields.append((task_id, fields))
+                pipe.add_script(
+                    create_script, **cls._create_script_params(task_id, fields)
+                )
+            results = pipe.execute()
+
+            index_pipe = ComputeRedisSlotPipeline(redis_client)
+            for (task_id, fields), was_created in zip(chunk_fields, results):
+                if was_created:
+                    created.append(cls._from_snapshot(redis_client, task_id, fields))
+                    if cls.CLUSTER_KEYS:
+                        cls._queue_index_updates(
+                            index_pipe, task_id, cls._index_names(fields)
+                        )
+                else:
+                    conflicts.append(task_id)
+            index_pipe.execute()
+        return created, conflicts
+
     @property
     def ttl(self) -> int:
         return self.redis_client.ttl(self.hname)
 
     @ttl.setter
     def ttl(self, expiration: int) -> None:
-        """Expires task after expiration time, if not already set."""
-        ttl_val = self.redis_client.ttl(self.hname)
-        if ttl_val < 0 or expiration < ttl_val:
-            # expire was not already set
-            self.redis_client.expire(self.hname, expiration)
+        """
+        Expires task after expiration time, if not already set or lower. The task's
+        index entries are re-scored to expire along with it.
+        """
+        if not self.INDEXED_FIELDS:
+            ttl_val = self.redis_client.ttl(self.hname)
+            if ttl_val < 0 or expiration < ttl_val:
+                # expire was not already set
+                self.redis_client.expire(self.hname, expiration)
+            return
+
+        keys = self._storage_keys(self.INDEXED_FIELDS)
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.ttl(self.hname)
+            pipe.hmget(self.hname, keys)
+            ttl_val, values = pipe.execute()
+        if not (ttl_val < 0 or expiration < ttl_val):
+            return
+        current = {k: v for k, v in zip(keys, values) if v is not None}
+        # with CLUSTER_KEYS, the indexes are in other slots than the task, so they
+        # cannot be updated in the same transaction
+        slot_pipe = ComputeRedisSlotPipeline(
+            self.redis_client, transaction=not self.CLUSTER_KEYS
+        )
+        slot_pipe.add("expire", self.hname, expiration)
+        self._queue_index_updates(
+            slot_pipe,
+            self.task_id,
+            (),
+            rescore=self._index_names(current),
+            score=self._index_score(expiration),
+        )
+        slot_pipe.execute()
 
     def delete(self) -> None:
         """Removes this task from Redis, to be used after the result is gotten"""
-        self.redis_client.delete(self.hname)
+        if not self.INDEXED_FIELDS:
+            self.redis_client.delete(self.hname)
+            return
+
+        keys = self._storage_keys(self.INDEXED_FIELDS)
+        values = self.redis_client.hmget(self.hname, keys)
+        current = {k: v for k, v in zip(keys, values) if v is not None}
+        # with CLUSTER_KEYS, the indexes are in other slots than the task, so they
+        # cannot be updated in the same transaction
+        slot_pipe = ComputeRedisSlotPipeline(
+            self.redis_client, transaction=not self.CLUSTER_KEYS
+        )
+        for index in self._index_names(current):
+            slot_pipe.add("zrem", index, self.task_id)
+        slot_pipe.add("delete", self.hname)
+        slot_pipe.execute()
+
+    @classmethod
+    def _index_criteria_names(cls, criteria: t.Dict[str, t.Any]) -> t.List[str]:
+        if not criteria:
+            raise ValueError("At least one indexed field must be given")
+        names = []
+        for name, value in criteria.items():
+            if name not in cls.INDEXED_FIELDS:
+                raise ValueError(f"Cannot find tasks by '{name}': not indexed")
+            names.append(cls._index_name_for_value(name, value))
+        return names
+
+    @classmethod
+    def find_ids(
+        cls, redis_client: "redis.Redis[t.Any]", **criteria: t.Any
+    ) -> t.List[str]:
+        """
+        Find the IDs of tasks by the values of indexed fields, as in
+          >>> RedisTask.find_ids(redis_client, endpoint_id="foo_ep", status=status)
+
+        When several fields are given, only tasks matching all of them are returned.
+        Index entries for expired tasks are removed as they are encountered.
+
+        The order of the IDs is unspecified.
+        """
+        now = time.time()
+        with redis_client.pipeline(transaction=False) as pipe:
+            for index in cls._index_criteria_names(criteria):
+                pipe.zremrangebyscore(index, "-inf", now)
+                pipe.zrangebyscore(index, now, "+inf")
+            results = pipe.execute()
+
+        matching_ids = set(results[1])
+        for ids in results[3::2]:
+            matching_ids.intersection_update(ids)
+        return list(matching_ids)
+
+    @classmethod
+    def find(
+        cls, redis_client: "redis.Redis[t.Any]", **criteria: t.Any
+    ) -> t.List["RedisTask"]:
+        """
+        Find tasks by the values of indexed fields, as with ``find_ids()``, and load
+        them with ``bulk_load()``.
+        """
+        found, _missing = cls.bulk_load(
+            redis_client, cls.find_ids(redis_client, **criteria)
+        )
+        return found
 
     @classmethod
     def exists(cls, redis_client: "redis.Redis[t.Any]", task_id: str) -> bool:
         """Check if a given task_id exists in Redis"""
-        return bool(redis_client.exists(f"task_{task_id}"))
+        return bool(redis_client.exists(cls._hname(task_id)))
 
     @classmethod
-    def load(cls, redis_client: "redis.Redis[t.Any]", task_id: str) -> "RedisTask":
+    def load(
+        cls,
+        redis_client: "redis.Redis[t.Any]",
+        task_id: str,
+        *,
+        replica_client: t.Optional["redis.Redis[t.Any]"] = None,
+    ) -> "RedisTask":
         """
         Load a task from storage. Raises a ValueError if the task is not found.
+
+        If ``replica_client`` is given, the task's subsequent field reads use it.
+        Loading itself always uses ``redis_client``.
         """
         # TODO: This has a race condition. Encapsulate it in a transaction.
         if not cls.exists(redis_client, task_id):
             raise ValueError(f"Cannot load task {task_id}: does not exist")
-        return cls(redis_client, task_id)
+        task = cls(redis_client, task_id)
+        task.redis_replica_client = replica_client
+        return task
+
+    @classmethod
+    def bulk_load(
+        cls,
+        redis_client: "redis.Redis[t.Any]",
+        task_ids: t.Iterable[str],
+        *,
+        chunk_size: t.Optional[int] = None,
+        replica_client: t.Optional["redis.Redis[t.Any]"] = None,
+    ) -> t.Tuple[t.List["RedisTask"], t.List[str]]:
+        """
+        Load many tasks, fetching their data and TTLs in pipelines of ``chunk_size``
+        tasks. As with ``load()``, a ``replica_client`` is only used by the tasks
+        for subsequent reads, e.g. in ``refresh()``.
+
+        As with ``load()``, any task which is missing its required status fields or
+        its TTL has them set to the defaults. Missing tasks do not raise an error.
+
+        Returns a tuple of the tasks which were found and the IDs of those which
+        were not, each in the order given. The tasks are hydrated with a snapshot of
+        their data, so reading their fields does not contact Redis. Use
+        ``refresh()`` to update the snapshot.
+        """
+        chunk_size = chunk_size or cls.BULK_CHUNK_SIZE
+        required_fields = [
+            cls._redis_fields["status"],
+            cls._redis_fields["internal_status"],
+        ]
+        defaults = cls._initial_fields()
+
+        found: t.List["RedisTask"] = []
+        missing: t.List[str] = []
+        for chunk in _chunked(task_ids, chunk_size):
+            with redis_client.pipeline(transaction=False) as pipe:
+                for task_id in chunk:
+                    pipe.hgetall(cls._hname(task_id))
+                    pipe.ttl(cls._hname(task_id))
+                results = pipe.execute()
+
+            needs_fixup = False
+            with redis_client.pipeline(transaction=False) as fixup_pipe:
+                for i, task_id in enumerate(chunk):
+                    data, ttl = results[2 * i], results[2 * i + 1]
+                    if not data:
+                        missing.append(task_id)
+                        continue
+                    task = cls._from_snapshot(redis_client, task_id, data)
+                    task.redis_replica_client = replica_client
+                    found.append(task)
+
+                    hname = cls._hname(task_id)
+                    for field in required_fields:
+                        if field.deserialize_from(cls, data) is None:
+                            key = field.storage_keys(cls)[0]
+                            fixup_pipe.hsetnx(hname, key, defaults[key])
+                            data[key] = defaults[key]
+                            needs_fixup = True
+                    if ttl < 0:
+                        fixup_pipe.expire(hname, cls.DEFAULT_TTL)
+                        needs_fixup = True
+                if needs_fixup:
+                    fixup_pipe.execute()
+        return found, missing
+
+    def refresh(self) -> None:
+        """
+        Read all fields of this task in a single round trip, and serve subsequent
+        field reads from that snapshot.
+
+        The snapshot is read from the replica client, if the task has one.
+        """
+        self._redis_field_cache = _read_client(self).hgetall(self.hname)
 
     @property
     def status_log(self) -> t.Iterable[t.Any]:
@@ -210,5 +955,186 @@ class RedisTask(TaskProtocol, metaclass=HasRedisFieldsMeta):
 
     @status_log.setter
     def status_log(self, new_state: t.Any) -> None:
-        self.redis_client.rpush(self.state_log_name, json.dumps(new_state))
-        self.redis_client.expire(self.state_log_name, self.DEFAULT_TTL)
+        self.append_status_log(new_state)
+
+    def append_status_log(self, *new_states: t.Any) -> None:
+        """
+        Append one or more entries to the status log in a single round trip.
+
+        If ``STATUS_LOG_MAX_LEN`` is set, the oldest entries beyond that length are
+        dropped.
+        """
+        if not new_states:
+            return
+        TASK_SCRIPTS["append_state_log"](
+            self.redis_client,
+            keys=[self.state_log_name, self.state_log_trimmed_name],
+            args=[self.DEFAULT_TTL, self.STATUS_LOG_MAX_LEN or 0]
+            + [json.dumps(s) for s in new_states],
+        )
+
+    def read_status_log(
+        self, offset: int = 0, *, count: t.Optional[int] = None
+    ) -> t.Tuple[t.List[t.Any], int]:
+        """
+        Read status log entries, starting at ``offset``.
+
+        Offsets count every entry ever appended, including those which have been
+        dropped due to ``STATUS_LOG_MAX_LEN``, so they remain stable as the log is
+        trimmed. If entries at the requested offset have been dropped, reading
+        starts at the oldest remaining entry.
+
+        Returns the entries and the offset from which to read next, so that new
+        entries can be followed with
+          >>> entries, offset = task.read_status_log(offset)
+
+        :param offset: the offset of the first entry to read
+        :param count: the maximum number of entries to read
+        """
+        start, entries = TASK_SCRIPTS["read_state_log"](
+            self.redis_client,
+            keys=[self.state_log_name, self.state_log_trimmed_name],
+            args=[offset, count or 0],
+        )
+        return [json.loads(i) for i in entries], int(start) + len(entries)
+
+    def _atomic_update(
+        self,
+        values: t.Mapping[str, t.Any],
+        *,
+        log_entries: t.Sequence[t.Any] = (),
+        ttl: t.Optional[int] = None,
+    ) -> None:
+        """
+        Set fields, append to the status log, lower the TTL, and update indexes, all
+        in a single round trip. Raises a ValueError if the task does not exist.
+
+        When a TTL is given, the task's entries in the indexes of fields which are
+        not being set are re-scored to expire along with it; their names are read
+        first, in an extra round trip.
+
+        With CLUSTER_KEYS, indexes are updated afterwards, in a further round trip.
+
+        Values which are None are not written.
+        """
+        values = {name: value for name, value in values.items() if value is not None}
+
+        set_args: t.List[str] = []
+        del_keys: t.List[str] = []
+        for name, value in values.items():
+            field = self._redis_fields[name]
+            set_args.extend(field.serialize_for(self, value))
+            del_keys.extend(field.storage_keys(self)[1:])
+
+        # the previous value of an indexed field is not known in advance, so the
+        # task is removed from the indexes for all other possible values
+        index_add: t.List[str] = []
+        index_remove: t.List[str] = []
+        for name in self.INDEXED_FIELDS:
+            if name not in values:
+                continue
+            enum_class = getattr(self._redis_fields[name].serde, "enum_class", None)
+            if enum_class is None:
+                raise ValueError(
+                    f"Cannot atomically update indexed field '{name}': only enum "
+                    "fields are supported"
+                )
+            for member in enum_class:
+                index = self._index_name_for_value(name, member)
+                (index_add if member == values[name] else index_remove).append(index)
+
+        index_rescore: t.List[str] = []
+        unset_indexed_fields = [n for n in self.INDEXED_FIELDS if n not in values]
+        if ttl and unset_indexed_fields:
+            storage_keys = self._storage_keys(unset_indexed_fields)
+            current = self.redis_client.hmget(self.hname, storage_keys)
+            index_rescore = self._index_names(
+                {k: v for k, v in zip(storage_keys, current) if v is not None}
+            )
+
+        params = {
+            "set": set_args,
+            "del": del_keys,
+            "ttl": ttl or 0,
+            "log": [json.dumps(entry) for entry in log_entries],
+            "log_max_len": self.STATUS_LOG_MAX_LEN or 0,
+            "default_ttl": self.DEFAULT_TTL,
+            "task_id": self.task_id,
+            "now": time.time(),
+            "index_add": 0 if self.CLUSTER_KEYS else len(index_add),
+            "index_rescore": 0 if self.CLUSTER_KEYS else len(index_rescore),
+        }
+        keys = [self.hname, self.state_log_name, self.state_log_trimmed_name]
+        if not self.CLUSTER_KEYS:
+            keys += index_add + index_rescore + index_remove
+        ttl_val = TASK_SCRIPTS["update_task"](
+            self.redis_client, keys=keys, args=[json.dumps(params)]
+        )
+        if ttl_val == -2:
+            raise ValueError(f"Cannot update task {self.task_id}: does not exist")
+        if self.CLUSTER_KEYS and (index_add or index_rescore):
+            index_pipe = ComputeRedisSlotPipeline(self.redis_client)
+            self._queue_index_updates(
+                index_pipe,
+                self.task_id,
+                index_add,
+                index_remove,
+                rescore=index_rescore,
+                score=self._index_score(ttl_val),
+            )
+            index_pipe.execute()
+
+        if self._redis_field_cache is not None:
+            for key in del_keys:
+                self._redis_field_cache.pop(key, None)
+            self._redis_field_cache.update(zip(set_args[::2], set_args[1::2]))
+
+    def transition(self, new_status: TaskState, log_entry: t.Any = None) -> None:
+        """
+        Set the status of the task and, optionally, append an entry to its status
+        log, atomically and in a single round trip.
+
+        Raises a ValueError if the task does not exist.
+        """
+        log_entries = [] if log_entry is None else [log_entry]
+        self._atomic_update({"status": new_status}, log_entries=log_entries)
+
+    def complete(
+        self,
+        *,
+        result: t.Optional[str] = None,
+        result_reference: t.Optional[t.Dict[str, t.Any]] = None,
+        exception: t.Optional[str] = None,
+        completion_time: t.Optional[str] = None,
+        status: t.Optional[TaskState] = None,
+        log_entry: t.Any = None,
+        ttl: t.Optional[int] = None,
+    ) -> None:
+        """
+        Mark the task as complete, atomically and in a single round trip.
+
+        ``internal_status`` is set to COMPLETE, and any other given values are
+        written.
+
+        Raises a ValueError if the task does not exist.
+
+        :param result: the result of the task
+        :param result_reference: the reference to the result, from TaskStorage
+        :param exception: the exception raised by the task
+        :param completion_time: the time at which the task completed
+        :param status: a new status for the task
+        :param log_entry: an entry to append to the status log
+        :param ttl: a new TTL for the task, applied only if lower than the current one
+        """
+        self._atomic_update(
+            {
+                "internal_status": InternalTaskState.COMPLETE,
+                "status": status,
+                "result": result,
+                "result_reference": result_reference,
+                "exception": exception,
+                "completion_time": completion_time,
+            },
+            log_entries=[] if log_entry is None else [log_entry],
+            ttl=ttl,
+        )
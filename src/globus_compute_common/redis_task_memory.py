@@ -0,0 +1,103 @@
+"""
+A tool for measuring the memory which RedisTask hashes use in Redis, comparing the
+legacy and compact storage layouts.
+
+Run it against a Redis server which is safe to write test data to, e.g.
+
+    python -m globus_compute_common.redis_task_memory --num-tasks 1000
+
+Tasks created for measurement are deleted afterwards.
+"""
+
+import argparse
+import typing as t
+import uuid
+
+from .redis import default_redis_connection_factory
+from .redis_task import RedisTask
+
+if t.TYPE_CHECKING:
+    import redis
+
+
+def _sample_task_fields(payload_size: int) -> t.Dict[str, t.Any]:
+    return {
+        "user_id": 12345,
+        "function_id": str(uuid.uuid4()),
+        "container": str(uuid.uuid4()),
+        "task_group_id": str(uuid.uuid4()),
+        "queue_name": f"{uuid.uuid4()}.results",
+        "endpoint_id": str(uuid.uuid4()),
+        "payload": "x" * payload_size,
+        "payload_reference": {"storage_id": "redis"},
+    }
+
+
+def measure_task_memory(
+    redis_client: "redis.Redis[t.Any]",
+    *,
+    compact: bool,
+    num_tasks: int = 100,
+    payload_size: int = 32,
+) -> t.Tuple[float, t.Dict[str, int]]:
+    """
+    Create sample tasks in the requested layout and measure them with MEMORY USAGE.
+
+    Returns the mean number of bytes per task hash, and a count of the Redis
+    encodings used for the hashes (e.g. ``{"listpack": 100}``).
+
+    :param redis_client: the Redis client to use; MEMORY USAGE must be supported
+    :param compact: whether to use the compact storage layout
+    :param num_tasks: the number of tasks to create and measure, at least 1
+    :param payload_size: the size of the payload stored on each task
+    """
+    if num_tasks < 1:
+        raise ValueError(f"num_tasks must be at least 1, not {num_tasks}")
+
+    class MeasuredRedisTask(RedisTask):
+        COMPACT_STORAGE = compact
+
+    specs = [
+        {"task_id": str(uuid.uuid4()), **_sample_task_fields(payload_size)}
+        for _ in range(num_tasks)
+    ]
+    tasks, _ = MeasuredRedisTask.bulk_create(redis_client, specs)
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for task in tasks:
+                pipe.memory_usage(task.hname)
+                pipe.object("encoding", task.hname)
+            results = pipe.execute()
+    finally:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for task in tasks:
+                pipe.delete(task.hname)
+            pipe.execute()
+
+    sizes = results[::2]
+    encodings: t.Dict[str, int] = {}
+    for encoding in results[1::2]:
+        encodings[encoding] = encodings.get(encoding, 0) + 1
+    return sum(sizes) / len(sizes), encodings
+
+
+def main() -> None:  # pragma: no cover
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--redis-url", help="defaults to COMPUTE_COMMON_REDIS_URL")
+    parser.add_argument("--num-tasks", type=int, default=100)
+    parser.add_argument("--payload-size", type=int, default=32)
+    args = parser.parse_args()
+
+    redis_client = default_redis_connection_factory(args.redis_url)
+    for label, compact in (("legacy", False), ("compact", True)):
+        size, encodings = measure_task_memory(
+            redis_client,
+            compact=compact,
+            num_tasks=args.num_tasks,
+            payload_size=args.payload_size,
+        )
+        print(f"{label}: {size:.1f} bytes per task, encodings: {encodings}")
+
+
+if __name__ == "__main__":
+    main()
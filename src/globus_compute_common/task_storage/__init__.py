@@ -1,4 +1,5 @@
 from .base import StorageException, TaskStorage
+from .caching import CachingTaskStorage
 from .default_storage import get_default_task_storage
 from .redis import ImplicitRedisStorage
 from .s3 import RedisS3Storage
@@ -8,5 +9,6 @@ __all__ = (
     "StorageException",
     "RedisS3Storage",
     "ImplicitRedisStorage",
+    "CachingTaskStorage",
     "get_default_task_storage",
 )
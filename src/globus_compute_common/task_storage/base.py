@@ -1,6 +1,7 @@
 import abc
 import typing as t
 
+from ..redis.fields import _read_client
 from ..tasks import TaskProtocol
 
 
@@ -12,6 +13,57 @@ class StorageException(Exception):
         return f"Storage request failed due to reason: {self.reason}"
 
 
+def _read_task_fields(
+    tasks: t.Sequence[TaskProtocol], field_names: t.Sequence[str]
+) -> t.List[t.Dict[str, t.Any]]:
+    """
+    Read the named fields of many tasks, as a dict for each task, in order.
+
+    The fields of tasks which are stored in Redis fields (as for RedisTask) are read
+    in one pipeline per Redis client, rather than in a round trip per field of each
+    task. Those of other tasks, and of tasks holding a snapshot, are read as
+    attributes.
+    """
+    values: t.List[t.Dict[str, t.Any]] = [{} for _ in tasks]
+    # tasks to read from each client, by client ID
+    groups: t.Dict[int, t.Tuple[t.Any, t.List[int]]] = {}
+    for i, task in enumerate(tasks):
+        redis_fields = getattr(task, "_redis_fields", None)
+        if (
+            redis_fields is None
+            or getattr(task, "_redis_field_cache", None) is not None
+            or not all(name in redis_fields for name in field_names)
+        ):
+            values[i] = {name: getattr(task, name) for name in field_names}
+        else:
+            client = _read_client(task)
+            groups.setdefault(id(client), (client, []))[1].append(i)
+
+    # RedisTask-like tasks, with attributes beyond those of TaskProtocol
+    redis_tasks: t.Sequence[t.Any] = tasks
+    for client, indices in groups.values():
+        keys = []
+        with client.pipeline(transaction=False) as pipe:
+            for i in indices:
+                task = redis_tasks[i]
+                task_keys = [
+                    key
+                    for name in field_names
+                    for key in task._redis_fields[name].storage_keys(task)
+                ]
+                pipe.hmget(task.hname, task_keys)
+                keys.append(task_keys)
+            responses = pipe.execute()
+        for i, task_keys, response in zip(indices, keys, responses):
+            task = redis_tasks[i]
+            data = dict(zip(task_keys, response))
+            values[i] = {
+                name: task._redis_fields[name].deserialize_from(task, data)
+                for name in field_names
+            }
+    return values
+
+
 class TaskStorage(abc.ABC):
     """
     Abstract class which defines the interface for task storage.
@@ -48,3 +100,32 @@ class TaskStorage(abc.ABC):
         Returns a string if a payload was found, and None otherwise.
         Raises a storage exception if retrieval failed
         """
+
+    def get_results(
+        self, tasks: t.Sequence[TaskProtocol]
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        """
+        Get the results of many tasks, in order.
+        Each is a string if a result was found, None otherwise, or the
+        StorageException raised if its retrieval failed.
+        """
+        return [_get_or_error(self.get_result, task) for task in tasks]
+
+    def get_payloads(
+        self, tasks: t.Sequence[TaskProtocol]
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        """
+        Get the payloads of many tasks, in order.
+        Each is a string if a payload was found, None otherwise, or the
+        StorageException raised if its retrieval failed.
+        """
+        return [_get_or_error(self.get_payload, task) for task in tasks]
+
+
+def _get_or_error(
+    get: t.Callable[[TaskProtocol], t.Optional[str]], task: TaskProtocol
+) -> t.Union[str, None, StorageException]:
+    try:
+        return get(task)
+    except StorageException as err:
+        return err
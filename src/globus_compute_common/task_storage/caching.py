@@ -0,0 +1,292 @@
+import collections
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import typing as t
+
+from ..tasks import TaskProtocol
+from .base import StorageException, TaskStorage, _read_task_fields
+from .s3 import StorageFieldName
+
+_CacheKey = t.Tuple[str, str]
+
+
+def _cache_key(reference: t.Optional[t.Dict[str, t.Any]]) -> t.Optional[_CacheKey]:
+    # the bucket and key of an S3 reference, or None for any other reference
+    if not reference or reference.get("storage_id") != "s3":
+        return None
+    bucket, key = reference.get("s3bucket"), reference.get("key")
+    if not isinstance(bucket, str) or not isinstance(key, str):
+        return None
+    return bucket, key
+
+
+class CachingTaskStorage(TaskStorage):
+    """
+    Wraps another TaskStorage (e.g. RedisS3Storage), caching the results and
+    payloads which it stores in S3, so that objects which are read repeatedly are
+    only fetched from S3 once.
+
+    Values are cached by the bucket and key of their S3 reference, in memory, in
+    least-recently-used order, up to ``max_memory_bytes``. If a ``cache_dir`` is
+    given, values are also cached there, up to ``max_disk_bytes``, so that they
+    outlive values evicted from memory, and the process itself. Values stored in
+    Redis are not cached.
+
+    Values are cached as they are stored and fetched. Objects in S3 are assumed not
+    to change once referenced by a task, other than by being stored again through
+    this cache, so a cache directory shared by several processes may serve stale
+    values for objects overwritten by another process.
+    """
+
+    def __init__(
+        self,
+        storage: TaskStorage,
+        *,
+        max_memory_bytes: int = 256 * 1024 * 1024,
+        cache_dir: t.Optional[t.Union[str, "os.PathLike[str]"]] = None,
+        max_disk_bytes: int = 1024 * 1024 * 1024,
+    ) -> None:
+        """
+        :param storage: the storage whose values are cached
+        :param max_memory_bytes: the max memory used by values cached in memory
+        :param cache_dir: a directory in which to cache values, or None to cache
+            them only in memory
+        :param max_disk_bytes: the max size of the files in ``cache_dir``
+        """
+        self.storage = storage
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = None if cache_dir is None else os.fspath(cache_dir)
+        self.max_disk_bytes = max_disk_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # each value and its size in bytes, by key, least recently used first
+        self._memory: "collections.OrderedDict[_CacheKey, t.Tuple[str, int]]" = (
+            collections.OrderedDict()
+        )
+        self._memory_bytes = 0
+        # the size of each file in the cache directory, least recently used first
+        self._disk: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self._disk_bytes = 0
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def __repr__(self) -> str:
+        return f"CachingTaskStorage(storage={self.storage}, cache_dir={self.cache_dir})"
+
+    def _load_disk_index(self) -> None:
+        # index the files left by a previous cache, least recently used first
+        assert self.cache_dir is not None
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _path(self, name: str) -> str:
+        assert self.cache_dir is not None
+        return os.path.join(self.cache_dir, name)
+
+    @staticmethod
+    def _file_name(key: _CacheKey) -> str:
+        return hashlib.sha256("/".join(key).encode("utf-8")).hexdigest()
+
+    def _evict_memory(self) -> None:
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, size) = self._memory.popitem(last=False)
+            self._memory_bytes -= size
+
+    def _evict_disk(self) -> None:
+        while self._disk_bytes > self.max_disk_bytes:
+            name, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.unlink(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    def _cache_in_memory(self, key: _CacheKey, value: str) -> None:
+        size = sys.getsizeof(value)
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous[1]
+            if size <= self.max_memory_bytes:
+                self._memory[key] = (value, size)
+                self._memory_bytes += size
+                self._evict_memory()
+
+    def _cache_on_disk(self, key: _CacheKey, value: str) -> None:
+        if self.cache_dir is None:
+            return
+        data = value.encode("utf-8")
+        if len(data) > self.max_disk_bytes:
+            return
+        name = self._file_name(key)
+        # write to a temporary file first, so that a partially written file is
+        # never read
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(name))
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            return
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(name, 0)
+            self._disk[name] = len(data)
+            self._disk_bytes += len(data)
+            self._evict_disk()
+
+    def _put(self, key: _CacheKey, value: str) -> None:
+        self._cache_in_memory(key, value)
+        self._cache_on_disk(key, value)
+
+    def _get(self, key: _CacheKey) -> t.Optional[str]:
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            name = self._file_name(key)
+            on_disk = self.cache_dir is not None and name in self._disk
+            if on_disk:
+                self._disk.move_to_end(name)
+
+        if on_disk:
+            try:
+                with open(self._path(name), "rb") as f:
+                    value = f.read().decode("utf-8")
+                os.utime(self._path(name))
+            except OSError:
+                # evicted since it was found
+                pass
+            else:
+                self._cache_in_memory(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def invalidate(self, reference: t.Optional[t.Dict[str, t.Any]]) -> None:
+        """Remove the value of a task's result or payload reference from the cache"""
+        key = _cache_key(reference)
+        if key is None:
+            return
+        with self._lock:
+            cached = self._memory.pop(key, None)
+            if cached is not None:
+                self._memory_bytes -= cached[1]
+            name = self._file_name(key)
+            if self.cache_dir is not None and name in self._disk:
+                self._disk_bytes -= self._disk.pop(name)
+                try:
+                    os.unlink(self._path(name))
+                except FileNotFoundError:
+                    pass
+
+    def clear(self) -> None:
+        """Remove all values from the cache"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for name in self._disk:
+                try:
+                    os.unlink(self._path(name))
+                except FileNotFoundError:
+                    pass
+            self._disk.clear()
+            self._disk_bytes = 0
+
+    def _stored(self, task: TaskProtocol, field: StorageFieldName, value: str) -> None:
+        key = _cache_key(getattr(task, field.reference_attr))
+        if key is not None:
+            self._put(key, value)
+
+    def _get_one(
+        self,
+        task: TaskProtocol,
+        field: StorageFieldName,
+        get: t.Callable[[TaskProtocol], t.Optional[str]],
+    ) -> t.Optional[str]:
+        key = _cache_key(getattr(task, field.reference_attr))
+        if key is not None:
+            cached = self._get(key)
+            if cached is not None:
+                return cached
+        value = get(task)
+        if key is not None and value is not None:
+            self._put(key, value)
+        return value
+
+    def _get_many(
+        self,
+        tasks: t.Sequence[TaskProtocol],
+        field: StorageFieldName,
+        get_many: t.Callable[
+            [t.Sequence[TaskProtocol]], t.List[t.Union[str, None, StorageException]]
+        ],
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        results: t.List[t.Union[str, None, StorageException]] = [None] * len(tasks)
+        # the cache key of each task which was not found in the cache, by index
+        misses: t.Dict[int, t.Optional[_CacheKey]] = {}
+        references = _read_task_fields(tasks, (field.reference_attr,))
+        for i, fields in enumerate(references):
+            key = _cache_key(fields[field.reference_attr])
+            cached = None if key is None else self._get(key)
+            if cached is None:
+                misses[i] = key
+            else:
+                results[i] = cached
+
+        if misses:
+            values = get_many([tasks[i] for i in misses])
+            for (i, key), value in zip(misses.items(), values):
+                results[i] = value
+                if key is not None and isinstance(value, str):
+                    self._put(key, value)
+        return results
+
+    def store_result(self, task: TaskProtocol, result: str) -> None:
+        self.storage.store_result(task, result)
+        self._stored(task, StorageFieldName.result, result)
+
+    def get_result(self, task: TaskProtocol) -> t.Optional[str]:
+        return self._get_one(task, StorageFieldName.result, self.storage.get_result)
+
+    def get_results(
+        self, tasks: t.Sequence[TaskProtocol]
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        return self._get_many(tasks, StorageFieldName.result, self.storage.get_results)
+
+    def store_payload(self, task: TaskProtocol, payload: str) -> None:
+        self.storage.store_payload(task, payload)
+        self._stored(task, StorageFieldName.payload, payload)
+
+    def get_payload(self, task: TaskProtocol) -> t.Optional[str]:
+        return self._get_one(task, StorageFieldName.payload, self.storage.get_payload)
+
+    def get_payloads(
+        self, tasks: t.Sequence[TaskProtocol]
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        return self._get_many(
+            tasks, StorageFieldName.payload, self.storage.get_payloads
+        )
@@ -0,0 +1,194 @@
+import abc
+import base64
+import codecs
+import typing as t
+import zlib
+
+try:
+    import zstandard
+
+    has_zstandard = True
+except ImportError:
+    has_zstandard = False
+
+from .base import StorageException
+
+# the key, in a result or payload reference, of the codec with which the data was
+# compressed; data whose reference has no codec was not compressed
+#
+# Releases which predate compression ignore this key, and so read compressed values
+# as their base64 text (from Redis) or fail to decode them (from S3). So, before
+# enabling compression in any writer, upgrade every process which reads results or
+# payloads to a release which supports it.
+CODEC_KEY = "codec"
+
+# values shorter than this many characters are not compressed
+DEFAULT_COMPRESSION_THRESHOLD: int = 1024
+
+# errors raised for corrupt data, including invalid base64 and UTF-8 (ValueErrors)
+_DECOMPRESSION_ERRORS: t.Tuple[t.Type[Exception], ...] = (ValueError, zlib.error)
+if has_zstandard:
+    _DECOMPRESSION_ERRORS += (zstandard.ZstdError,)
+
+
+class StorageCodec(abc.ABC):
+    """A compression algorithm, which task storage records by its ``name``"""
+
+    name: str
+
+    @abc.abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compress data"""
+
+    @abc.abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        """Decompress data, raising an error if it is corrupt"""
+
+    @abc.abstractmethod
+    def decompressor(self) -> t.Any:
+        """
+        Get an object which decompresses data given a part at a time, with
+        ``decompress()`` and ``flush()`` methods, as from ``zlib.decompressobj()``
+        """
+
+
+class ZlibCodec(StorageCodec):
+    name = "zlib"
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+    def decompressor(self) -> t.Any:
+        return zlib.decompressobj()
+
+
+class ZstdCodec(StorageCodec):
+    name = "zstd"
+
+    def __init__(self, level: int = 3) -> None:
+        if not has_zstandard:
+            raise RuntimeError(
+                "Cannot use zstd compression since the zstandard package is not "
+                "available. Either install it explicitly or install the 'zstd' "
+                "extra, as in\n"
+                "  pip install 'globus-compute-common[zstd]'"
+            )
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        # compressors are not thread-safe, so one is created for each call
+        return t.cast(bytes, zstandard.ZstdCompressor(level=self.level).compress(data))
+
+    def decompress(self, data: bytes) -> bytes:
+        return t.cast(bytes, zstandard.ZstdDecompressor().decompress(data))
+
+    def decompressor(self) -> t.Any:
+        return zstandard.ZstdDecompressor().decompressobj()
+
+
+_CODECS: t.Dict[str, t.Type[StorageCodec]] = {
+    ZlibCodec.name: ZlibCodec,
+    ZstdCodec.name: ZstdCodec,
+}
+
+
+def get_codec(name: str) -> StorageCodec:
+    """Get a codec by name, e.g. ``"zlib"`` or ``"zstd"``"""
+    try:
+        codec_class = _CODECS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown compression codec '{name}', expected one of: "
+            f"{', '.join(_CODECS)}"
+        ) from None
+    return codec_class()
+
+
+def compress_value(
+    value: str, codec: t.Optional[StorageCodec], min_size: int
+) -> t.Optional[bytes]:
+    """
+    Compress a value with a codec, returning None if it should be stored
+    uncompressed: if there is no codec, the value is shorter than ``min_size``
+    characters, or compression does not make it smaller.
+    """
+    if codec is None or len(value) < min_size:
+        return None
+    data = value.encode("utf-8")
+    compressed = codec.compress(data)
+    if len(compressed) >= len(data):
+        return None
+    return compressed
+
+
+def to_text(data: bytes) -> str:
+    """Represent compressed data as text, for storage in Redis"""
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_value(
+    data: t.Union[str, bytes, bytearray], reference: t.Optional[t.Dict[str, t.Any]]
+) -> str:
+    """
+    Decode a value as stored, decompressing it if its reference names a codec.
+    Compressed data may be given as raw bytes, or as text from ``to_text()``.
+
+    Raises StorageException if the data cannot be decompressed.
+    """
+    codec_name = reference.get(CODEC_KEY) if reference else None
+    if codec_name is None:
+        return data if isinstance(data, str) else data.decode("utf-8")
+
+    try:
+        codec = get_codec(codec_name)
+    except (ValueError, RuntimeError) as err:
+        raise StorageException(str(err)) from err
+    try:
+        raw = base64.b64decode(data) if isinstance(data, str) else bytes(data)
+        return codec.decompress(raw).decode("utf-8")
+    except _DECOMPRESSION_ERRORS as err:
+        raise StorageException(
+            f"Decompressing data with codec '{codec_name}' failed"
+        ) from err
+
+
+class IncrementalValueDecoder:
+    """
+    Decodes a value as stored, as with ``decode_value()``, from its raw bytes given
+    a part at a time, so that the whole of the raw data need not be held at once.
+
+    Raises StorageException if the data cannot be decompressed.
+    """
+
+    def __init__(self, reference: t.Optional[t.Dict[str, t.Any]]) -> None:
+        self.codec_name = reference.get(CODEC_KEY) if reference else None
+        self._decompressor: t.Any = None
+        if self.codec_name is not None:
+            try:
+                self._decompressor = get_codec(self.codec_name).decompressor()
+            except (ValueError, RuntimeError) as err:
+                raise StorageException(str(err)) from err
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        """Decode the next part of the data, which is the last if ``final``"""
+        if self._decompressor is None:
+            return self._text_decoder.decode(data, final)
+        try:
+            data = self._decompressor.decompress(data)
+            if final:
+                data += self._decompressor.flush()
+                # a truncated stream is not an error until it is known to be done
+                if not getattr(self._decompressor, "eof", True):
+                    raise ValueError("Compressed data ended unexpectedly")
+            return self._text_decoder.decode(data, final)
+        except _DECOMPRESSION_ERRORS as err:
+            raise StorageException(
+                f"Decompressing data with codec '{self.codec_name}' failed"
+            ) from err
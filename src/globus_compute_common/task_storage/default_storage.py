@@ -24,14 +24,24 @@ def _s3_bucket_name() -> t.Optional[str]:
     return os.getenv("COMPUTE_S3_BUCKET_NAME")
 
 
+def _storage_compression() -> t.Optional[str]:
+    # the name of a codec, e.g. "zlib" or "zstd"; unset or empty to not compress
+    # set it only once every reader of results and payloads is upgraded to a release
+    # which can decompress them
+    return os.getenv("COMPUTE_STORAGE_COMPRESSION") or None
+
+
 def get_default_task_storage() -> TaskStorage:
     bucket = _s3_bucket_name()
     threshold = _get_redis_storage_threshold()
+    compression = _storage_compression()
 
     # a redis threshold of -1 means "never use S3, just use Redis"
     if bucket is None or threshold == -1:
-        return ImplicitRedisStorage()
+        return ImplicitRedisStorage(compression=compression)
     else:
         return RedisS3Storage(
-            bucket_name=bucket, redis_threshold=_get_redis_storage_threshold()
+            bucket_name=bucket,
+            redis_threshold=_get_redis_storage_threshold(),
+            compression=compression,
         )
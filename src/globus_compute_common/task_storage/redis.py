@@ -1,7 +1,16 @@
 import typing as t
 
 from ..tasks import TaskProtocol
-from .base import TaskStorage
+from .base import StorageException, TaskStorage, _read_task_fields
+from .compression import (
+    CODEC_KEY,
+    DEFAULT_COMPRESSION_THRESHOLD,
+    StorageCodec,
+    compress_value,
+    decode_value,
+    get_codec,
+    to_text,
+)
 
 
 class ImplicitRedisStorage(TaskStorage):
@@ -10,30 +19,102 @@ class ImplicitRedisStorage(TaskStorage):
 
     It is named "implicit" because it assumes that the task object itself is some form
     of RedisTask which will write to redis either on setattr or some save/commit step.
+
+    If ``compression`` names a codec (``"zlib"`` or ``"zstd"``), values of at least
+    ``compression_threshold`` characters are stored compressed, as base64 text, and
+    the codec is recorded in their reference. Compressed values are decompressed
+    when read, whether or not compression is enabled. Earlier releases read them as
+    their base64 text, so enable compression only once every reader is upgraded.
     """
 
+    def __init__(
+        self,
+        *,
+        compression: t.Optional[str] = None,
+        compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+    ) -> None:
+        """
+        :param compression: The name of the codec with which to compress values,
+            or None to store them uncompressed
+        :param compression_threshold: Min size(chars) of the values compressed
+        """
+        self.codec = None if compression is None else get_codec(compression)
+        self.compression_threshold = compression_threshold
+
+    def _store(self, task: TaskProtocol, name: str, value: str) -> None:
+        compressed = compress_value(value, self.codec, self.compression_threshold)
+        if compressed is None:
+            self._store_encoded(task, name, value, None)
+        else:
+            self._store_encoded(task, name, to_text(compressed), self.codec)
+
+    def _store_encoded(
+        self,
+        task: TaskProtocol,
+        name: str,
+        data: str,
+        codec: t.Optional[StorageCodec],
+    ) -> None:
+        """
+        Store data which is already encoded, e.g. compressed with ``codec``, as the
+        field ``name`` ("result" or "payload") of a task.
+        """
+        reference: t.Dict[str, t.Any] = {"storage_id": "redis"}
+        if codec is not None:
+            reference[CODEC_KEY] = codec.name
+        setattr(task, name, data)
+        setattr(task, f"{name}_reference", reference)
+
+    def _get_many(
+        self, tasks: t.Sequence[TaskProtocol], name: str
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        # read each task's value and its reference, for the codec, in one round trip
+        reference_attr = f"{name}_reference"
+        results: t.List[t.Union[str, None, StorageException]] = []
+        for fields in _read_task_fields(tasks, (name, reference_attr)):
+            if not fields[name]:
+                results.append(None)
+                continue
+            try:
+                results.append(decode_value(fields[name], fields[reference_attr]))
+            except StorageException as err:
+                results.append(err)
+        return results
+
+    def _get(self, task: TaskProtocol, name: str) -> t.Optional[str]:
+        (result,) = self._get_many([task], name)
+        if isinstance(result, StorageException):
+            raise result
+        return result
+
     def store_result(
         self,
         task: TaskProtocol,
         result: str,
     ) -> None:
-        task.result = result
-        task.result_reference = {"storage_id": "redis"}
+        self._store(task, "result", result)
 
     def get_result(self, task: TaskProtocol) -> t.Optional[str]:
-        if task.result:
-            return task.result
-        return None
+        return self._get(task, "result")
+
+    def get_results(
+        self, tasks: t.Sequence[TaskProtocol]
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        """Get the results of many tasks, in one pipeline per Redis client"""
+        return self._get_many(tasks, "result")
 
     def store_payload(
         self,
         task: TaskProtocol,
         payload: str,
     ) -> None:
-        task.payload = payload
-        task.payload_reference = {"storage_id": "redis"}
+        self._store(task, "payload", payload)
 
     def get_payload(self, task: TaskProtocol) -> t.Optional[str]:
-        if task.payload:
-            return task.payload
-        return None
+        return self._get(task, "payload")
+
+    def get_payloads(
+        self, tasks: t.Sequence[TaskProtocol]
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        """Get the payloads of many tasks, in one pipeline per Redis client"""
+        return self._get_many(tasks, "payload")
@@ -1,8 +1,17 @@
+import collections
+import concurrent.futures
+import datetime
+import hashlib
+import io
+import itertools
 import typing as t
 from enum import Enum
 
 try:
     import boto3
+    import boto3.exceptions
+    import boto3.s3.transfer
+    import botocore.config
     import botocore.exceptions
 
     has_boto3 = True
@@ -10,9 +19,31 @@ except ImportError:
     has_boto3 = False
 
 from ..tasks import TaskProtocol
-from .base import StorageException, TaskStorage
+from .base import StorageException, TaskStorage, _read_task_fields
+from .compression import (
+    CODEC_KEY,
+    DEFAULT_COMPRESSION_THRESHOLD,
+    IncrementalValueDecoder,
+    StorageCodec,
+    compress_value,
+    decode_value,
+    to_text,
+)
 from .redis import ImplicitRedisStorage
 
+# S3 does not accept multipart upload parts smaller than this, other than the last
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+# the age, in seconds, of a deduplicated payload beyond which storing it again
+# resets its age; younger payloads are not copied, so that storing a shared payload
+# usually costs only a HEAD request
+DEFAULT_DEDUP_REFRESH_AGE = 24 * 60 * 60
+
+# deduplicated payloads should outlive the tasks which reference them, which by
+# default expire after 14 days (see RedisTask.DEFAULT_TTL), even when their age was
+# last reset up to DEFAULT_DEDUP_REFRESH_AGE before being stored
+DEFAULT_DEDUP_EXPIRATION_DAYS = 16
+
 
 class StorageFieldName(Enum):
     result = "result"
@@ -23,16 +54,96 @@ class StorageFieldName(Enum):
         return f"{self.value}_reference"
 
 
+class _UTF8Reader(io.RawIOBase):
+    """
+    A readable stream of the UTF-8 encoding of a string, which is encoded as it is
+    read, so that the whole encoded string is never held in memory at once.
+    """
+
+    def __init__(self, text: str, chunk_chars: int = 1024 * 1024) -> None:
+        self._text = text
+        self._chunk_chars = chunk_chars
+        self._position = 0
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: t.Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            size = len(self._buffer) + 4 * (len(self._text) - self._position)
+        while len(self._buffer) < size and self._position < len(self._text):
+            end = self._position + self._chunk_chars
+            self._buffer += self._text[self._position : end].encode("utf-8")
+            self._position = end
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readinto(self, buffer: t.Any) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
 class RedisS3Storage(TaskStorage):
     """
     Abstract storage over Redis and S3.
     Uses Redis to store objects below of size threshold, and S3 for the rest
+
+    If ``compression`` names a codec (``"zlib"`` or ``"zstd"``), values of at least
+    ``compression_threshold`` characters are compressed before the size threshold
+    is applied, so that more of them fit in Redis. Compressed values are stored as
+    base64 text in Redis and as raw bytes in S3, and the codec is recorded in their
+    reference. Compressed values are decompressed when read, whether or not
+    compression is enabled. Earlier releases cannot decode them, so do not enable
+    compression until every process which reads them has been upgraded.
+
+    If ``dedup_payloads`` is set, payloads stored in S3 are keyed by the SHA-256
+    hash of their content, under ``dedup_prefix``, so that identical payloads (e.g.
+    of the tasks of a map) are uploaded and stored once, and shared by the tasks
+    which reference them. Storing a payload which already exists only checks for
+    it with a HEAD request, unless it is older than ``dedup_refresh_age``, in which
+    case its age is reset with a copy of the object onto itself rather than an
+    upload. Shared objects can then be cleaned up by an S3 lifecycle rule which
+    expires them once no task has stored them for longer than the task TTL plus
+    ``dedup_refresh_age``; install it with ``install_dedup_lifecycle_rule()``, or
+    add ``dedup_lifecycle_rule()`` to the bucket's lifecycle configuration by other
+    means. Nothing else deletes them.
     """
 
-    def __init__(self, *, bucket_name: str, redis_threshold: int) -> None:
+    def __init__(
+        self,
+        *,
+        bucket_name: str,
+        redis_threshold: int,
+        multipart_threshold: int = 16 * 1024 * 1024,
+        part_size: int = 8 * 1024 * 1024,
+        max_concurrency: int = 8,
+        max_pool_connections: int = 32,
+        compression: t.Optional[str] = None,
+        compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+        dedup_payloads: bool = False,
+        dedup_prefix: str = "dedup/payload/",
+        dedup_refresh_age: int = DEFAULT_DEDUP_REFRESH_AGE,
+    ) -> None:
         """
         :param bucket_name: Name of the S3 bucket to use
         :param redis_threshold: Max size(chars) of the data that redis accommodates
+        :param multipart_threshold: Min size(chars) of the data that is uploaded to
+            S3 in parts, in parallel
+        :param part_size: Size(bytes) of the parts in which large data is uploaded
+            and downloaded; at least 5MiB, the minimum for S3 multipart uploads
+        :param max_concurrency: Max number of parts transferred at once per object
+        :param max_pool_connections: Max number of connections to S3 kept open, and
+            of objects fetched at once by ``get_results()`` and ``get_payloads()``
+        :param compression: The name of the codec with which to compress values,
+            or None to store them uncompressed
+        :param compression_threshold: Min size(chars) of the values compressed
+        :param dedup_payloads: Whether to store payloads in S3 by content hash, once
+            for all tasks with the same payload
+        :param dedup_prefix: The prefix of the keys of deduplicated payloads
+        :param dedup_refresh_age: The age(seconds) beyond which a deduplicated
+            payload's age is reset when it is stored again
         """
 
         if not has_boto3:
@@ -43,34 +154,201 @@ class RedisS3Storage(TaskStorage):
                 "  pip install 'globus-compute-common[boto3]'"
             )
 
+        if part_size < S3_MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {S3_MIN_PART_SIZE} bytes")
+
         self.bucket_name = bucket_name
-        self.client = boto3.client("s3")
+        self.max_pool_connections = max_pool_connections
+        self.client = boto3.client(
+            "s3",
+            config=botocore.config.Config(max_pool_connections=max_pool_connections),
+        )
+
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.transfer_config = boto3.s3.transfer.TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=max_concurrency,
+        )
 
         self.redis_threshold = redis_threshold
-        self.redis_storage = ImplicitRedisStorage()
+        self.redis_storage = ImplicitRedisStorage(
+            compression=compression, compression_threshold=compression_threshold
+        )
+        self.codec = self.redis_storage.codec
+        self.compression_threshold = compression_threshold
 
-    def _store_to_s3(
-        self, task: TaskProtocol, storage_field_name: StorageFieldName, result: str
-    ) -> None:
-        key = f"{task.task_id}.{storage_field_name.reference_attr}"
-        try:
+        self.dedup_payloads = dedup_payloads
+        self.dedup_prefix = dedup_prefix
+        self.dedup_refresh_age = dedup_refresh_age
+
+    def _upload(self, key: str, data: t.Union[str, bytes]) -> None:
+        if len(data) >= self.multipart_threshold:
+            # upload in parts, in parallel, encoding each part as it is read
+            self.client.upload_fileobj(
+                io.BytesIO(data) if isinstance(data, bytes) else _UTF8Reader(data),
+                Bucket=self.bucket_name,
+                Key=key,
+                Config=self.transfer_config,
+            )
+        else:
             self.client.put_object(
-                Body=result.encode("utf-8"),
+                Body=data if isinstance(data, bytes) else data.encode("utf-8"),
                 Bucket=self.bucket_name,
                 Key=key,
             )
-        except botocore.exceptions.ClientError as err:
+
+    def _set_reference(
+        self,
+        task: TaskProtocol,
+        storage_field_name: StorageFieldName,
+        key: str,
+        codec: t.Optional[StorageCodec],
+    ) -> None:
+        reference = {
+            "storage_id": "s3",
+            "s3bucket": self.bucket_name,
+            "key": key,
+        }
+        if codec is not None:
+            reference[CODEC_KEY] = codec.name
+        setattr(task, storage_field_name.reference_attr, reference)
+
+    def _store_to_s3(
+        self,
+        task: TaskProtocol,
+        storage_field_name: StorageFieldName,
+        result: t.Union[str, bytes],
+        codec: t.Optional[StorageCodec] = None,
+    ) -> None:
+        """
+        Store a string, or data compressed with ``codec``, as an object in S3
+        """
+        key = f"{task.task_id}.{storage_field_name.reference_attr}"
+        try:
+            self._upload(key, result)
+        except (
+            botocore.exceptions.ClientError,
+            boto3.exceptions.S3UploadFailedError,
+        ) as err:
             raise StorageException(
                 f"Putting {storage_field_name.reference_attr} into s3 for "
                 f"task:{task.task_id} failed"
             ) from err
+        self._set_reference(task, storage_field_name, key, codec)
+
+    def _content_key(self, data: t.Union[str, bytes]) -> str:
+        """The key of data stored by its content, from the hash of its bytes"""
+        digest = hashlib.sha256()
+        if isinstance(data, bytes):
+            digest.update(data)
         else:
-            reference = {
-                "storage_id": "s3",
-                "s3bucket": self.bucket_name,
-                "key": key,
-            }
-            setattr(task, storage_field_name.reference_attr, reference)
+            # hash the encoded string a part at a time, as it is uploaded
+            reader = _UTF8Reader(data)
+            part = reader.read(self.part_size)
+            while part:
+                digest.update(part)
+                part = reader.read(self.part_size)
+        return f"{self.dedup_prefix}{digest.hexdigest()}"
+
+    def _refresh(self, key: str) -> bool:
+        """
+        Check that an object exists and, if it is older than ``dedup_refresh_age``,
+        reset its age, for lifecycle expiration, by copying it onto itself. Returns
+        False if it does not exist.
+        """
+        try:
+            head = self.client.head_object(Bucket=self.bucket_name, Key=key)
+            age = datetime.datetime.now(datetime.timezone.utc) - head["LastModified"]
+            if age.total_seconds() >= self.dedup_refresh_age:
+                # a managed copy, which copies objects over 5GB (the limit of a
+                # single CopyObject request) in parts
+                self.client.copy(
+                    {"Bucket": self.bucket_name, "Key": key},
+                    self.bucket_name,
+                    key,
+                    ExtraArgs={"MetadataDirective": "REPLACE"},
+                    Config=self.transfer_config,
+                )
+        except botocore.exceptions.ClientError as err:
+            if err.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return False
+            raise
+        return True
+
+    def _store_to_s3_deduplicated(
+        self,
+        task: TaskProtocol,
+        storage_field_name: StorageFieldName,
+        data: t.Union[str, bytes],
+        codec: t.Optional[StorageCodec] = None,
+    ) -> None:
+        """
+        Store data as an object in S3 keyed by its content, uploading it only if
+        no such object exists
+        """
+        key = self._content_key(data)
+        try:
+            if not self._refresh(key):
+                self._upload(key, data)
+        except (
+            botocore.exceptions.ClientError,
+            boto3.exceptions.S3UploadFailedError,
+        ) as err:
+            raise StorageException(
+                f"Putting {storage_field_name.reference_attr} into s3 for "
+                f"task:{task.task_id} failed"
+            ) from err
+        self._set_reference(task, storage_field_name, key, codec)
+
+    def dedup_lifecycle_rule(
+        self, expiration_days: int = DEFAULT_DEDUP_EXPIRATION_DAYS
+    ) -> t.Dict[str, t.Any]:
+        """
+        Get an S3 lifecycle rule which deletes deduplicated payloads once no task
+        has stored them for ``expiration_days``, for the ``Rules`` of the bucket's
+        lifecycle configuration. ``expiration_days`` should exceed the TTL of tasks
+        plus ``dedup_refresh_age``.
+        """
+        return {
+            "ID": "globus-compute-dedup-payload-expiration",
+            "Filter": {"Prefix": self.dedup_prefix},
+            "Status": "Enabled",
+            "Expiration": {"Days": expiration_days},
+        }
+
+    def install_dedup_lifecycle_rule(
+        self, expiration_days: int = DEFAULT_DEDUP_EXPIRATION_DAYS
+    ) -> None:
+        """
+        Add ``dedup_lifecycle_rule()`` to the lifecycle configuration of the bucket,
+        replacing any previous version of it and keeping any other rules.
+
+        This requires permission to get and put the bucket's lifecycle
+        configuration, so it is not done automatically, and is typically run once
+        when deploying.
+        """
+        rule = self.dedup_lifecycle_rule(expiration_days)
+        try:
+            try:
+                rules = self.client.get_bucket_lifecycle_configuration(
+                    Bucket=self.bucket_name
+                )["Rules"]
+            except botocore.exceptions.ClientError as err:
+                code = err.response.get("Error", {}).get("Code")
+                if code != "NoSuchLifecycleConfiguration":
+                    raise
+                rules = []
+            rules = [r for r in rules if r.get("ID") != rule["ID"]] + [rule]
+            self.client.put_bucket_lifecycle_configuration(
+                Bucket=self.bucket_name, LifecycleConfiguration={"Rules": rules}
+            )
+        except botocore.exceptions.ClientError as err:
+            raise StorageException(
+                f"Installing the lifecycle rule of bucket {self.bucket_name} failed"
+            ) from err
 
     def _get_from_s3(
         self, task: TaskProtocol, storage_field_name: StorageFieldName
@@ -80,6 +358,21 @@ class RedisS3Storage(TaskStorage):
             raise StorageException(
                 f"task {task.task_id} result reference was None inside of _get_from_s3"
             )
+        bucket, key = self._s3_location(task, storage_field_name, reference)
+        try:
+            return self._download(bucket, key, reference)
+        except botocore.exceptions.ClientError as err:
+            raise StorageException(
+                f"Fetching object from S3 failed for: {task.task_id}"
+            ) from err
+
+    def _s3_location(
+        self,
+        task: TaskProtocol,
+        storage_field_name: StorageFieldName,
+        reference: t.Dict[str, t.Any],
+    ) -> t.Tuple[str, str]:
+        """Get the bucket and key of an S3 reference, checking that they are valid"""
         try:
             bucket = reference["s3bucket"]
             key = reference["key"]
@@ -101,26 +394,181 @@ class RedisS3Storage(TaskStorage):
                 f"task {task.task_id} {storage_field_name.reference_attr} "
                 f"pointed to S3, but key was of type {type(key)} (expected string)"
             )
+        return bucket, key
+
+    def _get_range(
+        self,
+        bucket: str,
+        key: str,
+        start: int,
+        end: int,
+        if_match: t.Optional[str] = None,
+    ) -> t.Any:
+        kwargs = {} if if_match is None else {"IfMatch": if_match}
+        return self.client.get_object(
+            Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", **kwargs
+        )
 
+    def _download(
+        self, bucket: str, key: str, reference: t.Optional[t.Dict[str, t.Any]]
+    ) -> str:
+        """
+        Download an object and decode it, as with ``decode_value()``. The first part
+        is requested alone, so that small objects are fetched in a single request,
+        and any further parts are then requested in parallel, each only if the
+        object still has the first part's ETag.
+
+        Parts are decoded in order as they arrive, with up to ``max_concurrency``
+        parts in flight, so that only those are held as bytes, rather than the
+        whole object.
+        """
+        decoder = IncrementalValueDecoder(reference)
         try:
-            response = self.client.get_object(Bucket=bucket, Key=key)
+            response = self._get_range(bucket, key, 0, self.part_size - 1)
         except botocore.exceptions.ClientError as err:
-            raise StorageException(
-                f"Fetching object from S3 failed for: {task.task_id}"
-            ) from err
-        body = response["Body"]
-        return t.cast(str, body.read().decode("utf-8"))
+            if err.response.get("Error", {}).get("Code") != "InvalidRange":
+                raise
+            # an empty object has no ranges
+            body = self.client.get_object(Bucket=bucket, Key=key)["Body"].read()
+            return decoder.decode(body, final=True)
+
+        first_part = response["Body"].read()
+        # e.g. "bytes 0-8388607/123456789"
+        content_range = response.get("ContentRange")
+        size = (
+            int(content_range.rsplit("/", 1)[1]) if content_range else len(first_part)
+        )
+        if size <= len(first_part):
+            return decoder.decode(first_part, final=True)
+
+        etag = response["ETag"]
+        starts = iter(range(len(first_part), size, self.part_size))
+        pieces = [decoder.decode(first_part)]
+        del first_part
+
+        def fetch_part(start: int) -> bytes:
+            end = min(start + self.part_size, size) - 1
+            response = self._get_range(bucket, key, start, end, if_match=etag)
+            return t.cast(bytes, response["Body"].read())
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_concurrency) as executor:
+            pending = collections.deque(
+                executor.submit(fetch_part, start)
+                for start in itertools.islice(starts, self.max_concurrency)
+            )
+            while pending:
+                part = pending.popleft().result()
+                for start in itertools.islice(starts, 1):
+                    pending.append(executor.submit(fetch_part, start))
+                pieces.append(decoder.decode(part))
+                del part
+        pieces.append(decoder.decode(b"", final=True))
+        return "".join(pieces)
+
+    def _get_many(
+        self, tasks: t.Sequence[TaskProtocol], storage_field_name: StorageFieldName
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        """
+        Get a field of many tasks. The fields and references of tasks in Redis are
+        read in one pipeline, and objects in S3 are fetched in parallel, up to
+        ``max_pool_connections`` at once.
+        """
+        name, reference_attr = (
+            storage_field_name.value,
+            storage_field_name.reference_attr,
+        )
+        results: t.List[t.Union[str, None, StorageException]] = [None] * len(tasks)
+        # the bucket and key of each object to fetch, by task index
+        locations: t.Dict[int, t.Tuple[str, str]] = {}
+        fields = _read_task_fields(tasks, (name, reference_attr))
+        for i, (task, task_fields) in enumerate(zip(tasks, fields)):
+            data, reference = task_fields[name], task_fields[reference_attr]
+            if data:
+                # values stored in Redis, including those of tasks launched with
+                # v0.3.3 and prior, which have no reference
+                try:
+                    results[i] = decode_value(data, reference)
+                except StorageException as err:
+                    results[i] = err
+            elif not reference or reference["storage_id"] == "redis":
+                results[i] = None
+            elif reference["storage_id"] == "s3":
+                try:
+                    locations[i] = self._s3_location(
+                        task, storage_field_name, reference
+                    )
+                except StorageException as err:
+                    results[i] = err
+            else:
+                results[i] = StorageException(f"Unknown Storage requested: {reference}")
+
+        def fetch(i: int) -> None:
+            bucket, key = locations[i]
+            try:
+                results[i] = self._download(bucket, key, fields[i][reference_attr])
+            except botocore.exceptions.ClientError as err:
+                error = StorageException(
+                    f"Fetching object from S3 failed for: {tasks[i].task_id}"
+                )
+                error.__cause__ = err
+                results[i] = error
+            except StorageException as err:
+                results[i] = err
+
+        if len(locations) == 1:
+            # a single object is fetched without starting a thread pool
+            fetch(next(iter(locations)))
+        elif locations:
+            workers = min(self.max_pool_connections, len(locations))
+            with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+                for _ in executor.map(fetch, locations):
+                    pass
+        return results
+
+    def _get(
+        self, task: TaskProtocol, storage_field_name: StorageFieldName
+    ) -> t.Optional[str]:
+        (result,) = self._get_many([task], storage_field_name)
+        if isinstance(result, StorageException):
+            raise result
+        return result
+
+    def _store(
+        self, task: TaskProtocol, storage_field_name: StorageFieldName, value: str
+    ) -> None:
+        compressed = compress_value(value, self.codec, self.compression_threshold)
+        data: t.Union[str, bytes]
+        if compressed is None:
+            data, text, codec = value, value, None
+        else:
+            data, text, codec = compressed, to_text(compressed), self.codec
+
+        if len(text) <= self.redis_threshold:
+            self.redis_storage._store_encoded(
+                task, storage_field_name.value, text, codec
+            )
+        # Task is too big for Redis, store in S3
+        elif self.dedup_payloads and storage_field_name is StorageFieldName.payload:
+            self._store_to_s3_deduplicated(task, storage_field_name, data, codec)
+        else:
+            self._store_to_s3(task, storage_field_name, data, codec)
+
+    def get_results(
+        self, tasks: t.Sequence[TaskProtocol]
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        return self._get_many(tasks, StorageFieldName.result)
+
+    def get_payloads(
+        self, tasks: t.Sequence[TaskProtocol]
+    ) -> t.List[t.Union[str, None, StorageException]]:
+        return self._get_many(tasks, StorageFieldName.payload)
 
     def store_result(
         self,
         task: TaskProtocol,
         result: str,
     ) -> None:
-        if len(result) > self.redis_threshold:
-            # Task is too big for Redis, store in S3
-            self._store_to_s3(task, StorageFieldName.result, result)
-        else:
-            self.redis_storage.store_result(task, result)
+        self._store(task, StorageFieldName.result, result)
 
     def get_result(self, task: TaskProtocol) -> t.Optional[str]:
         """
@@ -129,33 +577,10 @@ class RedisS3Storage(TaskStorage):
         :return: Results result if available, else returns None
         Raises StorageException if fetching fails
         """
-        # We should be able to safely remove the following block
-        # once all tasks launched with v0.3.3 and prior have TTL'ed out
-        if task.result:
-            return task.result
-
-        if task.result_reference:
-            if task.result_reference["storage_id"] == "s3":
-                return self._get_from_s3(task, StorageFieldName.result)
-
-            # The following is redundant now while the block above
-            # for backward compat exists
-            # remove the pragma once this is an active codepath
-            elif task.result_reference["storage_id"] == "redis":  # pragma: no cover
-                return self.redis_storage.get_result(task)
-            else:
-                raise StorageException(
-                    f"Unknown Storage requested: {task.result_reference}"
-                )
-        else:
-            return None
+        return self._get(task, StorageFieldName.result)
 
     def store_payload(self, task: TaskProtocol, payload: str) -> None:
-        if len(payload) > self.redis_threshold:
-            # Task is too big for Redis, store in S3
-            self._store_to_s3(task, StorageFieldName.payload, payload)
-        else:
-            self.redis_storage.store_payload(task, payload)
+        self._store(task, StorageFieldName.payload, payload)
 
     def get_payload(self, task: TaskProtocol) -> t.Optional[str]:
         """
@@ -164,23 +589,4 @@ class RedisS3Storage(TaskStorage):
         :return: Results payload if available, else returns None
         Raises StorageException if fetching fails
         """
-        # We should be able to safely remove the following block
-        # once all tasks launched with v0.3.3 and prior have TTL'ed out
-        if task.payload:
-            return task.payload
-
-        if task.payload_reference:
-            if task.payload_reference["storage_id"] == "s3":
-                return self._get_from_s3(task, StorageFieldName.payload)
-
-            # The following is redundant now while the block above
-            # for backward compat exists
-            # remove the pragma once this is an active codepath
-            elif task.payload_reference["storage_id"] == "redis":  # pragma: no cover
-                return self.redis_storage.get_payload(task)
-            else:
-                raise StorageException(
-                    f"Unknown Storage requested: {task.payload_reference}"
-                )
-        else:
-            return None
+        return self._get(task, StorageFieldName.payload)
@@ -0,0 +1,124 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from globus_compute_common.redis import (
+    ComputeEndpointTaskQueue,
+    ComputeRedisBatchingClient,
+    default_redis_connection_factory,
+)
+from globus_compute_common.redis_task import RedisTask
+from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
+
+try:
+    import redis
+
+    has_redis = True
+except ImportError:
+    has_redis = False
+
+pytestmark = pytest.mark.skipif(
+    not (has_redis and LOCAL_REDIS_REACHABLE),
+    reason="test requires local redis reachable",
+)
+
+
+def _run_concurrently(num_threads, target):
+    barrier = threading.Barrier(num_threads)
+    results = [None] * num_threads
+
+    def _worker(i):
+        barrier.wait()
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=_worker, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_batching_client_coalesces_concurrent_commands():
+    client = ComputeRedisBatchingClient(
+        default_redis_connection_factory(), window=0.1, max_batch_size=1000
+    )
+    prefix = f"test_batching_{uuid.uuid1()}"
+
+    def _set_and_get(i):
+        client.set(f"{prefix}_{i}", i)
+        return client.get(f"{prefix}_{i}")
+
+    results = _run_concurrently(20, _set_and_get)
+    assert results == [str(i) for i in range(20)]
+    assert client.commands_sent == 40
+    assert client.batches_sent < 40
+    client.delete(*(f"{prefix}_{i}" for i in range(20)))
+
+
+def test_batching_client_respects_max_batch_size(monkeypatch):
+    client = ComputeRedisBatchingClient(
+        default_redis_connection_factory(), window=10, max_batch_size=5
+    )
+    batch_sizes = []
+    send = client._send
+
+    def _record_send(batch):
+        batch_sizes.append(len(batch.commands))
+        send(batch)
+
+    monkeypatch.setattr(client, "_send", _record_send)
+    start = time.monotonic()
+    assert _run_concurrently(10, lambda i: client.echo(i)) == [
+        str(i) for i in range(10)
+    ]
+    # batches are sent once full, or once every caller has joined, rather than
+    # waiting out the long window
+    assert time.monotonic() - start < 5
+    assert sum(batch_sizes) == 10
+    assert max(batch_sizes) == 5
+
+
+def test_batching_client_does_not_wait_for_a_single_caller():
+    client = ComputeRedisBatchingClient(default_redis_connection_factory(), window=10)
+    key = f"test_batching_{uuid.uuid1()}"
+
+    start = time.monotonic()
+    for i in range(5):
+        client.set(key, i)
+    assert client.get(key) == "4"
+    assert time.monotonic() - start < 5
+    assert client.batches_sent == client.commands_sent == 6
+    client.delete(key)
+
+
+def test_batching_client_errors_only_affect_their_caller():
+    client = ComputeRedisBatchingClient(default_redis_connection_factory(), window=0.1)
+    key = f"test_batching_{uuid.uuid1()}"
+    client.set(key, "not a hash")
+
+    def _command(i):
+        try:
+            return client.hget(key, "foo") if i == 0 else client.get(key)
+        except redis.exceptions.ResponseError:
+            return "error"
+
+    assert _run_concurrently(3, _command) == ["error", "not a hash", "not a hash"]
+    client.delete(key)
+
+
+def test_batching_client_stands_in_for_redis_client():
+    client = ComputeRedisBatchingClient(default_redis_connection_factory())
+
+    task = RedisTask.create(client, str(uuid.uuid1()), user_id=10)
+    task.transition(task.status, {"state": "batched"})
+    assert RedisTask.load(client, task.task_id).user_id == 10
+    assert task.status_log == [{"state": "batched"}]
+
+    # blocking commands are not batched
+    task_queue = ComputeEndpointTaskQueue(str(uuid.uuid1()), redis_client=client)
+    task_queue.enqueue(task)
+    assert task_queue.dequeue() == task.task_id
+    task.delete()
@@ -0,0 +1,74 @@
+import uuid
+
+import pytest
+
+from globus_compute_common.redis import (
+    ComputeRedisScriptRegistry,
+    ComputeRedisSlotPipeline,
+    default_redis_connection_factory,
+    is_cluster_client,
+    key_slot,
+)
+from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
+
+
+@pytest.mark.parametrize(
+    "key, slot",
+    [
+        ("foo", 12182),
+        ("bar", 5061),
+        (b"123456789", 12739),
+        ("{bar}foo", 5061),
+        ("foo{bar}{baz}", 5061),
+        # an empty hash tag is ignored, and the whole key is hashed
+        ("foo{}{bar}", key_slot("foo{}{bar}".encode())),
+    ],
+)
+def test_key_slot(key, slot):
+    assert key_slot(key) == slot
+
+
+def test_key_slot_hash_tags_colocate_keys():
+    assert key_slot("task_{abc}") == key_slot("task_{abc}:state_log")
+    assert key_slot("foo{}{bar}") != key_slot("bar")
+
+
+def test_slot_pipeline_rejects_cross_slot_scripts(monkeypatch):
+    monkeypatch.setattr(
+        "globus_compute_common.redis.cluster.is_cluster_client", lambda _: True
+    )
+    script = ComputeRedisScriptRegistry().register("echo", "return ARGV[1]")
+    pipe = ComputeRedisSlotPipeline(None)
+    pipe.add_script(script, keys=["{a}1", "{a}2"], args=["x"])
+    with pytest.raises(ValueError):
+        pipe.add_script(script, keys=["{a}1", "{b}2"])
+    with pytest.raises(ValueError):
+        pipe.add_script(script, keys=[])
+    assert len(pipe) == 1
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+@pytest.mark.parametrize("transaction", [False, True])
+def test_slot_pipeline_preserves_order(transaction):
+    client = default_redis_connection_factory()
+    assert not is_cluster_client(client)
+    script = ComputeRedisScriptRegistry().register(
+        "incr", 'return redis.call("INCRBY", KEYS[1], ARGV[1])'
+    )
+    script.ensure_loaded(client)
+
+    keys = [f"test_slot_pipeline_{uuid.uuid1()}" for _ in range(5)]
+    pipe = ComputeRedisSlotPipeline(client, transaction=transaction)
+    for i, key in enumerate(keys):
+        pipe.add("set", key, i)
+    for key in keys:
+        pipe.add_script(script, keys=[key], args=[10])
+    pipe.add("get", keys[0])
+    assert len(pipe) == 11
+
+    assert pipe.execute() == [True] * 5 + [10, 11, 12, 13, 14, "10"]
+    assert len(pipe) == 0
+    assert pipe.execute() == []
+    client.delete(*keys)
@@ -1,10 +1,15 @@
+import asyncio
+
 import pytest
 
 from globus_compute_common.redis import (
     INT_SERDE,
+    AsyncRedisField,
     ComputeRedisEnumSerde,
+    ComputeRedisReplicaPool,
     HasRedisFields,
     RedisField,
+    read_from_primary,
 )
 from globus_compute_common.tasks import TaskState
 from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
@@ -137,3 +142,91 @@ def test_cannot_use_redis_field_outside_of_class_structure():
 
     with pytest.raises(TypeError):
         x.foo
+
+
+class MockAsyncRedis(MockRedis):
+    async def hset(self, hname, key, value):
+        super().hset(hname, key, value)
+
+    async def hget(self, hname, key):
+        return super().hget(hname, key)
+
+
+def test_async_redis_field_roundtrip():
+    mredis = MockAsyncRedis()
+
+    class C1(HasRedisFields):
+        def __init__(self):
+            self.redis_client = mredis
+            self.hname = "c1"
+
+        foo = AsyncRedisField()
+        state = AsyncRedisField(serde=ComputeRedisEnumSerde(TaskState))
+
+    c1inst = C1()
+
+    async def _roundtrip():
+        assert await c1inst.foo.get() is None
+        await c1inst.foo.set("ohai")
+        await c1inst.state.set(TaskState.RUNNING)
+        return await c1inst.foo.get(), await c1inst.state.get()
+
+    assert asyncio.run(_roundtrip()) == ("ohai", TaskState.RUNNING)
+    assert mredis.data["c1"] == {"foo": "ohai", "state": "running"}
+
+
+def test_async_redis_field_cannot_be_assigned():
+    class C1(HasRedisFields):
+        foo = AsyncRedisField()
+
+    assert vars(C1)["foo"].key == "foo"
+    with pytest.raises(AttributeError):
+        C1().foo = "ohai"
+
+
+def test_redis_field_reads_from_replica():
+    primary, replica = MockRedis(), MockRedis()
+
+    class C1(HasRedisFields):
+        def __init__(self):
+            self.redis_client = primary
+            self.redis_replica_client = replica
+            self.hname = "c1"
+
+        foo = RedisField()
+
+    c1inst = C1()
+    c1inst.foo = "ohai"
+    assert primary.data["c1"] == {"foo": "ohai"}
+    # the write has not yet been replicated
+    assert c1inst.foo is None
+    with read_from_primary(c1inst):
+        assert c1inst.foo == "ohai"
+    assert c1inst.foo is None
+
+    replica.hset("c1", "foo", "ohai")
+    assert c1inst.foo == "ohai"
+
+    c1inst.redis_read_primary = True
+    primary.hset("c1", "foo", "bye")
+    assert c1inst.foo == "bye"
+
+
+def test_replica_pool_rotates_clients():
+    replicas = [MockRedis() for _ in range(3)]
+    for i, replica in enumerate(replicas):
+        replica.hset("c1", "foo", str(i))
+
+    class C1(HasRedisFields):
+        def __init__(self):
+            self.redis_client = MockRedis()
+            self.redis_replica_client = ComputeRedisReplicaPool(replicas)
+            self.hname = "c1"
+
+        foo = RedisField()
+
+    c1inst = C1()
+    assert [c1inst.foo for _ in range(4)] == ["0", "1", "2", "0"]
+
+    with pytest.raises(ValueError):
+        ComputeRedisReplicaPool([])
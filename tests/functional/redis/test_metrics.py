@@ -0,0 +1,153 @@
+import time
+import uuid
+
+import pytest
+import redis
+
+from globus_compute_common.redis import (
+    ComputeEndpointTaskQueue,
+    ComputeRedisPubSub,
+    ComputeRedisQueueCounters,
+    ComputeRedisQueueMetricsCollector,
+)
+from globus_compute_common.redis.metrics import PUBSUB_QUEUE, TASK_QUEUE
+from globus_compute_common.redis_task import RedisTask
+from globus_compute_common.tasks import TaskProtocol, TaskState
+from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
+
+pytestmark = pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+
+
+class SimpleInMemoryTask(TaskProtocol):
+    def __init__(self):
+        self.task_id = str(uuid.uuid1())
+        self.endpoint = None
+        self.status = TaskState.RECEIVED
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    counters = ComputeRedisQueueCounters()
+    monkeypatch.setattr(ComputeEndpointTaskQueue, "counters", counters)
+    monkeypatch.setattr(ComputeRedisPubSub, "counters", counters)
+    return counters
+
+
+def test_collector_samples_queue_depths_and_head_ages(counters):
+    endpoint_ids = [str(uuid.uuid1()) for _ in range(3)]
+    task_queue = ComputeEndpointTaskQueue(endpoint_ids[0])
+    tasks = [SimpleInMemoryTask() for _ in range(3)]
+    task_queue.enqueue_many(tasks)
+    ComputeRedisPubSub().put(endpoint_ids[1], SimpleInMemoryTask())
+
+    collector = ComputeRedisQueueMetricsCollector(
+        endpoint_ids=endpoint_ids, batch_size=2, counters=counters
+    )
+    metrics = collector.collect()
+    samples = {(s.endpoint_id, s.kind): s for s in metrics.queues}
+    assert len(samples) == 6
+    assert samples[endpoint_ids[0], TASK_QUEUE].depth == 3
+    assert samples[endpoint_ids[0], TASK_QUEUE].head_task_id == tasks[0].task_id
+    assert samples[endpoint_ids[1], PUBSUB_QUEUE].depth == 1
+    assert samples[endpoint_ids[2], PUBSUB_QUEUE].head_task_id is None
+    assert metrics.total_depth == 4
+    assert metrics.max_head_age == 0
+    assert metrics.depth_histogram.count == 6
+    assert metrics.head_age_histogram.count == 2
+
+    time.sleep(0.05)
+    assert task_queue.dequeue() == tasks[0].task_id
+    metrics = collector.collect()
+    samples = {(s.endpoint_id, s.kind): s for s in metrics.queues}
+    # the head of the first queue changed, but that of the second did not
+    assert samples[endpoint_ids[0], TASK_QUEUE].head_age == 0
+    assert samples[endpoint_ids[1], PUBSUB_QUEUE].head_age >= 0.05
+    assert set(metrics.dequeue_rates) == {endpoint_ids[0]}
+    assert metrics.dequeue_rates[endpoint_ids[0]] > 0
+    assert metrics.enqueue_rates == {}
+
+    task_queue.redis_client.delete(
+        task_queue.queue_name, f"task_queue_{endpoint_ids[1]}"
+    )
+
+
+def test_collector_head_age_is_task_age(counters):
+    endpoint_id = str(uuid.uuid1())
+    task_client = redis.Redis("localhost", port=6379, db=1, decode_responses=True)
+    task = RedisTask.create(task_client, str(uuid.uuid1()))
+    # as if the task had been created 30s ago
+    task_client.expire(task.hname, RedisTask.DEFAULT_TTL - 30)
+    pubsub = ComputeRedisPubSub(sharded=True)
+    pubsub.put(endpoint_id, task)
+
+    empty_endpoint_id = str(uuid.uuid1())
+    collector = ComputeRedisQueueMetricsCollector(
+        task_redis_client=task_client,
+        endpoint_ids=[endpoint_id, empty_endpoint_id],
+        counters=counters,
+    )
+    samples = {s.queue_name: s for s in collector.collect().queues}
+    sharded_queue = f"task_queue_{{{endpoint_id}}}"
+    # sharded queues are only reported when they are not empty
+    assert set(samples) == {
+        f"task_queue_{endpoint_id}",
+        sharded_queue,
+        f"task_{endpoint_id}_list",
+        f"task_queue_{empty_endpoint_id}",
+        f"task_{empty_endpoint_id}_list",
+    }
+    assert samples[sharded_queue].head_task_id == task.task_id
+    assert 29 <= samples[sharded_queue].head_age <= 31
+
+    pubsub.redis_client.delete(sharded_queue)
+    task.delete()
+
+
+def test_collector_finds_queues(counters):
+    endpoint_id = str(uuid.uuid1())
+    task_queue = ComputeEndpointTaskQueue(endpoint_id)
+    task_queue.enqueue(SimpleInMemoryTask())
+    ComputeRedisPubSub(sharded=True).put(endpoint_id, SimpleInMemoryTask())
+    # a list which is not a queue
+    other_list = f"task_{endpoint_id}_other"
+    task_queue.redis_client.rpush(other_list, "x")
+
+    collector = ComputeRedisQueueMetricsCollector(counters=counters)
+    scans = []
+    scan_iter = collector.redis_client.scan_iter
+
+    def counting_scan_iter(*args, **kwargs):
+        scans.append(kwargs["match"])
+        return scan_iter(*args, **kwargs)
+
+    collector.redis_client.scan_iter = counting_scan_iter
+    metrics = collector.collect()
+    # the keyspace is scanned once for both kinds of queue
+    assert scans == ["task_*"]
+    samples = {(s.queue_name, s.kind): s for s in metrics.queues}
+    assert samples[task_queue.queue_name, TASK_QUEUE].endpoint_id == endpoint_id
+    sharded_queue = f"task_queue_{{{endpoint_id}}}"
+    assert samples[sharded_queue, PUBSUB_QUEUE].endpoint_id == endpoint_id
+    assert other_list not in {s.queue_name for s in metrics.queues}
+    task_queue.redis_client.delete(task_queue.queue_name, sharded_queue, other_list)
+
+
+def test_queues_record_counts(counters):
+    endpoint_id = str(uuid.uuid1())
+    task_queue = ComputeEndpointTaskQueue(endpoint_id)
+    task_queue.enqueue_many([SimpleInMemoryTask() for _ in range(3)])
+    task_queue.enqueue(SimpleInMemoryTask())
+    assert len(task_queue.dequeue_many(2)) == 2
+    task_queue.dequeue()
+
+    pubsub = ComputeRedisPubSub()
+    pubsub.put_many(endpoint_id, [SimpleInMemoryTask() for _ in range(2)])
+    pubsub.subscribe(endpoint_id)
+    pubsub.get_many(2, timeout=1000)
+
+    enqueued, dequeued = counters.snapshot()
+    assert enqueued == {endpoint_id: 6}
+    assert dequeued[endpoint_id] >= 4
+    task_queue.redis_client.delete(task_queue.queue_name)
@@ -1,9 +1,11 @@
 import queue
+import threading
+import time
 import uuid
 
 import pytest
 
-from globus_compute_common.redis import ComputeRedisPubSub
+from globus_compute_common.redis import ComputeRedisPubSub, ComputeRedisQueueCounters
 from globus_compute_common.tasks import TaskProtocol, TaskState
 from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
 
@@ -29,7 +31,7 @@ def test_put_and_get_single_task():
     recipients = producer.put(epid, t)
     assert recipients == 1
 
-    res = consumer.get()
+    res = consumer.get(timeout=1000)
     assert res == (epid, t.task_id)
 
 
@@ -48,7 +50,8 @@ def test_put_and_get_single_task_deferred():
     assert recipients == 0
 
     consumer.subscribe(epid)
-    res = consumer.get()
+    # the task is republished on subscription, and delivered asynchronously
+    res = consumer.get(timeout=1000)
     assert res == (epid, t.task_id)
 
 
@@ -101,7 +104,7 @@ def test_unsubscribe_and_resubscribe():
     recipients = producer.put(epid, t1)
     assert recipients == 1
 
-    res = consumer.get()
+    res = consumer.get(timeout=1000)
     assert res == (epid, t1.task_id)
 
     consumer.unsubscribe(epid)
@@ -121,7 +124,8 @@ def test_unsubscribe_and_resubscribe():
         consumer.get()
 
     consumer.subscribe(epid)
-    res = consumer.get()
+    # the task is republished on subscription, and delivered asynchronously
+    res = consumer.get(timeout=1000)
     assert res == (epid, t2.task_id)
 
 
@@ -137,3 +141,394 @@ def test_final_messages_without_unsub():
 
     with pytest.raises(ValueError):
         consumer.get_final_messages()
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_republish_from_queue_in_batches():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    epid = str(uuid.uuid1())
+    tasks = [SimpleInMemoryTask() for _ in range(10)]
+    for t in tasks:
+        assert producer.put(epid, t) == 0
+
+    consumer.pubsub.subscribe(f"task_channel_{epid}")
+    # wait for the subscription to take effect before republishing
+    assert consumer.pubsub.get_message(timeout=5)["type"] == "subscribe"
+    assert consumer.republish_from_queue(epid, batch_size=3, limit=4) == 4
+    assert consumer.republish_from_queue(epid, batch_size=4) == 6
+    # an empty queue returns immediately
+    assert consumer.republish_from_queue(epid) == 0
+
+    received = [consumer.get(timeout=1000) for _ in tasks]
+    assert received == [(epid, t.task_id) for t in tasks]
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_subscribe_keeps_messages_received_while_confirming():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    epid1, epid2 = str(uuid.uuid1()), str(uuid.uuid1())
+    t1, t2 = SimpleInMemoryTask(), SimpleInMemoryTask()
+
+    consumer.subscribe(epid1)
+    assert producer.put(epid1, t1) == 1
+    producer.put(epid2, t2)
+    # the message on the first channel arrives before the second subscription is
+    # confirmed, and is kept for `get()`
+    consumer.subscribe(epid2)
+    assert consumer.get(timeout=1000) == (epid1, t1.task_id)
+    assert consumer.get(timeout=1000) == (epid2, t2.task_id)
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_put_writes_redis_task_status_atomically(monkeypatch):
+    from globus_compute_common.redis_task import RedisTask
+
+    producer = ComputeRedisPubSub()
+    epid = str(uuid.uuid1())
+    task = RedisTask(producer.redis_client, str(uuid.uuid1()))
+    task.status = TaskState.RECEIVED
+
+    # the status is migrated to the compact layout along the way
+    monkeypatch.setattr(RedisTask, "COMPACT_STORAGE", True)
+    assert producer.put(epid, task) == 0
+    raw = producer.redis_client.hgetall(task.hname)
+    assert "status" not in raw
+    assert task.status == TaskState.WAITING_FOR_EP
+    assert task.endpoint == epid
+    assert producer.redis_client.lrange(f"task_queue_{epid}", 0, -1) == [task.task_id]
+    task.delete()
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_put_writes_status_of_task_on_another_redis():
+    import redis
+
+    from globus_compute_common.redis_task import RedisTask
+
+    # tasks are stored apart from the channels and queues, here in another database
+    task_client = redis.Redis("localhost", port=6379, db=0, decode_responses=True)
+    queue_client = redis.Redis("localhost", port=6379, db=1, decode_responses=True)
+    producer = ComputeRedisPubSub(redis_client=queue_client)
+    epid = str(uuid.uuid1())
+    tasks = [RedisTask(task_client, str(uuid.uuid1())) for _ in range(3)]
+    for task in tasks:
+        task.status = TaskState.RECEIVED
+
+    assert producer.put(epid, tasks[0]) == 0
+    assert producer.put_many(epid, tasks[1:]) == [0, 0]
+    for task in tasks:
+        assert RedisTask.load(task_client, task.task_id).status == (
+            TaskState.WAITING_FOR_EP
+        )
+        assert not queue_client.exists(task.hname)
+        task.delete()
+    queue_client.delete(f"task_queue_{epid}")
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_put_many():
+    from globus_compute_common.redis_task import RedisTask
+
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    epid = str(uuid.uuid1())
+    redis_task = RedisTask(producer.redis_client, str(uuid.uuid1()))
+    tasks = [SimpleInMemoryTask(), redis_task, SimpleInMemoryTask()]
+
+    assert producer.put_many(epid, tasks[:2]) == [0, 0]
+    assert redis_task.status == TaskState.WAITING_FOR_EP
+    assert tasks[0].status == TaskState.WAITING_FOR_EP
+
+    consumer.subscribe(epid)
+    assert producer.put_many(epid, tasks[2:]) == [1]
+    assert producer.put_many(epid, []) == []
+    received = [consumer.get(timeout=1000) for _ in tasks]
+    assert received == [(epid, t.task_id) for t in tasks]
+    redis_task.delete()
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_listener_delivers_to_local_queue():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    epid = str(uuid.uuid1())
+    tasks = [SimpleInMemoryTask() for _ in range(5)]
+    assert producer.put(epid, tasks[0]) == 0
+
+    consumer.start_listener(batch_size=2)
+    with pytest.raises(RuntimeError):
+        consumer.start_listener()
+    assert consumer.listening
+    consumer.subscribe(epid)
+    assert producer.put_many(epid, tasks[1:]) == [1] * 4
+
+    received = consumer.get_many(10, timeout=1000)
+    while len(received) < len(tasks):
+        received.extend(consumer.get_many(10, timeout=1000))
+    assert received == [(epid, t.task_id) for t in tasks]
+    with pytest.raises(queue.Empty):
+        consumer.get(timeout=10)
+
+    consumer.unsubscribe(epid)
+    assert list(consumer.get_final_messages(timeout=10)) == []
+    consumer.stop_listener()
+    assert not consumer.listening
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_listener_dispatches_batches_to_callback():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    epid = str(uuid.uuid1())
+    tasks = [SimpleInMemoryTask() for _ in range(5)]
+    received = []
+    all_received = threading.Event()
+
+    def callback(batch):
+        assert 1 <= len(batch) <= 3
+        received.extend(batch)
+        if len(received) == len(tasks):
+            all_received.set()
+
+    consumer.start_listener(callback, batch_size=3)
+    consumer.subscribe(epid)
+    producer.put_many(epid, tasks)
+    assert all_received.wait(5)
+    consumer.stop_listener()
+    assert received == [(epid, t.task_id) for t in tasks]
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_listener_requeues_when_local_queue_is_full():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    epid = str(uuid.uuid1())
+    tasks = [SimpleInMemoryTask() for _ in range(3)]
+
+    consumer.start_listener(max_queued=1, put_timeout=0)
+    consumer.subscribe(epid)
+    producer.put_many(epid, tasks)
+    deadline = time.monotonic() + 5
+    while consumer.requeued_count < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert consumer.requeued_count == 2
+    assert consumer.get(timeout=5000) == (epid, tasks[0].task_id)
+    consumer.stop_listener()
+
+    queued = producer.redis_client.lrange(f"task_queue_{epid}", 0, -1)
+    assert queued == [t.task_id for t in tasks[1:]]
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_listener_records_each_task_dequeued_once():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    consumer.counters = ComputeRedisQueueCounters()
+    epid = str(uuid.uuid1())
+    tasks = [SimpleInMemoryTask() for _ in range(2)]
+
+    consumer.start_listener()
+    consumer.subscribe(epid)
+    producer.put_many(epid, tasks)
+    _wait_for(lambda: consumer._listener_queue.qsize() == 2)
+    assert consumer.counters.snapshot()[1] == {}
+
+    # undelivered tasks are kept for `get()` when the listener is stopped, and
+    # recorded as they are returned
+    consumer.stop_listener()
+    assert consumer.get(timeout=1000) == (epid, tasks[0].task_id)
+    assert consumer.get(timeout=1000) == (epid, tasks[1].task_id)
+    assert consumer.counters.snapshot()[1] == {epid: 2}
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_unsubscribe_requeues_buffered_tasks():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    epid1, epid2 = str(uuid.uuid1()), str(uuid.uuid1())
+    t1, t2 = SimpleInMemoryTask(), SimpleInMemoryTask()
+
+    consumer.subscribe(epid1)
+    assert producer.put(epid1, t1) == 1
+    assert producer.put(epid2, t2) == 0
+    # the task for the first endpoint is buffered while the second subscription
+    # is confirmed, and requeued when the first is unsubscribed from
+    consumer.subscribe(epid2)
+    consumer.unsubscribe(epid1)
+    assert consumer.requeued_count == 1
+    assert producer.redis_client.lpop(f"task_queue_{epid1}") == t1.task_id
+    assert consumer.get(timeout=1000) == (epid2, t2.task_id)
+
+    consumer.unsubscribe(epid2)
+    assert list(consumer.get_final_messages(timeout=10)) == []
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_stopping_listener_after_unsubscribe_requeues_tasks():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    epid = str(uuid.uuid1())
+    tasks = [SimpleInMemoryTask() for _ in range(2)]
+
+    consumer.start_listener()
+    consumer.subscribe(epid)
+    producer.put_many(epid, tasks)
+    _wait_for(lambda: consumer._listener_queue.qsize() == 2)
+    consumer.unsubscribe(epid)
+    _wait_for(lambda: not consumer.subscribed)
+
+    consumer.stop_listener()
+    assert consumer.requeued_count == 2
+    queued = producer.redis_client.lrange(f"task_queue_{epid}", 0, -1)
+    assert queued == [t.task_id for t in tasks]
+    producer.redis_client.delete(f"task_queue_{epid}")
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_subscribe_many_republishes_all_queues():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    epids = [str(uuid.uuid1()) for _ in range(5)]
+    tasks = {epid: [SimpleInMemoryTask() for _ in range(3)] for epid in epids}
+    for epid in epids[:4]:
+        assert producer.put_many(epid, tasks[epid]) == [0, 0, 0]
+
+    consumer.subscribe_many(epids, chunk_size=2)
+    assert consumer.redis_client.exists(*(f"task_queue_{e}" for e in epids)) == 0
+    assert producer.put_many(epids[4], tasks[epids[4]]) == [1, 1, 1]
+
+    received = [consumer.get(timeout=1000) for _ in range(15)]
+    assert sorted(received) == sorted(
+        (epid, task.task_id) for epid in epids for task in tasks[epid]
+    )
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_republish_from_queues_in_batches():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    epids = [str(uuid.uuid1()) for _ in range(2)]
+    tasks = {
+        epid: [SimpleInMemoryTask() for _ in range(n)] for epid, n in zip(epids, (5, 1))
+    }
+    for epid in epids:
+        producer.put_many(epid, tasks[epid])
+
+    assert consumer.republish_from_queues(epids, batch_size=2) == 6
+    assert consumer.republish_from_queues(epids) == 0
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_subscribe_pattern_filters_endpoints():
+    producer = ComputeRedisPubSub()
+    consumer = ComputeRedisPubSub()
+    wanted, unwanted = str(uuid.uuid1()), str(uuid.uuid1())
+    queued, wanted_task, unwanted_task = (SimpleInMemoryTask() for _ in range(3))
+    assert producer.put(wanted, queued) == 0
+
+    consumer.subscribe_pattern([wanted])
+    # a task for an endpoint which no subscriber matches is queued
+    assert producer.put(unwanted, unwanted_task) == 0
+    assert producer.put(wanted, wanted_task) == 1
+
+    assert consumer.get(timeout=1000) == (wanted, queued.task_id)
+    assert consumer.get(timeout=1000) == (wanted, wanted_task.task_id)
+    with pytest.raises(queue.Empty):
+        consumer.get(timeout=10)
+    assert producer.redis_client.lrange(f"task_queue_{unwanted}", 0, -1) == [
+        unwanted_task.task_id
+    ]
+    producer.redis_client.delete(f"task_queue_{unwanted}")
+
+    with pytest.raises(ValueError):
+        consumer.get_final_messages()
+    consumer.unsubscribe_pattern()
+    assert list(consumer.get_final_messages(timeout=10)) == []
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_pattern_subscribers_do_not_requeue_each_others_tasks():
+    producer = ComputeRedisPubSub()
+    consumers = [ComputeRedisPubSub() for _ in range(2)]
+    epids = [str(uuid.uuid1()) for _ in range(2)]
+    tasks = {epid: [SimpleInMemoryTask() for _ in range(3)] for epid in epids}
+
+    for consumer, epid in zip(consumers, epids):
+        consumer.subscribe_pattern([epid])
+    for epid in epids:
+        assert producer.put_many(epid, tasks[epid]) == [1, 1, 1]
+
+    for consumer, epid in zip(consumers, epids):
+        received = [consumer.get(timeout=1000) for _ in range(3)]
+        assert received == [(epid, task.task_id) for task in tasks[epid]]
+        with pytest.raises(queue.Empty):
+            consumer.get(timeout=10)
+    assert producer.redis_client.exists(*(f"task_queue_{e}" for e in epids)) == 0
+
+    for consumer in consumers:
+        consumer.unsubscribe_pattern()
+        assert list(consumer.get_final_messages(timeout=10)) == []
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_sharded_put_and_get():
+    producer = ComputeRedisPubSub(sharded=True)
+    consumer = ComputeRedisPubSub(sharded=True)
+    epid = str(uuid.uuid1())
+    tasks = [SimpleInMemoryTask() for _ in range(3)]
+
+    assert producer.put(epid, tasks[0]) == 0
+    assert producer.redis_client.lrange(f"task_queue_{{{epid}}}", 0, -1) == [
+        tasks[0].task_id
+    ]
+    consumer.subscribe(epid)
+    assert producer.put_many(epid, tasks[1:]) == [1, 1]
+
+    received = [consumer.get(timeout=1000) for _ in tasks]
+    assert received == [(epid, t.task_id) for t in tasks]
+
+    with pytest.raises(ValueError):
+        consumer.subscribe_pattern()
+    consumer.unsubscribe(epid)
+    assert list(consumer.get_final_messages(timeout=10)) == []
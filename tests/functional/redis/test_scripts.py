@@ -0,0 +1,63 @@
+import uuid
+
+import pytest
+
+from globus_compute_common.redis import (
+    ComputeRedisScriptRegistry,
+    default_redis_connection_factory,
+)
+from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
+
+_INCR_SCRIPT = 'return redis.call("INCRBY", KEYS[1], ARGV[1])'
+
+
+def _unique_script(source):
+    # a unique comment ensures the server has not already cached the script
+    return f"-- {uuid.uuid1()}\n{source}"
+
+
+def test_registry_rejects_duplicate_names():
+    registry = ComputeRedisScriptRegistry()
+    script = registry.register("incr", _INCR_SCRIPT)
+    assert "incr" in registry
+    assert registry["incr"] is script
+    with pytest.raises(ValueError):
+        registry.register("incr", "return 1")
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_script_loads_on_noscript():
+    client = default_redis_connection_factory()
+    registry = ComputeRedisScriptRegistry()
+    script = registry.register("incr", _unique_script(_INCR_SCRIPT))
+    key = f"test_script_{uuid.uuid1()}"
+
+    assert client.script_exists(script.sha) == [False]
+    assert script(client, keys=[key], args=[2]) == 2
+    assert client.script_exists(script.sha) == [True]
+    assert script(client, keys=[key], args=[3]) == 5
+    client.delete(key)
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_script_registry_load_all_and_pipeline():
+    client = default_redis_connection_factory()
+    registry = ComputeRedisScriptRegistry()
+    incr = registry.register("incr", _unique_script(_INCR_SCRIPT))
+    echo = registry.register("echo", _unique_script("return ARGV[1]"))
+    key = f"test_script_{uuid.uuid1()}"
+
+    registry.load_all(client)
+    assert client.script_exists(incr.sha, echo.sha) == [True, True]
+
+    incr = ComputeRedisScriptRegistry().register("incr", _unique_script(_INCR_SCRIPT))
+    incr.ensure_loaded(client)
+    with client.pipeline(transaction=False) as pipe:
+        incr.queue(pipe, keys=[key], args=[1])
+        incr.queue(pipe, keys=[key], args=[1])
+        assert pipe.execute() == [1, 2]
+    client.delete(key)
@@ -0,0 +1,152 @@
+import time
+import uuid
+
+import pytest
+
+from globus_compute_common.redis import (
+    ComputeRedisShardRouter,
+    ComputeShardedRedisPubSub,
+)
+from globus_compute_common.tasks import TaskProtocol, TaskState
+from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
+
+pytestmark = pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+
+
+class SimpleInMemoryTask(TaskProtocol):
+    def __init__(self):
+        self.task_id = str(uuid.uuid1())
+        self.endpoint = None
+        self.status = TaskState.RECEIVED
+
+
+@pytest.fixture
+def router():
+    # separate databases stand in for separate servers
+    return ComputeRedisShardRouter.from_urls(
+        {"a": "redis://localhost:6379/1", "b": "redis://localhost:6379/2"}
+    )
+
+
+def _endpoints_on_each_shard(router):
+    endpoints = {}
+    while len(endpoints) < len(router.shards):
+        endpoint_id = str(uuid.uuid1())
+        endpoints.setdefault(router.shard_for(endpoint_id), endpoint_id)
+    return endpoints
+
+
+def test_task_queue_uses_endpoint_shard(router):
+    endpoints = _endpoints_on_each_shard(router)
+    task = SimpleInMemoryTask()
+    task_queue = router.task_queue(endpoints["a"])
+    task_queue.enqueue(task)
+
+    assert router.shards["a"].llen(task_queue.queue_name) == 1
+    assert router.shards["b"].llen(task_queue.queue_name) == 0
+    assert task_queue.dequeue() == task.task_id
+
+
+def test_sharded_pubsub_put_and_get(router):
+    endpoints = _endpoints_on_each_shard(router)
+    producer = ComputeShardedRedisPubSub(router)
+    consumer = ComputeShardedRedisPubSub(router)
+    tasks = {shard: [SimpleInMemoryTask() for _ in range(2)] for shard in endpoints}
+
+    # queued on the endpoint's shard while there are no subscribers
+    assert producer.put(endpoints["a"], tasks["a"][0]) == 0
+    assert router.shards["a"].llen(f"task_queue_{endpoints['a']}") == 1
+    assert router.shards["b"].llen(f"task_queue_{endpoints['a']}") == 0
+
+    consumer.subscribe_many(endpoints.values())
+    assert producer.put(endpoints["a"], tasks["a"][1]) == 1
+    assert producer.put_many(endpoints["b"], tasks["b"]) == [1, 1]
+
+    received = []
+    while len(received) < 4:
+        batch = consumer.get_many(10, timeout=1000)
+        assert batch
+        received.extend(batch)
+    assert sorted(received) == sorted(
+        (endpoints[shard], task.task_id) for shard in endpoints for task in tasks[shard]
+    )
+    assert consumer.get_many(10, timeout=10) == []
+    consumer.stop()
+
+
+def test_sharded_pubsub_final_messages(router):
+    endpoints = _endpoints_on_each_shard(router)
+    producer = ComputeShardedRedisPubSub(router)
+    consumer = ComputeShardedRedisPubSub(router)
+    tasks = {shard: [SimpleInMemoryTask() for _ in range(2)] for shard in endpoints}
+
+    consumer.subscribe_many(endpoints.values())
+    for shard, endpoint_id in endpoints.items():
+        assert producer.put_many(endpoint_id, tasks[shard]) == [1, 1]
+    with pytest.raises(ValueError):
+        consumer.get_final_messages()
+
+    # messages still held by the shards' listeners are returned
+    for endpoint_id in endpoints.values():
+        consumer.unsubscribe(endpoint_id)
+    final = list(consumer.get_final_messages(timeout=10))
+    assert sorted(final) == sorted(
+        (endpoints[shard], task.task_id) for shard in endpoints for task in tasks[shard]
+    )
+    assert not consumer.subscribed
+    consumer.stop()
+
+
+def test_sharded_pubsub_stop_keeps_messages(router):
+    endpoint_id = _endpoints_on_each_shard(router)["a"]
+    queue_name = f"task_queue_{endpoint_id}"
+    producer = ComputeShardedRedisPubSub(router)
+    consumer = ComputeShardedRedisPubSub(router, max_queued=1)
+    tasks = [SimpleInMemoryTask() for _ in range(3)]
+
+    consumer.subscribe(endpoint_id)
+    assert producer.put_many(endpoint_id, tasks) == [1, 1, 1]
+    deadline = time.monotonic() + 5
+    while not consumer._queue.full() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # a listener waiting for space in the local queue does not block stopping;
+    # its messages are requeued, and those it had not read are read by `get()`
+    consumer.stop()
+    received = [task_id for _, task_id in consumer.get_many(10, timeout=500)]
+    requeued = router.shards["a"].lrange(queue_name, 0, -1)
+    assert sorted(received + requeued) == sorted(t.task_id for t in tasks)
+
+    consumer.unsubscribe(endpoint_id)
+    assert list(consumer.get_final_messages(timeout=10)) == []
+    router.shards["a"].delete(queue_name)
+
+
+def test_sharded_redis_task_status_is_written_to_task_store(router):
+    import redis
+
+    from globus_compute_common.redis_task import RedisTask
+
+    # the task store is apart from the shards
+    task_client = redis.Redis("localhost", port=6379, db=0, decode_responses=True)
+    endpoints = _endpoints_on_each_shard(router)
+    producer = ComputeShardedRedisPubSub(router)
+    tasks = [RedisTask(task_client, str(uuid.uuid1())) for _ in range(5)]
+    for task in tasks:
+        task.status = TaskState.RECEIVED
+
+    producer.put(endpoints["a"], tasks[0])
+    producer.put_many(endpoints["b"], tasks[1:3])
+    router.task_queue(endpoints["a"]).enqueue_many(tasks[3:])
+
+    for task in tasks:
+        loaded = RedisTask.load(task_client, task.task_id)
+        assert loaded.status is TaskState.WAITING_FOR_EP
+        for shard in router.shards.values():
+            assert not shard.exists(task.hname)
+        task.delete()
+    for endpoint_id in endpoints.values():
+        for shard in router.shards.values():
+            shard.delete(f"task_queue_{endpoint_id}", f"task_{endpoint_id}_list")
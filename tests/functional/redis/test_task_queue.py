@@ -1,9 +1,14 @@
 import queue
+import time
 import uuid
 
 import pytest
 
-from globus_compute_common.redis import ComputeEndpointTaskQueue
+from globus_compute_common.redis import (
+    ComputeEndpointReliableTaskQueue,
+    ComputeEndpointTaskQueue,
+    ComputeMultiEndpointTaskQueue,
+)
 from globus_compute_common.tasks import TaskProtocol, TaskState
 from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
 
@@ -43,3 +48,203 @@ def test_dequeue_empty_behavior():
 
     with pytest.raises(queue.Empty):
         task_queue.dequeue()
+
+
+class SimpleInMemoryTask(TaskProtocol):
+    def __init__(self):
+        self.task_id = str(uuid.uuid1())
+        self.endpoint = None
+        self.status = TaskState.RECEIVED
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_enqueue_many_and_dequeue_many():
+    from globus_compute_common.redis_task import RedisTask
+
+    endpoint = str(uuid.uuid1())
+    task_queue = ComputeEndpointTaskQueue(endpoint)
+    redis_task = RedisTask(task_queue.redis_client, str(uuid.uuid1()))
+    redis_task.status = TaskState.RECEIVED
+    tasks = [SimpleInMemoryTask(), redis_task, SimpleInMemoryTask()]
+
+    task_queue.enqueue_many(tasks)
+    task_queue.enqueue_many([])
+
+    assert all(task.status is TaskState.WAITING_FOR_EP for task in tasks)
+    assert tasks[0].endpoint == endpoint
+    redis_task.refresh()
+    assert redis_task.status is TaskState.WAITING_FOR_EP
+
+    assert task_queue.dequeue_many(2) == [t.task_id for t in tasks[:2]]
+    assert task_queue.dequeue_many(10) == [tasks[2].task_id]
+    assert task_queue.dequeue_many(10, timeout=0.01) == []
+    redis_task.delete()
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_enqueue_many_updates_tasks_on_another_redis():
+    import redis
+
+    from globus_compute_common.redis_task import RedisTask
+
+    # tasks are stored apart from the queue, here in another database
+    task_client = redis.Redis("localhost", port=6379, db=0, decode_responses=True)
+    queue_client = redis.Redis("localhost", port=6379, db=1, decode_responses=True)
+    endpoint = str(uuid.uuid1())
+    task_queue = ComputeEndpointTaskQueue(endpoint, redis_client=queue_client)
+    tasks = [RedisTask(task_client, str(uuid.uuid1())) for _ in range(2)]
+    for task in tasks:
+        task.status = TaskState.RECEIVED
+
+    task_queue.enqueue_many(tasks)
+    for task in tasks:
+        loaded = RedisTask.load(task_client, task.task_id)
+        assert loaded.status is TaskState.WAITING_FOR_EP
+        assert task.endpoint == endpoint
+        assert not queue_client.exists(task.hname)
+        task.delete()
+    assert task_queue.dequeue_many(10) == [task.task_id for task in tasks]
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_multi_endpoint_dequeue_rotates_between_endpoints():
+    endpoints = [str(uuid.uuid1()) for _ in range(3)]
+    queues = [ComputeEndpointTaskQueue(endpoint) for endpoint in endpoints]
+    tasks = [[SimpleInMemoryTask() for _ in range(3)] for _ in endpoints]
+    for task_queue, endpoint_tasks in zip(queues[:2], tasks):
+        task_queue.enqueue_many(endpoint_tasks)
+
+    multi_queue = ComputeMultiEndpointTaskQueue(endpoints)
+    assert multi_queue.dequeue() == (endpoints[0], tasks[0][0].task_id)
+    assert multi_queue.dequeue() == (endpoints[1], tasks[1][0].task_id)
+    # the third endpoint's queue is empty, so the first is served again
+    assert multi_queue.dequeue_many(10) == (
+        endpoints[0],
+        [t.task_id for t in tasks[0][1:]],
+    )
+
+    queues[2].enqueue(tasks[2][0])
+    assert multi_queue.dequeue_many(1) == (endpoints[1], [tasks[1][1].task_id])
+    assert multi_queue.dequeue_many(1) == (endpoints[2], [tasks[2][0].task_id])
+    assert multi_queue.dequeue_many(1) == (endpoints[1], [tasks[1][2].task_id])
+    assert multi_queue.dequeue_many(10, timeout=0.01) == (None, [])
+    with pytest.raises(queue.Empty):
+        multi_queue.dequeue(timeout=0.01)
+
+    multi_queue.remove_endpoint(endpoints[0])
+    multi_queue.add_endpoint(endpoints[1])
+    assert multi_queue.endpoints == endpoints[1:]
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_reliable_dequeue_ack_and_nack():
+    endpoint = str(uuid.uuid1())
+    task_queue = ComputeEndpointReliableTaskQueue(endpoint, consumer="c1")
+    tasks = [SimpleInMemoryTask() for _ in range(3)]
+    task_queue.enqueue_many(tasks)
+    client = task_queue.redis_client
+
+    assert task_queue.dequeue() == tasks[0].task_id
+    assert task_queue.dequeue_many(10) == [t.task_id for t in tasks[1:]]
+    assert client.lrange(task_queue.processing_list_name, 0, -1) == [
+        t.task_id for t in tasks
+    ]
+    assert client.zcard(task_queue.deadlines_name) == 3
+    with pytest.raises(queue.Empty):
+        task_queue.dequeue(timeout=0.01)
+
+    assert task_queue.ack(tasks[0].task_id, "not-a-task") == 1
+    assert task_queue.nack(tasks[1].task_id) == 1
+    assert client.lrange(task_queue.queue_name, 0, -1) == [tasks[1].task_id]
+    assert client.lrange(task_queue.processing_list_name, 0, -1) == [tasks[2].task_id]
+    assert client.zrange(task_queue.deadlines_name, 0, -1) == [f"c1/{tasks[2].task_id}"]
+    client.delete(task_queue.queue_name, task_queue.processing_list_name)
+    client.delete(task_queue.deadlines_name)
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_reliable_requeue_expired():
+    endpoint = str(uuid.uuid1())
+    crashed = ComputeEndpointReliableTaskQueue(
+        endpoint, consumer="crashed", visibility_timeout=0.5
+    )
+    survivor = ComputeEndpointReliableTaskQueue(endpoint, consumer="ok")
+    tasks = [SimpleInMemoryTask() for _ in range(5)]
+    crashed.enqueue_many(tasks)
+    assert crashed.dequeue_many(4) == [t.task_id for t in tasks[:4]]
+    assert crashed.ack(tasks[0].task_id) == 1
+
+    assert survivor.requeue_expired() == 0
+    time.sleep(0.6)
+    assert survivor.requeue_expired(batch_size=2) == 3
+    assert survivor.dequeue_many(10) == [tasks[4].task_id] + [
+        t.task_id for t in tasks[1:4]
+    ]
+    # tasks requeued after their deadlines can no longer be acked by the consumer
+    assert crashed.ack(tasks[1].task_id) == 0
+    assert survivor.ack(*(t.task_id for t in tasks[1:])) == 4
+    assert survivor.redis_client.zcard(survivor.deadlines_name) == 0
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_reliable_consumer_holds_a_task_once():
+    endpoint = str(uuid.uuid1())
+    task_queue = ComputeEndpointReliableTaskQueue(endpoint, consumer="c1")
+    other = ComputeEndpointReliableTaskQueue(endpoint, consumer="c2")
+    task, next_task = SimpleInMemoryTask(), SimpleInMemoryTask()
+    client = task_queue.redis_client
+
+    # the task is queued again while held, and then twice in one batch
+    task_queue.enqueue(task)
+    assert task_queue.dequeue() == task.task_id
+    task_queue.enqueue_many([task, task, next_task])
+    assert task_queue.dequeue_many(10) == [next_task.task_id]
+    assert client.llen(task_queue.queue_name) == 0
+
+    # one ack releases the task, leaving nothing without a deadline
+    assert task_queue.ack(task.task_id, next_task.task_id) == 2
+    assert client.llen(task_queue.processing_list_name) == 0
+    assert client.zcard(task_queue.deadlines_name) == 0
+
+    # other consumers may hold the same task ID
+    task_queue.enqueue_many([task, task])
+    assert task_queue.dequeue() == task.task_id
+    assert other.dequeue() == task.task_id
+    assert task_queue.ack(task.task_id) == 1
+    assert other.ack(task.task_id) == 1
+    assert client.zcard(task_queue.deadlines_name) == 0
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+def test_reliable_reaper_thread():
+    endpoint = str(uuid.uuid1())
+    task_queue = ComputeEndpointReliableTaskQueue(endpoint, visibility_timeout=0)
+    task = SimpleInMemoryTask()
+    task_queue.enqueue(task)
+    assert task_queue.dequeue() == task.task_id
+
+    task_queue.start_reaper(interval=0.01)
+    with pytest.raises(RuntimeError):
+        task_queue.start_reaper()
+    try:
+        assert task_queue.redis_client.blpop(task_queue.queue_name, timeout=5) == (
+            task_queue.queue_name,
+            task.task_id,
+        )
+    finally:
+        task_queue.stop_reaper()
+    task_queue.stop_reaper()
@@ -0,0 +1,74 @@
+import queue
+import time
+import uuid
+
+import pytest
+
+from globus_compute_common.redis import ComputeEndpointTaskStream
+from globus_compute_common.tasks import TaskProtocol, TaskState
+from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
+
+pytestmark = pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires local redis reachable"
+)
+
+
+class SimpleInMemoryTask(TaskProtocol):
+    def __init__(self):
+        self.task_id = str(uuid.uuid1())
+        self.endpoint = None
+        self.status = TaskState.RECEIVED
+
+
+@pytest.fixture
+def endpoint():
+    endpoint = str(uuid.uuid1())
+    yield endpoint
+    ComputeEndpointTaskStream(endpoint).redis_client.delete(f"task_stream_{endpoint}")
+
+
+def test_stream_enqueue_dequeue_and_ack(endpoint):
+    task_stream = ComputeEndpointTaskStream(endpoint)
+    tasks = [SimpleInMemoryTask() for _ in range(5)]
+    for task in tasks:
+        task_stream.enqueue(task)
+    assert tasks[0].endpoint == endpoint
+    assert tasks[0].status is TaskState.WAITING_FOR_EP
+
+    assert task_stream.dequeue() == tasks[0].task_id
+    assert task_stream.dequeue_many(10) == [t.task_id for t in tasks[1:]]
+    assert task_stream.dequeue_many(10, timeout=0) == []
+    with pytest.raises(queue.Empty):
+        task_stream.dequeue(timeout=0)
+
+    task_stream.ack(*(t.task_id for t in tasks))
+    assert task_stream.redis_client.xlen(task_stream.stream_name) == 0
+    with pytest.raises(ValueError):
+        task_stream.ack(tasks[0].task_id)
+
+
+def test_stream_consumers_share_tasks(endpoint):
+    producer = ComputeEndpointTaskStream(endpoint)
+    consumer1 = ComputeEndpointTaskStream(endpoint, consumer="c1")
+    consumer2 = ComputeEndpointTaskStream(endpoint, consumer="c2")
+    tasks = [SimpleInMemoryTask() for _ in range(4)]
+    for task in tasks:
+        producer.enqueue(task)
+
+    received = consumer1.dequeue_many(2) + consumer2.dequeue_many(10)
+    assert received == [t.task_id for t in tasks]
+
+
+def test_stream_reclaims_stalled_tasks(endpoint):
+    task = SimpleInMemoryTask()
+    crashed = ComputeEndpointTaskStream(endpoint, consumer="crashed")
+    crashed.enqueue(task)
+    assert crashed.dequeue() == task.task_id
+
+    survivor = ComputeEndpointTaskStream(endpoint, consumer="ok", claim_idle_ms=50)
+    # the task is still pending for the crashed consumer, so it is not redelivered
+    assert survivor.dequeue_many(10, timeout=0) == []
+    time.sleep(0.1)
+    assert survivor.dequeue_many(10, timeout=0) == [task.task_id]
+    survivor.ack(task.task_id)
+    assert survivor.reclaim() == []
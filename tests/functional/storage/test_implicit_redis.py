@@ -1,7 +1,16 @@
 import uuid
 
+import pytest
+
+from globus_compute_common.redis_task import RedisTask
 from globus_compute_common.task_storage import ImplicitRedisStorage
 from globus_compute_common.tasks import TaskProtocol, TaskState
+from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
+
+try:
+    import redis
+except ImportError:
+    pass
 
 
 class SimpleInMemoryTask(TaskProtocol):
@@ -34,3 +43,30 @@ def test_implicit_redis_roundtrip_data():
 
     result = store.get_result(task)
     assert result == "foo"
+
+
+@pytest.mark.skipif(
+    not LOCAL_REDIS_REACHABLE, reason="test requires access to local redis"
+)
+def test_implicit_redis_get_results_in_one_pipeline():
+    redis_client = redis.Redis("localhost", port=6379, decode_responses=True)
+    store = ImplicitRedisStorage()
+    tasks = [RedisTask(redis_client, str(uuid.uuid1())) for _ in range(5)]
+    for i, task in enumerate(tasks[:4]):
+        store.store_result(task, f"result {i}")
+    tasks[1].refresh()  # fields of tasks with snapshots are read from them
+
+    pipelines = []
+    pipeline = redis_client.pipeline
+
+    def spy_pipeline(*args, **kwargs):
+        pipelines.append(args)
+        return pipeline(*args, **kwargs)
+
+    redis_client.pipeline = spy_pipeline
+    results = store.get_results(tasks)
+    assert results == ["result 0", "result 1", "result 2", "result 3", None]
+    assert len(pipelines) == 1
+
+    for task in tasks:
+        task.delete()
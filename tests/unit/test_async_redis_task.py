@@ -0,0 +1,238 @@
+import asyncio
+import uuid
+
+import pytest
+
+from globus_compute_common.async_redis_task import AsyncRedisTask
+from globus_compute_common.redis_task import RedisTask
+from globus_compute_common.tasks import InternalTaskState, TaskState
+from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
+
+try:
+    import redis
+    import redis.asyncio
+
+    has_redis = True
+except ImportError:
+    has_redis = False
+
+if not has_redis or not LOCAL_REDIS_REACHABLE:
+    pytest.skip(
+        "these tests only run with access to local redis", allow_module_level=True
+    )
+
+
+@pytest.fixture(autouse=True)
+def lower_ttl_for_test():
+    AsyncRedisTask.DEFAULT_TTL = 10  # Play nice with local infrastructure
+    RedisTask.DEFAULT_TTL = 10
+
+
+def _run(coro_func):
+    async def _with_client():
+        client = redis.asyncio.Redis(host="localhost", port=6379, decode_responses=True)
+        try:
+            return await coro_func(client)
+        finally:
+            await client.connection_pool.disconnect()
+
+    return asyncio.run(_with_client())
+
+
+def test_async_redis_task_create_and_load():
+    task_id = str(uuid.uuid1())
+
+    async def _main(client):
+        with pytest.raises(ValueError):
+            await AsyncRedisTask.load(client, task_id)
+
+        await AsyncRedisTask.create(
+            client, task_id, user_id=10, details={"Blah number": 1234}
+        )
+        task = await AsyncRedisTask.load(client, task_id)
+        return (
+            await task.status.get(),
+            await task.internal_status.get(),
+            await task.user_id.get(),
+            await task.details.get(),
+            await task.function_id.get(),
+            await task.get_ttl(),
+        )
+
+    status, internal_status, user_id, details, function_id, ttl = _run(_main)
+    assert status == TaskState.WAITING_FOR_EP
+    assert internal_status == InternalTaskState.INCOMPLETE
+    assert user_id == 10
+    assert details == {"Blah number": 1234}
+    assert function_id is None
+    assert 0 < ttl <= AsyncRedisTask.DEFAULT_TTL
+
+
+def test_async_redis_task_shares_layout_with_sync():
+    task_id = str(uuid.uuid1())
+    sync_client = redis.Redis("localhost", port=6379, decode_responses=True)
+    RedisTask(sync_client, task_id, function_id="fn_id", payload="foo bar")
+
+    async def _main(client):
+        task = await AsyncRedisTask.load(client, task_id)
+        await task.status.set(TaskState.RUNNING)
+        await task.append_status_log({"state": "running"})
+        return await task.function_id.get(), await task.payload.get()
+
+    assert _run(_main) == ("fn_id", "foo bar")
+
+    sync_task = RedisTask.load(sync_client, task_id)
+    assert sync_task.status == TaskState.RUNNING
+    assert sync_task.status_log == [{"state": "running"}]
+
+
+def test_async_redis_task_existence_and_deletion():
+    task_id = str(uuid.uuid1())
+
+    async def _main(client):
+        task = await AsyncRedisTask.create(client, task_id)
+        existed = await AsyncRedisTask.exists(client, task_id)
+        await task.delete()
+        return existed, await AsyncRedisTask.exists(client, task_id)
+
+    assert _run(_main) == (True, False)
+
+
+def test_async_redis_task_create_is_atomic():
+    task_id = str(uuid.uuid1())
+
+    async def _main(client):
+        await AsyncRedisTask.create(client, task_id, function_id="fn_id")
+        with pytest.raises(ValueError):
+            await AsyncRedisTask.create(client, task_id, function_id="other_id")
+        return await client.hgetall(f"task_{task_id}"), await client.ttl(
+            f"task_{task_id}"
+        )
+
+    data, ttl = _run(_main)
+    assert data == {
+        "status": TaskState.WAITING_FOR_EP.value,
+        "internal_status": InternalTaskState.INCOMPLETE.value,
+        "function_id": "fn_id",
+    }
+    assert 0 < ttl <= AsyncRedisTask.DEFAULT_TTL
+
+
+def test_async_redis_task_bulk_load():
+    present_ids = [str(uuid.uuid1()) for _ in range(3)]
+    missing_ids = [str(uuid.uuid1()) for _ in range(2)]
+
+    async def _main(client):
+        for i, task_id in enumerate(present_ids):
+            await AsyncRedisTask.create(client, task_id, user_id=i)
+        found, missing = await AsyncRedisTask.bulk_load(
+            client, present_ids + missing_ids
+        )
+
+        # fields are read from the snapshot, until it is refreshed
+        await client.hset(found[0].hname, "user_id", 10)
+        user_ids = [await task.user_id.get() for task in found]
+        await found[0].refresh()
+        return found, missing, user_ids, await found[0].user_id.get()
+
+    found, missing, user_ids, refreshed_user_id = _run(_main)
+    assert [task.task_id for task in found] == present_ids
+    assert missing == missing_ids
+    assert user_ids == [0, 1, 2]
+    assert refreshed_user_id == 10
+
+
+def test_async_redis_task_bulk_load_sets_defaults():
+    task_id = str(uuid.uuid1())
+    sync_client = redis.Redis("localhost", port=6379, decode_responses=True)
+    sync_client.hset(f"task_{task_id}", "function_id", "fn_id")
+
+    async def _main(client):
+        (task,), _ = await AsyncRedisTask.bulk_load(client, [task_id])
+        return await task.status.get(), await task.get_ttl()
+
+    status, ttl = _run(_main)
+    assert status == TaskState.WAITING_FOR_EP
+    assert 0 < ttl <= AsyncRedisTask.DEFAULT_TTL
+    assert RedisTask.load(sync_client, task_id).status == TaskState.WAITING_FOR_EP
+
+
+def test_async_redis_task_status_log():
+    task_id = str(uuid.uuid1())
+
+    async def _main(client):
+        task = await AsyncRedisTask.create(client, task_id)
+        await task.append_status_log("a", "b")
+        await task.append_status_log("c")
+        first = await task.read_status_log(count=2)
+        return first, await task.read_status_log(first[1]), await task.get_status_log()
+
+    first, rest, full = _run(_main)
+    assert first == (["a", "b"], 2)
+    assert rest == (["c"], 3)
+    assert full == ["a", "b", "c"]
+
+
+def test_async_redis_task_status_log_scripts_are_not_registered_per_call(
+    monkeypatch,
+):
+    task_id = str(uuid.uuid1())
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("register_script should not be called")
+
+    monkeypatch.setattr(redis.asyncio.Redis, "register_script", _fail)
+
+    async def _main(client):
+        task = await AsyncRedisTask.create(client, task_id)
+        await task.append_status_log("a")
+        await task.append_status_log("b")
+        return await task.read_status_log()
+
+    assert _run(_main) == (["a", "b"], 2)
+
+
+def test_async_redis_task_reads_compact_layout(monkeypatch):
+    task_id = str(uuid.uuid1())
+    sync_client = redis.Redis("localhost", port=6379, decode_responses=True)
+    monkeypatch.setattr(RedisTask, "COMPACT_STORAGE", True)
+    monkeypatch.setattr(AsyncRedisTask, "COMPACT_STORAGE", True)
+    RedisTask.create(sync_client, task_id, function_id="fn_id")
+
+    async def _main(client):
+        task = await AsyncRedisTask.load(client, task_id)
+        return await task.status.get(), await task.function_id.get()
+
+    assert _run(_main) == (TaskState.WAITING_FOR_EP, "fn_id")
+
+
+@pytest.mark.parametrize("use_cluster_keys", (False, True))
+def test_async_redis_task_maintains_indexes(monkeypatch, use_cluster_keys):
+    indexed_fields = ("task_group_id", "endpoint_id", "status")
+    for task_class in (RedisTask, AsyncRedisTask):
+        monkeypatch.setattr(task_class, "INDEXED_FIELDS", indexed_fields)
+        monkeypatch.setattr(task_class, "CLUSTER_KEYS", use_cluster_keys)
+    sync_client = redis.Redis("localhost", port=6379, decode_responses=True)
+    task_id, group_id = str(uuid.uuid1()), str(uuid.uuid1())
+    endpoint_ids = [str(uuid.uuid1()) for _ in range(2)]
+
+    async def _main(client):
+        task = await AsyncRedisTask.create(
+            client, task_id, task_group_id=group_id, endpoint_id=endpoint_ids[0]
+        )
+        found = [
+            RedisTask.find_ids(sync_client, task_group_id=group_id),
+            RedisTask.find_ids(sync_client, endpoint_id=endpoint_ids[0]),
+        ]
+        await task.endpoint_id.set(endpoint_ids[1])
+        await task.status.set(TaskState.RUNNING)
+        return found
+
+    assert _run(_main) == [[task_id], [task_id]]
+    assert RedisTask.find_ids(sync_client, endpoint_id=endpoint_ids[0]) == []
+    assert RedisTask.find_ids(sync_client, endpoint_id=endpoint_ids[1]) == [task_id]
+    assert RedisTask.find_ids(sync_client, status=TaskState.RUNNING) == [task_id]
+    assert task_id not in RedisTask.find_ids(
+        sync_client, status=TaskState.WAITING_FOR_EP
+    )
+    RedisTask.load(sync_client, task_id).delete()
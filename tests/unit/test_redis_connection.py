@@ -1,4 +1,5 @@
 import logging
+import os
 import uuid
 
 import pytest
@@ -7,9 +8,12 @@ from globus_compute_common.redis import (
     ComputeEndpointTaskQueue,
     ComputeRedisPubSub,
     default_redis_connection_factory,
+    prewarm_redis_connections,
     redis_connection_error_logging,
 )
+from globus_compute_common.redis.connection import _reset_shared_pools
 from globus_compute_common.tasks import TaskProtocol, TaskState
+from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
 
 try:
     import redis
@@ -77,3 +81,67 @@ def test_connection_error_logging(monkeypatch, caplog):
             conn.rpush()  # args don't matter...
 
     assert "ConnectionError while trying to communicate with redis" in caplog.text
+
+
+@pytest.mark.skipif(not has_redis, reason="test requires redis lib")
+def test_connection_factory_shares_pools():
+    url = "redis://localhost:6379"
+    client = default_redis_connection_factory(url)
+    assert default_redis_connection_factory(url).connection_pool is (
+        client.connection_pool
+    )
+    # keepalive is opt-in, as before pools were shared
+    assert not client.connection_pool.connection_kwargs["socket_keepalive"]
+    keepalive_client = default_redis_connection_factory(url, socket_keepalive=True)
+    assert keepalive_client.connection_pool.connection_kwargs["socket_keepalive"]
+    assert keepalive_client.connection_pool is not client.connection_pool
+
+    for other_client in (
+        default_redis_connection_factory("redis://localhost:6379/1"),
+        default_redis_connection_factory(url, socket_timeout=5),
+        default_redis_connection_factory(url, shared=False),
+    ):
+        assert other_client.connection_pool is not client.connection_pool
+
+
+@pytest.mark.skipif(not has_redis, reason="test requires redis lib")
+def test_connection_factory_blocking_pool():
+    client = default_redis_connection_factory(max_connections=3, pool_timeout=1)
+    pool = client.connection_pool
+    assert isinstance(pool, redis.BlockingConnectionPool)
+    assert pool.max_connections == 3
+    assert pool.timeout == 1
+
+
+@pytest.mark.skipif(not has_redis, reason="test requires redis lib")
+def test_connection_factory_pools_reset_after_fork():
+    client = default_redis_connection_factory()
+    _reset_shared_pools()
+    assert default_redis_connection_factory().connection_pool is not (
+        client.connection_pool
+    )
+
+    if not hasattr(os, "fork"):
+        return
+    client = default_redis_connection_factory()
+    pid = os.fork()
+    if pid == 0:
+        is_new_pool = default_redis_connection_factory().connection_pool is not (
+            client.connection_pool
+        )
+        os._exit(0 if is_new_pool else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+@pytest.mark.skipif(
+    not (has_redis and LOCAL_REDIS_REACHABLE),
+    reason="test requires local redis reachable",
+)
+def test_prewarm_redis_connections():
+    client = default_redis_connection_factory(shared=False)
+    prewarm_redis_connections(client, 3)
+    available = client.connection_pool._available_connections
+    assert len(available) == 3
+    assert all(connection._sock is not None for connection in available)
+    assert client.ping()
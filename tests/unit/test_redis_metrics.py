@@ -0,0 +1,38 @@
+import threading
+
+from globus_compute_common.redis import ComputeRedisHistogram, ComputeRedisQueueCounters
+
+
+def test_histogram_buckets():
+    histogram = ComputeRedisHistogram([10, 1, 100])
+    for value in (0, 1, 5, 50, 1000):
+        histogram.observe(value)
+
+    assert histogram.buckets == (1, 10, 100)
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.count == 5
+    assert histogram.sum == 1056
+    assert histogram.cumulative_counts() == [
+        (1, 2),
+        (10, 3),
+        (100, 4),
+        (float("inf"), 5),
+    ]
+
+
+def test_counters_are_thread_safe():
+    counters = ComputeRedisQueueCounters()
+
+    def record():
+        for _ in range(1000):
+            counters.record_enqueued("ep", 2)
+            counters.record_dequeued("ep")
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counters.record_enqueued("other", 0)
+    assert counters.snapshot() == ({"ep": 8000}, {"ep": 4000})
@@ -4,6 +4,7 @@ from globus_compute_common.redis import (
     DEFAULT_SERDE,
     INT_SERDE,
     JSON_SERDE,
+    ComputeRedisCompactEnumSerde,
     ComputeRedisEnumSerde,
 )
 from globus_compute_common.tasks import TaskState
@@ -39,3 +40,16 @@ def test_enum_serde():
     serde = ComputeRedisEnumSerde(TaskState)
     assert serde.serialize(TaskState.RUNNING) == "running"
     assert serde.deserialize(serde.serialize(TaskState.RUNNING)) is TaskState.RUNNING
+
+
+def test_compact_enum_serde():
+    serde = ComputeRedisCompactEnumSerde(TaskState)
+    code = serde.serialize(TaskState.RUNNING)
+    assert code == str(list(TaskState).index(TaskState.RUNNING))
+    assert serde.deserialize(code) is TaskState.RUNNING
+
+    # values written by the non-compact serde can still be read
+    assert serde.deserialize("running") is TaskState.RUNNING
+
+    with pytest.raises(ValueError):
+        serde.deserialize(str(len(TaskState)))
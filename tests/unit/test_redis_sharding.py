@@ -0,0 +1,53 @@
+import uuid
+
+import pytest
+
+from globus_compute_common.redis import ComputeRedisShardRouter
+
+
+def _router(num_shards):
+    # the router does not use the clients itself, so any object will do
+    return ComputeRedisShardRouter(
+        {f"shard{i}": f"client{i}" for i in range(num_shards)}
+    )
+
+
+def test_router_spreads_endpoints_across_shards():
+    router = _router(4)
+    endpoint_ids = [str(uuid.uuid4()) for _ in range(4000)]
+    groups = router.group_by_shard(endpoint_ids)
+
+    assert set(groups) == set(router.shards)
+    for shard_endpoint_ids in groups.values():
+        assert 600 < len(shard_endpoint_ids) < 1400
+    endpoint_id = endpoint_ids[0]
+    assert (
+        router.client_for(endpoint_id) == router.shards[router.shard_for(endpoint_id)]
+    )
+    # placement depends only upon the shards' names
+    assert _router(4).shard_for(endpoint_id) == router.shard_for(endpoint_id)
+
+
+def test_adding_and_removing_shards_moves_few_endpoints():
+    router = _router(4)
+    endpoint_ids = [str(uuid.uuid4()) for _ in range(4000)]
+    before = {e: router.shard_for(e) for e in endpoint_ids}
+
+    router.add_shard("shard4", "client4")
+    after = {e: router.shard_for(e) for e in endpoint_ids}
+    moved = [e for e in endpoint_ids if before[e] != after[e]]
+    assert 400 < len(moved) < 1200
+    assert all(after[e] == "shard4" for e in moved)
+
+    router.remove_shard("shard4")
+    assert {e: router.shard_for(e) for e in endpoint_ids} == before
+
+
+def test_router_shard_errors():
+    with pytest.raises(ValueError):
+        ComputeRedisShardRouter({})
+    router = _router(1)
+    with pytest.raises(ValueError):
+        router.add_shard("shard0", "client")
+    with pytest.raises(ValueError):
+        router.remove_shard("shard0")
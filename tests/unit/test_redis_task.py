@@ -1,8 +1,11 @@
 import random
+import time
+import types
 import uuid
 
 import pytest
 
+from globus_compute_common import redis_task
 from globus_compute_common.redis_task import RedisTask
 from globus_compute_common.tasks import InternalTaskState, TaskState
 from globus_compute_common.testing import LOCAL_REDIS_REACHABLE
@@ -132,3 +135,525 @@ def test_redis_state_log(redis_client):
 
     assert to_store == rt.status_log
     assert 0 < redis_client.ttl(rt.state_log_name) <= rt.DEFAULT_TTL
+
+
+def test_redis_task_atomic_create(redis_client):
+    task_id = str(uuid.uuid1())
+    task = RedisTask.create(
+        redis_client,
+        task_id,
+        user_id=10,
+        function_id="blah_id",
+        payload="foo bar",
+        details={"Blah number": 1234},
+    )
+
+    assert task.status == TaskState.WAITING_FOR_EP
+    assert task.internal_status == InternalTaskState.INCOMPLETE
+    assert task.user_id == 10
+    assert task.function_id == "blah_id"
+    assert task.payload == "foo bar"
+    assert task.details == {"Blah number": 1234}
+    assert task.container is None
+    assert (RedisTask.DEFAULT_TTL - task.ttl) < 1
+
+    # the task is indistinguishable from one created via `__init__`
+    assert RedisTask.load(redis_client, task_id).user_id == 10
+
+
+def test_redis_task_atomic_create_rejects_existing(redis_client):
+    task_id = str(uuid.uuid1())
+    RedisTask.create(redis_client, task_id, function_id="first")
+
+    with pytest.raises(ValueError, match="Conflict"):
+        RedisTask.create(redis_client, task_id, function_id="second")
+
+    # the original task is unmodified
+    assert RedisTask.load(redis_client, task_id).function_id == "first"
+
+
+def test_redis_task_bulk_create(redis_client):
+    existing_id = str(uuid.uuid1())
+    RedisTask.create(redis_client, existing_id, function_id="first")
+
+    new_ids = [str(uuid.uuid1()) for _ in range(5)]
+    specs = [{"task_id": task_id, "user_id": i} for i, task_id in enumerate(new_ids)]
+    specs.insert(2, {"task_id": existing_id, "function_id": "second"})
+
+    created, conflicts = RedisTask.bulk_create(redis_client, specs, chunk_size=2)
+
+    assert [task.task_id for task in created] == new_ids
+    assert conflicts == [existing_id]
+    assert RedisTask.load(redis_client, existing_id).function_id == "first"
+
+    for i, task in enumerate(created):
+        assert task.user_id == i
+        assert task.status == TaskState.WAITING_FOR_EP
+        assert RedisTask.load(redis_client, task.task_id).user_id == i
+        assert (RedisTask.DEFAULT_TTL - task.ttl) < 1
+
+
+def test_redis_task_bulk_create_rejects_unknown_fields(redis_client):
+    with pytest.raises(TypeError):
+        RedisTask.bulk_create(
+            redis_client, [{"task_id": str(uuid.uuid1()), "not_a_field": 1}]
+        )
+
+
+def test_redis_task_bulk_load(redis_client):
+    present_ids = [str(uuid.uuid1()) for _ in range(5)]
+    missing_ids = [str(uuid.uuid1()) for _ in range(2)]
+    for i, task_id in enumerate(present_ids):
+        RedisTask.create(redis_client, task_id, user_id=i)
+
+    # a task written without the required fields or a TTL
+    legacy_id = str(uuid.uuid1())
+    redis_client.hset(f"task_{legacy_id}", "function_id", "blah_id")
+
+    task_ids = present_ids[:2] + missing_ids + present_ids[2:] + [legacy_id]
+    found, missing = RedisTask.bulk_load(redis_client, task_ids, chunk_size=3)
+
+    assert [task.task_id for task in found] == present_ids + [legacy_id]
+    assert missing == missing_ids
+    for i, task in enumerate(found[:-1]):
+        assert task.user_id == i
+
+    # defaults are filled in, as with `load()`
+    legacy_task = found[-1]
+    assert legacy_task.function_id == "blah_id"
+    assert legacy_task.status == TaskState.WAITING_FOR_EP
+    assert RedisTask.load(redis_client, legacy_id).status == TaskState.WAITING_FOR_EP
+    assert 0 < legacy_task.ttl <= RedisTask.DEFAULT_TTL
+
+
+def test_redis_task_snapshot_reads_and_refresh(redis_client):
+    task_id = str(uuid.uuid1())
+    RedisTask.create(redis_client, task_id, function_id="blah_id")
+    (task,), _ = RedisTask.bulk_load(redis_client, [task_id])
+
+    # writes through the snapshot are visible immediately
+    task.status = TaskState.RUNNING
+    assert task.status == TaskState.RUNNING
+    assert RedisTask.load(redis_client, task_id).status == TaskState.RUNNING
+
+    # writes from elsewhere are visible after a refresh
+    RedisTask.load(redis_client, task_id).function_id = "other_id"
+    assert task.function_id == "blah_id"
+    task.refresh()
+    assert task.function_id == "other_id"
+
+
+def test_redis_state_log_batch_append_and_paged_read(redis_client):
+    rt = RedisTask(redis_client, str(uuid.uuid4()))
+    rt.append_status_log(*[{"n": i} for i in range(5)])
+    rt.status_log = {"n": 5}
+
+    assert rt.status_log == [{"n": i} for i in range(6)]
+
+    entries, offset = rt.read_status_log(count=4)
+    assert entries == [{"n": i} for i in range(4)]
+    entries, offset = rt.read_status_log(offset)
+    assert entries == [{"n": 4}, {"n": 5}]
+    assert offset == 6
+
+    # nothing new
+    assert rt.read_status_log(offset) == ([], 6)
+
+    rt.append_status_log({"n": 6})
+    assert rt.read_status_log(offset) == ([{"n": 6}], 7)
+
+
+def test_redis_state_log_capped(redis_client, monkeypatch):
+    monkeypatch.setattr(RedisTask, "STATUS_LOG_MAX_LEN", 3)
+    rt = RedisTask(redis_client, str(uuid.uuid4()))
+
+    rt.append_status_log(*range(5))
+    assert rt.status_log == [2, 3, 4]
+    assert 0 < redis_client.ttl(rt.state_log_trimmed_name) <= rt.DEFAULT_TTL
+
+    # offsets are stable across trimming
+    entries, offset = rt.read_status_log(3)
+    assert (entries, offset) == ([3, 4], 5)
+    rt.append_status_log(5, 6)
+    assert rt.status_log == [4, 5, 6]
+    assert rt.read_status_log(offset) == ([5, 6], 7)
+
+    # reading from a dropped offset starts at the oldest remaining entry
+    assert rt.read_status_log(0) == ([4, 5, 6], 7)
+
+
+@pytest.fixture
+def indexed_fields(monkeypatch):
+    monkeypatch.setattr(
+        RedisTask,
+        "INDEXED_FIELDS",
+        ("task_group_id", "endpoint_id", "user_id", "status", "internal_status"),
+    )
+
+
+def test_redis_task_find_by_index(redis_client, indexed_fields):
+    group_id, endpoint_id = str(uuid.uuid1()), str(uuid.uuid1())
+    grouped_ids = [str(uuid.uuid1()) for _ in range(4)]
+    for task_id in grouped_ids[:2]:
+        RedisTask.create(redis_client, task_id, task_group_id=group_id)
+    created, _ = RedisTask.bulk_create(
+        redis_client,
+        [
+            {"task_id": task_id, "task_group_id": group_id, "endpoint_id": endpoint_id}
+            for task_id in grouped_ids[2:]
+        ],
+    )
+    RedisTask(redis_client, str(uuid.uuid1()), endpoint_id=endpoint_id)
+
+    assert sorted(RedisTask.find_ids(redis_client, task_group_id=group_id)) == sorted(
+        grouped_ids
+    )
+    assert sorted(
+        RedisTask.find_ids(
+            redis_client, task_group_id=group_id, endpoint_id=endpoint_id
+        )
+    ) == sorted(grouped_ids[2:])
+    assert len(RedisTask.find_ids(redis_client, endpoint_id=endpoint_id)) == 3
+
+    # status changes move tasks between indexes
+    created[0].internal_status = InternalTaskState.COMPLETE
+    incomplete = RedisTask.find(
+        redis_client,
+        endpoint_id=endpoint_id,
+        internal_status=InternalTaskState.INCOMPLETE,
+    )
+    assert len(incomplete) == 2
+    assert created[0].task_id not in {task.task_id for task in incomplete}
+    assert [
+        task.task_id
+        for task in RedisTask.find(
+            redis_client,
+            endpoint_id=endpoint_id,
+            internal_status=InternalTaskState.COMPLETE,
+        )
+    ] == [created[0].task_id]
+
+    # deletion removes tasks from indexes
+    created[1].delete()
+    assert sorted(RedisTask.find_ids(redis_client, task_group_id=group_id)) == sorted(
+        grouped_ids[:3]
+    )
+
+
+def test_redis_task_index_expires_with_task(redis_client, indexed_fields):
+    group_id = str(uuid.uuid1())
+    RedisTask.create(redis_client, str(uuid.uuid1()), task_group_id=group_id)
+
+    index_name = f"task_index:task_group_id:{group_id}"
+    assert 0 < redis_client.ttl(index_name) <= RedisTask.DEFAULT_TTL
+
+    # entries whose expiration time has passed are ignored and cleaned up
+    redis_client.zadd(index_name, {"expired_task_id": 1})
+    assert "expired_task_id" not in RedisTask.find_ids(
+        redis_client, task_group_id=group_id
+    )
+    assert redis_client.zscore(index_name, "expired_task_id") is None
+
+
+@pytest.mark.parametrize("use_cluster_keys", (False, True))
+def test_redis_task_lowering_ttl_rescores_indexes(
+    redis_client, indexed_fields, monkeypatch, use_cluster_keys
+):
+    monkeypatch.setattr(RedisTask, "CLUSTER_KEYS", use_cluster_keys)
+    group_id, endpoint_id = str(uuid.uuid1()), str(uuid.uuid1())
+    setter_task = RedisTask.create(
+        redis_client, str(uuid.uuid1()), task_group_id=group_id
+    )
+    completed_task = RedisTask.create(
+        redis_client,
+        str(uuid.uuid1()),
+        task_group_id=group_id,
+        endpoint_id=endpoint_id,
+    )
+    kept_task = RedisTask.create(
+        redis_client, str(uuid.uuid1()), task_group_id=group_id
+    )
+
+    setter_task.ttl = 2
+    completed_task.complete(status=TaskState.SUCCESS, ttl=2)
+    # a higher TTL is not applied, so neither are the index entries re-scored
+    kept_task.ttl = RedisTask.DEFAULT_TTL * 2
+
+    # once the lowered TTLs have passed, only the task with the default TTL is found
+    later = time.time() + 5
+    monkeypatch.setattr(redis_task, "time", types.SimpleNamespace(time=lambda: later))
+    assert RedisTask.find_ids(redis_client, task_group_id=group_id) == [
+        kept_task.task_id
+    ]
+    assert RedisTask.find_ids(redis_client, endpoint_id=endpoint_id) == []
+    assert (
+        RedisTask.find_ids(
+            redis_client,
+            internal_status=InternalTaskState.COMPLETE,
+            status=TaskState.SUCCESS,
+        )
+        == []
+    )
+
+
+def test_redis_task_find_requires_indexed_field(redis_client):
+    with pytest.raises(ValueError):
+        RedisTask.find_ids(redis_client, task_group_id="foo")
+    with pytest.raises(ValueError):
+        RedisTask.find_ids(redis_client)
+
+
+@pytest.fixture
+def compact_storage(monkeypatch):
+    monkeypatch.setattr(RedisTask, "COMPACT_STORAGE", True)
+
+
+def test_redis_task_compact_storage_layout(redis_client, compact_storage):
+    task_id = str(uuid.uuid1())
+    task = RedisTask.create(
+        redis_client, task_id, user_id=10, payload_reference={"storage_id": "redis"}
+    )
+    task.status = TaskState.RUNNING
+
+    raw = redis_client.hgetall(f"task_{task_id}")
+    assert set(raw) == {"s", "is", "u", "pr"}
+    assert raw["s"] == str(list(TaskState).index(TaskState.RUNNING))
+
+    assert task.status == TaskState.RUNNING
+    assert task.internal_status == InternalTaskState.INCOMPLETE
+    assert task.user_id == 10
+    assert task.payload_reference == {"storage_id": "redis"}
+
+
+def test_redis_task_compact_storage_reads_legacy(redis_client, monkeypatch):
+    task_id = str(uuid.uuid1())
+    RedisTask(redis_client, task_id, user_id=10, function_id="blah_id")
+
+    monkeypatch.setattr(RedisTask, "COMPACT_STORAGE", True)
+    task = RedisTask.load(redis_client, task_id)
+    assert task.status == TaskState.WAITING_FOR_EP
+    assert task.user_id == 10
+    (snapshot_task,), _ = RedisTask.bulk_load(redis_client, [task_id])
+    assert snapshot_task.function_id == "blah_id"
+
+    # rewriting a field migrates it to the compact layout
+    task.user_id = 11
+    raw = redis_client.hgetall(f"task_{task_id}")
+    assert raw["u"] == "11"
+    assert "user_id" not in raw
+    assert task.user_id == 11
+
+
+def test_redis_task_compact_storage_with_indexes(
+    redis_client, compact_storage, indexed_fields
+):
+    endpoint_id = str(uuid.uuid1())
+    task = RedisTask.create(redis_client, str(uuid.uuid1()), endpoint_id=endpoint_id)
+    assert RedisTask.find_ids(
+        redis_client, endpoint_id=endpoint_id, status=TaskState.WAITING_FOR_EP
+    ) == [task.task_id]
+
+    task.status = TaskState.RUNNING
+    assert RedisTask.find_ids(
+        redis_client, endpoint_id=endpoint_id, status=TaskState.RUNNING
+    ) == [task.task_id]
+    assert (
+        RedisTask.find_ids(
+            redis_client, endpoint_id=endpoint_id, status=TaskState.WAITING_FOR_EP
+        )
+        == []
+    )
+
+
+def test_measure_task_memory(redis_client):
+    from globus_compute_common.redis_task_memory import measure_task_memory
+
+    try:
+        redis_client.memory_usage("task_memory_probe")
+    except redis.exceptions.ResponseError:
+        pytest.skip("test requires a redis server which supports MEMORY USAGE")
+
+    legacy_size, _ = measure_task_memory(redis_client, compact=False, num_tasks=10)
+    compact_size, _ = measure_task_memory(redis_client, compact=True, num_tasks=10)
+    assert compact_size < legacy_size
+
+
+def test_measure_task_memory_requires_tasks(redis_client):
+    from globus_compute_common.redis_task_memory import measure_task_memory
+
+    with pytest.raises(ValueError):
+        measure_task_memory(redis_client, compact=True, num_tasks=0)
+
+
+def test_redis_task_transition(redis_client, monkeypatch):
+    monkeypatch.setattr(RedisTask, "STATUS_LOG_MAX_LEN", 2)
+    task = RedisTask.create(redis_client, str(uuid.uuid1()))
+    task.transition(TaskState.WAITING_FOR_LAUNCH)
+    task.transition(TaskState.RUNNING, {"state": "running"})
+    task.transition(TaskState.RUNNING, {"state": "still running"})
+    task.transition(TaskState.SUCCESS, {"state": "done"})
+
+    assert task.status == TaskState.SUCCESS
+    assert task.read_status_log() == (
+        [{"state": "still running"}, {"state": "done"}],
+        3,
+    )
+
+
+def test_redis_task_complete(redis_client):
+    task = RedisTask.create(redis_client, str(uuid.uuid1()), user_id=10)
+    task.complete(
+        result_reference={"storage_id": "redis"},
+        completion_time="2026-10-19T00:00:00",
+        status=TaskState.SUCCESS,
+        log_entry={"state": "done"},
+        ttl=5,
+    )
+
+    (loaded,), _ = RedisTask.bulk_load(redis_client, [task.task_id])
+    assert loaded.internal_status == InternalTaskState.COMPLETE
+    assert loaded.status == TaskState.SUCCESS
+    assert loaded.result_reference == {"storage_id": "redis"}
+    assert loaded.completion_time == "2026-10-19T00:00:00"
+    assert loaded.result is None
+    assert loaded.user_id == 10
+    assert task.status_log == [{"state": "done"}]
+    assert 0 < redis_client.ttl(task.hname) <= 5
+
+    # the TTL is only ever lowered
+    task.complete(ttl=100)
+    assert redis_client.ttl(task.hname) <= 5
+
+
+def test_redis_task_atomic_update_requires_existing_task(redis_client):
+    task = RedisTask.create(redis_client, str(uuid.uuid1()))
+    task.delete()
+    with pytest.raises(ValueError):
+        task.transition(TaskState.RUNNING)
+    with pytest.raises(ValueError):
+        task.complete(result="foo")
+    assert not RedisTask.exists(redis_client, task.task_id)
+
+
+def test_redis_task_atomic_update_moves_indexes(
+    redis_client, indexed_fields, compact_storage
+):
+    endpoint_id = str(uuid.uuid1())
+    task = RedisTask.create(redis_client, str(uuid.uuid1()), endpoint_id=endpoint_id)
+
+    task.transition(TaskState.RUNNING)
+    assert RedisTask.find_ids(
+        redis_client, endpoint_id=endpoint_id, status=TaskState.RUNNING
+    ) == [task.task_id]
+    assert (
+        RedisTask.find_ids(
+            redis_client, endpoint_id=endpoint_id, status=TaskState.WAITING_FOR_EP
+        )
+        == []
+    )
+
+    task.complete(status=TaskState.SUCCESS)
+    assert RedisTask.find_ids(
+        redis_client,
+        endpoint_id=endpoint_id,
+        status=TaskState.SUCCESS,
+        internal_status=InternalTaskState.COMPLETE,
+    ) == [task.task_id]
+    assert (
+        RedisTask.find_ids(
+            redis_client,
+            endpoint_id=endpoint_id,
+            internal_status=InternalTaskState.INCOMPLETE,
+        )
+        == []
+    )
+
+    # non-enum indexed fields cannot be updated atomically
+    with pytest.raises(ValueError):
+        task._atomic_update({"endpoint_id": "foo"})
+
+
+@pytest.fixture
+def cluster_keys(monkeypatch):
+    monkeypatch.setattr(RedisTask, "CLUSTER_KEYS", True)
+
+
+def test_redis_task_cluster_key_layout(redis_client, cluster_keys):
+    from globus_compute_common.redis import key_slot
+
+    task_id = str(uuid.uuid1())
+    task = RedisTask.create(redis_client, task_id, user_id=10)
+    task.append_status_log({"state": "created"})
+
+    assert task.hname == f"task_{{{task_id}}}"
+    assert key_slot(task.hname) == key_slot(task.state_log_name)
+    assert key_slot(task.hname) == key_slot(task.state_log_trimmed_name)
+    assert redis_client.exists(task.hname, task.state_log_name) == 2
+    assert not redis_client.exists(f"task_{task_id}")
+
+    assert RedisTask.exists(redis_client, task_id)
+    loaded = RedisTask.load(redis_client, task_id)
+    assert loaded.user_id == 10
+    assert loaded.status_log == [{"state": "created"}]
+
+
+def test_redis_task_cluster_keys_with_indexes(
+    redis_client, cluster_keys, indexed_fields
+):
+    endpoint_id = str(uuid.uuid1())
+    task = RedisTask.create(redis_client, str(uuid.uuid1()), endpoint_id=endpoint_id)
+    (bulk_task,), _ = RedisTask.bulk_create(
+        redis_client, [{"task_id": str(uuid.uuid1()), "endpoint_id": endpoint_id}]
+    )
+    index_name = f"task_index:{{endpoint_id:{endpoint_id}}}"
+    assert sorted(redis_client.zrange(index_name, 0, -1)) == sorted(
+        [task.task_id, bulk_task.task_id]
+    )
+
+    task.transition(TaskState.RUNNING)
+    bulk_task.status = TaskState.RUNNING
+    assert sorted(
+        RedisTask.find_ids(
+            redis_client, endpoint_id=endpoint_id, status=TaskState.RUNNING
+        )
+    ) == sorted([task.task_id, bulk_task.task_id])
+
+    task.complete(status=TaskState.SUCCESS)
+    assert RedisTask.find_ids(
+        redis_client, endpoint_id=endpoint_id, status=TaskState.RUNNING
+    ) == [bulk_task.task_id]
+
+    bulk_task.delete()
+    assert RedisTask.find_ids(redis_client, endpoint_id=endpoint_id) == [task.task_id]
+
+
+def test_redis_task_reads_from_replica(redis_client):
+    class RecordingClient:
+        def __init__(self, client):
+            self.client = client
+            self.commands = []
+
+        def __getattr__(self, name):
+            self.commands.append(name)
+            return getattr(self.client, name)
+
+    replica = RecordingClient(
+        redis.Redis("localhost", port=6379, decode_responses=True)
+    )
+    task_id = str(uuid.uuid1())
+    RedisTask.create(redis_client, task_id, user_id=10)
+
+    task = RedisTask.load(redis_client, task_id, replica_client=replica)
+    assert replica.commands == []
+    assert task.user_id == 10
+    task.status = TaskState.RUNNING
+    assert replica.commands == ["hget"]
+
+    task.refresh()
+    assert task.status == TaskState.RUNNING
+    assert replica.commands == ["hget", "hgetall"]
+
+    (bulk_task,), _ = RedisTask.bulk_load(
+        redis_client, [task_id], replica_client=replica
+    )
+    assert bulk_task.redis_replica_client is replica
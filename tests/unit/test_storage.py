@@ -1,14 +1,22 @@
+import concurrent.futures
 import sys
 import uuid
+import zlib
 
 import pytest
 
 from globus_compute_common.task_storage import (
+    CachingTaskStorage,
     ImplicitRedisStorage,
     RedisS3Storage,
     StorageException,
     get_default_task_storage,
 )
+from globus_compute_common.task_storage.compression import (
+    IncrementalValueDecoder,
+    StorageCodec,
+    has_zstandard,
+)
 from globus_compute_common.tasks import TaskProtocol, TaskState
 
 try:
@@ -315,3 +323,565 @@ def test_task_with_unknown_storage_for_payload(test_bucket_mock):
 
     with pytest.raises(StorageException):
         store.get_payload(task)
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_part_size_must_be_accepted_by_s3(test_bucket_mock):
+    with pytest.raises(ValueError):
+        RedisS3Storage(
+            bucket_name="compute-test-1", redis_threshold=0, part_size=1024 * 1024
+        )
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_utf8_reader_encodes_incrementally():
+    from globus_compute_common.task_storage.s3 import _UTF8Reader
+
+    text = "aé€😀" * 100
+    reader = _UTF8Reader(text, chunk_chars=7)
+    parts = []
+    while True:
+        part = reader.read(13)
+        if not part:
+            break
+        assert len(part) <= 13
+        parts.append(part)
+    assert b"".join(parts) == text.encode("utf-8")
+    assert _UTF8Reader(text).read() == text.encode("utf-8")
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_large_result_is_transferred_in_parts(test_bucket_mock):
+    part_size = 5 * 1024 * 1024
+    store = RedisS3Storage(
+        bucket_name="compute-test-1",
+        redis_threshold=0,
+        multipart_threshold=1024 * 1024,
+        part_size=part_size,
+    )
+    # multi-byte characters, so that parts do not align with characters
+    result = "é€😀" * (2 * part_size // 9 + 1000)
+    task = SimpleInMemoryTask()
+    store.store_result(task, result)
+
+    key = task.result_reference["key"]
+    head = store.client.head_object(Bucket="compute-test-1", Key=key)
+    assert head["ContentLength"] == len(result.encode("utf-8"))
+    assert head["ETag"].strip('"').endswith("-3")  # uploaded in 3 parts
+
+    ranges = []
+    get_range = store._get_range
+
+    def spy_get_range(bucket, key, start, end, if_match=None):
+        ranges.append((start, end, if_match))
+        return get_range(bucket, key, start, end, if_match)
+
+    store._get_range = spy_get_range
+    assert store.get_result(task) == result
+    # later parts are only fetched from the same version of the object
+    assert sorted(ranges) == [
+        (0, part_size - 1, None),
+        (part_size, 2 * part_size - 1, head["ETag"]),
+        (2 * part_size, head["ContentLength"] - 1, head["ETag"]),
+    ]
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_download_fails_if_object_changes(test_bucket_mock):
+    part_size = 5 * 1024 * 1024
+    store = RedisS3Storage(
+        bucket_name="compute-test-1", redis_threshold=0, part_size=part_size
+    )
+    task = SimpleInMemoryTask()
+    store.store_result(task, "a" * (part_size + 1))
+
+    get_range = store._get_range
+
+    def overwriting_get_range(bucket, key, start, end, if_match=None):
+        response = get_range(bucket, key, start, end, if_match)
+        if start == 0:
+            store.client.put_object(Bucket=bucket, Key=key, Body=b"b" * part_size * 2)
+        return response
+
+    store._get_range = overwriting_get_range
+    with pytest.raises(StorageException):
+        store.get_result(task)
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_large_compressed_result_is_decoded_in_parts(test_bucket_mock):
+    part_size = 5 * 1024 * 1024
+    store = RedisS3Storage(
+        bucket_name="compute-test-1",
+        redis_threshold=0,
+        part_size=part_size,
+        max_concurrency=1,
+        compression="zlib",
+        compression_threshold=0,
+    )
+    # poorly compressible, so that the compressed data spans several parts
+    result = "".join(str(uuid.uuid4()) for _ in range(600000))
+    task = SimpleInMemoryTask()
+    store.store_result(task, result)
+    head = store.client.head_object(
+        Bucket="compute-test-1", Key=task.result_reference["key"]
+    )
+    assert head["ContentLength"] > 2 * part_size
+    assert store.get_result(task) == result
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_small_result_is_fetched_in_one_request(test_bucket_mock):
+    store = RedisS3Storage(bucket_name="compute-test-1", redis_threshold=0)
+    task = SimpleInMemoryTask()
+    store.store_result(task, "Hello World!")
+
+    ranges = []
+    get_range = store._get_range
+
+    def spy_get_range(bucket, key, start, end, if_match=None):
+        ranges.append((start, end))
+        return get_range(bucket, key, start, end, if_match)
+
+    store._get_range = spy_get_range
+    assert store.get_result(task) == "Hello World!"
+    assert len(ranges) == 1
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_empty_object(test_bucket_mock):
+    from globus_compute_common.task_storage.s3 import StorageFieldName
+
+    store = RedisS3Storage(bucket_name="compute-test-1", redis_threshold=-1)
+    task = SimpleInMemoryTask()
+    store._store_to_s3(task, StorageFieldName.result, "")
+    assert store._get_from_s3(task, StorageFieldName.result) == ""
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_get_results_in_order_with_errors(test_bucket_mock):
+    store = RedisS3Storage(
+        bucket_name="compute-test-1", redis_threshold=5, max_pool_connections=4
+    )
+    tasks = [SimpleInMemoryTask() for _ in range(12)]
+    expected = []
+    for i, task in enumerate(tasks[:10]):
+        # alternate between results stored in redis and in s3
+        result = "Hi" if i % 2 else f"Hello World! {i}"
+        store.store_result(task, result)
+        expected.append(result)
+
+    missing, unknown = tasks[10], tasks[11]
+    expected.append(None)
+    unknown.result_reference = {"storage_id": "UnknownFakeStorageType"}
+    # a reference to an object which does not exist
+    store.store_result(tasks[0], "Hello World! again")
+    store.client.delete_object(
+        Bucket="compute-test-1", Key=tasks[0].result_reference["key"]
+    )
+    bad_reference = SimpleInMemoryTask()
+    bad_reference.result_reference = {"storage_id": "s3", "key": "foo"}
+
+    results = store.get_results(tasks + [bad_reference])
+    assert len(results) == 13
+    assert results[1:11] == expected[1:11]
+    assert missing.result is None and results[10] is None
+    for error in (results[0], results[11], results[12]):
+        assert isinstance(error, StorageException)
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_get_payloads(test_bucket_mock):
+    store = RedisS3Storage(bucket_name="compute-test-1", redis_threshold=5)
+    tasks = [SimpleInMemoryTask() for _ in range(3)]
+    payloads = ["Hi", "Hello World!", "Hello again, World!"]
+    for task, payload in zip(tasks, payloads):
+        store.store_payload(task, payload)
+
+    assert store.get_payloads(tasks) == payloads
+    assert store.get_results(tasks) == [None, None, None]
+    assert store.get_payloads([]) == []
+
+
+def test_implicit_redis_get_results_and_payloads():
+    store = ImplicitRedisStorage()
+    tasks = [SimpleInMemoryTask() for _ in range(3)]
+    store.store_result(tasks[0], "foo")
+    store.store_payload(tasks[1], "bar")
+
+    assert store.get_results(tasks) == ["foo", None, None]
+    assert store.get_payloads(tasks) == [None, "bar", None]
+
+
+def _count_s3_fetches(store):
+    fetches = []
+    download = store._download
+
+    def spy_download(bucket, key, reference):
+        fetches.append(key)
+        return download(bucket, key, reference)
+
+    store._download = spy_download
+    return fetches
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_caching_storage_fetches_once(test_bucket_mock):
+    s3_store = RedisS3Storage(bucket_name="compute-test-1", redis_threshold=5)
+    fetches = _count_s3_fetches(s3_store)
+    store = CachingTaskStorage(s3_store)
+
+    stored, fetched, in_redis = (SimpleInMemoryTask() for _ in range(3))
+    store.store_result(stored, "Hello World!")
+    s3_store.store_payload(fetched, "Hello again, World!")
+    store.store_result(in_redis, "Hi")
+
+    for _ in range(3):
+        assert store.get_result(stored) == "Hello World!"
+        assert store.get_payload(fetched) == "Hello again, World!"
+        assert store.get_result(in_redis) == "Hi"
+    assert fetches == [fetched.payload_reference["key"]]
+    assert (store.hits, store.misses) == (5, 1)
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_caching_storage_evicts_least_recently_used(test_bucket_mock):
+    s3_store = RedisS3Storage(bucket_name="compute-test-1", redis_threshold=0)
+    fetches = _count_s3_fetches(s3_store)
+    tasks = [SimpleInMemoryTask() for _ in range(3)]
+    for i, task in enumerate(tasks):
+        s3_store.store_result(task, f"{i}" * 1000)
+    # room for two of the values
+    store = CachingTaskStorage(s3_store, max_memory_bytes=2500)
+
+    store.get_result(tasks[0])
+    store.get_result(tasks[1])
+    store.get_result(tasks[0])
+    store.get_result(tasks[2])  # evicts tasks[1]
+    assert len(fetches) == 3
+    store.get_result(tasks[0])
+    assert len(fetches) == 3
+    store.get_result(tasks[1])
+    assert len(fetches) == 4
+
+    store.invalidate(tasks[1].result_reference)
+    store.get_result(tasks[1])
+    assert len(fetches) == 5
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_caching_storage_on_disk(test_bucket_mock, tmp_path):
+    s3_store = RedisS3Storage(bucket_name="compute-test-1", redis_threshold=0)
+    fetches = _count_s3_fetches(s3_store)
+    tasks = [SimpleInMemoryTask() for _ in range(3)]
+    store = CachingTaskStorage(
+        s3_store, max_memory_bytes=0, cache_dir=tmp_path, max_disk_bytes=2500
+    )
+    for i, task in enumerate(tasks):
+        store.store_result(task, f"{i}" * 1000)
+    assert len(list(tmp_path.iterdir())) == 2  # tasks[0] was evicted
+
+    # a new cache finds the values left in the directory
+    store = CachingTaskStorage(
+        s3_store, max_memory_bytes=0, cache_dir=tmp_path, max_disk_bytes=2500
+    )
+    assert [store.get_result(task) for task in tasks[1:]] == ["1" * 1000, "2" * 1000]
+    assert fetches == []
+    assert store.get_result(tasks[0]) == "0" * 1000
+    assert fetches == [tasks[0].result_reference["key"]]
+
+    store.clear()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_caching_storage_get_many(test_bucket_mock):
+    s3_store = RedisS3Storage(bucket_name="compute-test-1", redis_threshold=5)
+    fetches = _count_s3_fetches(s3_store)
+    store = CachingTaskStorage(s3_store)
+    tasks = [SimpleInMemoryTask() for _ in range(4)]
+    s3_store.store_payload(tasks[0], "Hello World!")
+    s3_store.store_payload(tasks[1], "Hi")
+    s3_store.store_payload(tasks[2], "Hello again, World!")
+    tasks[3].payload_reference = {"storage_id": "UnknownFakeStorageType"}
+
+    assert store.get_payload(tasks[0]) == "Hello World!"
+    payloads = store.get_payloads(tasks)
+    assert payloads[:3] == ["Hello World!", "Hi", "Hello again, World!"]
+    assert isinstance(payloads[3], StorageException)
+    assert store.get_payloads(tasks[:3]) == payloads[:3]
+    assert len(fetches) == 2
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_caching_storage_across_threads(test_bucket_mock, tmp_path):
+    s3_store = RedisS3Storage(bucket_name="compute-test-1", redis_threshold=0)
+    tasks = [SimpleInMemoryTask() for _ in range(20)]
+    for i, task in enumerate(tasks):
+        s3_store.store_result(task, f"{i}" * 100)
+    store = CachingTaskStorage(
+        s3_store, max_memory_bytes=1000, cache_dir=tmp_path, max_disk_bytes=1000
+    )
+
+    def read_all(_):
+        return [store.get_result(task) for task in tasks]
+
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        for results in executor.map(read_all, range(16)):
+            assert results == [f"{i}" * 100 for i in range(20)]
+    assert store._memory_bytes <= 1000
+    assert sum(f.stat().st_size for f in tmp_path.iterdir()) <= 1000
+
+
+def test_default_task_storage_compression(monkeypatch):
+    monkeypatch.delenv("COMPUTE_S3_BUCKET_NAME", raising=False)
+    monkeypatch.setenv("COMPUTE_STORAGE_COMPRESSION", "zlib")
+    store = get_default_task_storage()
+    assert store.codec.name == "zlib"
+
+    monkeypatch.setenv("COMPUTE_STORAGE_COMPRESSION", "")
+    assert get_default_task_storage().codec is None
+
+
+def test_implicit_redis_compression():
+    store = ImplicitRedisStorage(compression="zlib", compression_threshold=10)
+    compressible, small = "Hello World! " * 1000, "Hi"
+    # zlib's overhead makes short values larger
+    incompressible = "Hello World!"
+    tasks = [SimpleInMemoryTask() for _ in range(3)]
+    for task, value in zip(tasks, (compressible, small, incompressible)):
+        store.store_result(task, value)
+
+    assert tasks[0].result_reference == {"storage_id": "redis", "codec": "zlib"}
+    assert len(tasks[0].result) < len(compressible) / 10
+    assert tasks[1].result_reference == {"storage_id": "redis"}
+    assert tasks[2].result_reference == {"storage_id": "redis"}
+    assert store.get_result(tasks[0]) == compressible
+    assert store.get_results(tasks) == [compressible, small, incompressible]
+
+    # compressed values are read whether or not compression is enabled
+    assert ImplicitRedisStorage().get_result(tasks[0]) == compressible
+
+
+def test_compression_reads_uncompressed_values():
+    task = SimpleInMemoryTask()
+    ImplicitRedisStorage().store_payload(task, "Hello World! " * 1000)
+    store = ImplicitRedisStorage(compression="zlib")
+    assert store.get_payload(task) == "Hello World! " * 1000
+
+
+def test_compression_errors():
+    with pytest.raises(ValueError):
+        ImplicitRedisStorage(compression="foo")
+
+    store = ImplicitRedisStorage(compression="zlib", compression_threshold=0)
+    task = SimpleInMemoryTask()
+    store.store_result(task, "Hello World! " * 100)
+    task.result_reference["codec"] = "foo"
+    with pytest.raises(StorageException):
+        store.get_result(task)
+
+    task.result_reference["codec"] = "zlib"
+    task.result = "not zlib data"
+    with pytest.raises(StorageException):
+        store.get_result(task)
+    assert isinstance(store.get_results([task])[0], StorageException)
+
+
+@pytest.mark.parametrize("codec", (None, "zlib"))
+def test_incremental_value_decoder(codec):
+    text = "é€😀 Hello World! " * 100
+    data = text.encode("utf-8")
+    if codec is not None:
+        data = zlib.compress(data)
+    reference = {"storage_id": "s3", "codec": codec} if codec else None
+
+    # parts which split characters, and compressed blocks
+    decoder = IncrementalValueDecoder(reference)
+    pieces = [decoder.decode(data[i : i + 7]) for i in range(0, len(data), 7)]
+    assert "".join(pieces) + decoder.decode(b"", final=True) == text
+
+
+def test_incremental_value_decoder_errors():
+    data = zlib.compress(b"Hello World! " * 100)
+    decoder = IncrementalValueDecoder({"codec": "zlib"})
+    with pytest.raises(StorageException):
+        decoder.decode(data[:-5], final=True)
+
+    with pytest.raises(StorageException):
+        IncrementalValueDecoder({"codec": "foo"})
+
+
+def test_incomplete_codec_cannot_be_created():
+    class IncompleteCodec(StorageCodec):
+        name = "incomplete"
+
+        def compress(self, data):
+            return data
+
+    with pytest.raises(TypeError):
+        IncompleteCodec()
+
+
+@pytest.mark.skipif(has_zstandard, reason="test requires zstandard not be installed")
+def test_zstd_compression_requires_zstandard():
+    with pytest.raises(RuntimeError):
+        ImplicitRedisStorage(compression="zstd")
+
+
+@pytest.mark.skipif(not has_zstandard, reason="test requires zstandard lib")
+def test_zstd_compression():
+    store = ImplicitRedisStorage(compression="zstd", compression_threshold=0)
+    task = SimpleInMemoryTask()
+    store.store_payload(task, "Hello World! " * 100)
+    assert task.payload_reference["codec"] == "zstd"
+    assert store.get_payload(task) == "Hello World! " * 100
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_compression_before_threshold(test_bucket_mock):
+    store = RedisS3Storage(
+        bucket_name="compute-test-1", redis_threshold=1000, compression="zlib"
+    )
+    # compresses to fit in redis
+    compressible = "Hello World! " * 1000
+    # compresses, but not enough to fit in redis
+    large = "".join(f"{i}: {i * i}\n" for i in range(2000))
+    uncompressed = SimpleInMemoryTask()
+    RedisS3Storage(bucket_name="compute-test-1", redis_threshold=1000).store_result(
+        uncompressed, large
+    )
+    tasks = [SimpleInMemoryTask(), SimpleInMemoryTask(), uncompressed]
+    store.store_result(tasks[0], compressible)
+    store.store_result(tasks[1], large)
+
+    assert tasks[0].result_reference == {"storage_id": "redis", "codec": "zlib"}
+    assert tasks[1].result_reference["storage_id"] == "s3"
+    assert tasks[1].result_reference["codec"] == "zlib"
+    assert "codec" not in uncompressed.result_reference
+    obj = store.client.get_object(
+        Bucket="compute-test-1", Key=tasks[1].result_reference["key"]
+    )
+    assert zlib.decompress(obj["Body"].read()).decode() == large
+
+    assert store.get_result(tasks[0]) == compressible
+    assert store.get_result(tasks[1]) == large
+    assert store.get_results(tasks) == [compressible, large, large]
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_dedup_payloads(test_bucket_mock):
+    store = RedisS3Storage(
+        bucket_name="compute-test-1", redis_threshold=5, dedup_payloads=True
+    )
+    uploads = []
+    upload = store._upload
+
+    def spy_upload(key, data):
+        uploads.append(key)
+        upload(key, data)
+
+    store._upload = spy_upload
+    tasks = [SimpleInMemoryTask() for _ in range(5)]
+    for task in tasks[:4]:
+        store.store_payload(task, "Hello World!")
+    store.store_payload(tasks[4], "Hello again, World!")
+
+    keys = [task.payload_reference["key"] for task in tasks]
+    assert len(set(keys[:4])) == 1
+    assert keys[0].startswith("dedup/payload/") and keys[4] != keys[0]
+    assert uploads == [keys[0], keys[4]]
+    assert store.get_payloads(tasks) == ["Hello World!"] * 4 + ["Hello again, World!"]
+
+    # results, and payloads stored in redis, are not deduplicated
+    store.store_result(tasks[0], "Hello World!")
+    store.store_result(tasks[1], "Hello World!")
+    assert tasks[0].result_reference["key"] != tasks[1].result_reference["key"]
+    store.store_payload(tasks[0], "Hi")
+    assert tasks[0].payload_reference == {"storage_id": "redis"}
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+@pytest.mark.parametrize("refresh_age, num_copies", ((24 * 60 * 60, 0), (0, 2)))
+def test_s3_dedup_refreshes_old_shared_payloads(
+    test_bucket_mock, refresh_age, num_copies
+):
+    store = RedisS3Storage(
+        bucket_name="compute-test-1",
+        redis_threshold=5,
+        dedup_payloads=True,
+        dedup_refresh_age=refresh_age,
+    )
+    refreshed = []
+    refresh = store._refresh
+
+    def spy_refresh(key):
+        found = refresh(key)
+        refreshed.append(found)
+        return found
+
+    copies = []
+    copy = store.client.copy
+
+    def spy_copy(*args, **kwargs):
+        copies.append(args)
+        copy(*args, **kwargs)
+
+    store._refresh = spy_refresh
+    store.client.copy = spy_copy
+    for _ in range(3):
+        store.store_payload(SimpleInMemoryTask(), "Hello World!")
+    assert refreshed == [False, True, True]
+    # payloads are only copied onto themselves once they are older than the age
+    assert len(copies) == num_copies
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_dedup_install_lifecycle_rule(test_bucket_mock):
+    store = RedisS3Storage(
+        bucket_name="compute-test-1", redis_threshold=5, dedup_payloads=True
+    )
+    # with no lifecycle configuration
+    store.install_dedup_lifecycle_rule(expiration_days=20)
+    (rule,) = store.client.get_bucket_lifecycle_configuration(Bucket="compute-test-1")[
+        "Rules"
+    ]
+    assert rule["Filter"] == {"Prefix": "dedup/payload/"}
+    assert rule["Expiration"] == {"Days": 20}
+
+    # other rules are kept, and the rule is replaced rather than duplicated
+    other_rule = {
+        "ID": "other",
+        "Filter": {"Prefix": "other/"},
+        "Status": "Enabled",
+        "Expiration": {"Days": 1},
+    }
+    store.client.put_bucket_lifecycle_configuration(
+        Bucket="compute-test-1",
+        LifecycleConfiguration={"Rules": [other_rule, rule]},
+    )
+    store.install_dedup_lifecycle_rule()
+    rules = store.client.get_bucket_lifecycle_configuration(Bucket="compute-test-1")[
+        "Rules"
+    ]
+    assert [r["ID"] for r in rules] == ["other", rule["ID"]]
+    assert rules[1]["Expiration"] == {"Days": 16}
+
+
+@pytest.mark.skipif(not has_boto, reason="test requires boto3 lib")
+def test_s3_dedup_compressed_payloads(test_bucket_mock):
+    store = RedisS3Storage(
+        bucket_name="compute-test-1",
+        redis_threshold=5,
+        compression="zlib",
+        compression_threshold=0,
+        dedup_payloads=True,
+    )
+    payload = "".join(f"{i}: {i * i}\n" for i in range(100))
+    task1, task2 = SimpleInMemoryTask(), SimpleInMemoryTask()
+    store.store_payload(task1, payload)
+    store.store_payload(task2, payload)
+
+    assert task1.payload_reference == task2.payload_reference
+    assert task1.payload_reference["codec"] == "zlib"
+    assert store.get_payload(task2) == payload